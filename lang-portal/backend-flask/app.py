@@ -1,32 +1,29 @@
-from flask import Flask, g
-from flask_cors import CORS
+import importlib
+import threading
+import time
 
+from flask import Flask, g, jsonify, request
+
+from lib.compression import available_encodings, compress_response
+from lib.cors import OriginRegistry, cors_after_request
 from lib.db import Db
+from lib.http_cache import ResponseCache
+from lib.json_encoding import default_encoder, json_provider
+from lib.metrics import Metrics
+from lib.snapshots import Snapshots
+from lib.shards import InvalidLearner, LearnerPrefix, ShardedDb, ShardedVersions, learner_from_headers
+from lib.versions import DataVersions
 
-import routes.words
-import routes.groups
-import routes.study_sessions
-import routes.dashboard
-import routes.study_activities
-
-def get_allowed_origins(app):
-    try:
-        cursor = app.db.cursor()
-        cursor.execute('SELECT url FROM study_activities')
-        urls = cursor.fetchall()
-        # Convert URLs to origins (e.g., https://example.com/app -> https://example.com)
-        origins = set()
-        for url in urls:
-            try:
-                from urllib.parse import urlparse
-                parsed = urlparse(url['url'])
-                origin = f"{parsed.scheme}://{parsed.netloc}"
-                origins.add(origin)
-            except:
-                continue
-        return list(origins) if origins else ["*"]
-    except:
-        return ["*"]  # Fallback to allow all origins if there's an error
+# Route modules, imported (and their routes registered) by create_app
+ROUTES = (
+    'routes.words',
+    'routes.groups',
+    'routes.study_sessions',
+    'routes.dashboard',
+    'routes.study_activities',
+    'routes.exports',
+    'routes.metrics',
+)
 
 def create_app(test_config=None):
     app = Flask(__name__)
@@ -37,41 +34,186 @@ def create_app(test_config=None):
         )
     else:
         app.config.update(test_config)
+
+    # Connection pool and per-connection SQLite settings
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.config.setdefault('DB_POOL_TIMEOUT', 30.0)
+    app.config.setdefault('DB_BUSY_TIMEOUT_MS', 5000)
+    app.config.setdefault('DB_CACHE_SIZE_KIB', 16384)
+    app.config.setdefault('DB_MMAP_SIZE', 256 * 1024 * 1024)
+    app.config.setdefault('DB_CACHED_STATEMENTS', 256)
+
+    # Reviews validated and inserted per executemany batch by the bulk review endpoint
+    app.config.setdefault('BULK_REVIEWS_CHUNK_SIZE', 5000)
+
+    # Months of raw reviews kept (the current one included); older monthly partitions of
+    # word_review_items are dropped when a new month starts (lib/partitions.py). The
+    # aggregates keep counting them. None keeps every review.
+    app.config.setdefault('REVIEW_RETENTION_MONTHS', None)
+
+    # HTTP caching: how long data versions are trusted before re-reading them (picks up
+    # writes from other processes), and how many GET responses to keep in memory (0 = off)
+    app.config.setdefault('DATA_VERSIONS_TTL', 1.0)
+    app.config.setdefault('RESPONSE_CACHE_SIZE', 0)
+
+    # Rows fetched per fetchmany call (and encoded per chunk) by the export endpoints
+    app.config.setdefault('EXPORT_FETCH_SIZE', 1000)
+
+    # Most ids one GET /api/words?ids=, POST /api/words/batch or group membership request may name
+    app.config.setdefault('WORDS_BATCH_LIMIT', 5000)
+
+    # JSON encoder of responses: 'orjson' (default when installed) or 'json' (lib/json_encoding.py)
+    app.config.setdefault('JSON_ENCODER', default_encoder())
+
+    # Response compression (lib/compression.py): encodings offered in order of preference
+    # (an empty list turns it off), and the smallest body worth compressing
+    app.config.setdefault('COMPRESSION_ENCODINGS', list(available_encodings()))
+    app.config.setdefault('COMPRESSION_MIN_BYTES', 1024)
+
+    # Request/SQL metrics at /metrics, and statements at least this slow are logged
+    # to the 'slow_query' logger with their normalized SQL
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('SLOW_QUERY_MS', 100)
+
+    # Per-learner mode (lib/shards.py): with DB_SHARDS_DIR set, each learner's study data
+    # lives in <DB_SHARDS_DIR>/<learner>.db and DATABASE is the shared, read-only
+    # dictionary. The learner comes from LEARNER_HEADER or a /learners/<id>/ path prefix.
+    # At most DB_SHARD_CONNECTIONS shard connections are open at once (LRU).
+    app.config.setdefault('DB_SHARDS_DIR', None)
+    app.config.setdefault('DB_SHARD_CONNECTIONS', 32)
+    app.config.setdefault('LEARNER_HEADER', 'X-Learner-Id')
+
+    # Read snapshots (lib/snapshots.py): /dashboard/* and the exports read a copy of the
+    # database taken with the backup API, refreshed once it is older than SNAPSHOT_MAX_AGE
+    # seconds (None reads the live database). Copies are written to SNAPSHOT_DIR (default:
+    # next to DATABASE). Not used in per-learner mode.
+    app.config.setdefault('SNAPSHOT_MAX_AGE', None)
+    app.config.setdefault('SNAPSHOT_DIR', None)
+
+    # Origins allowed besides the study activities' when the app runs in debug mode
+    app.config.setdefault('CORS_DEV_ORIGINS', ["http://localhost:8080", "http://127.0.0.1:8080"])
+
+    # Threads the ASGI entry point (asgi.py) runs requests on; one per pooled connection
+    app.config.setdefault('ASGI_THREADS', app.config['DB_POOL_SIZE'])
     
-    # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
-    
-    # Get allowed origins from study_activities table
-    allowed_origins = get_allowed_origins(app)
-    
-    # In development, add localhost to allowed origins
-    if app.debug:
-        allowed_origins.extend(["http://localhost:8080", "http://127.0.0.1:8080"])
+    app.json = json_provider(app, app.config['JSON_ENCODER'])
+    # Nothing below touches the database: connections, data versions and origins are all
+    # loaded on first use, so creating (and importing) the app stays cheap
+    app.metrics = Metrics(slow_query_seconds=app.config['SLOW_QUERY_MS'] / 1000) if app.config['METRICS_ENABLED'] else None
+
+    db_settings = dict(
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+        cache_size_kib=app.config['DB_CACHE_SIZE_KIB'],
+        mmap_size=app.config['DB_MMAP_SIZE'],
+        cached_statements=app.config['DB_CACHED_STATEMENTS'],
+        metrics=app.metrics
+    )
+    if app.config['DB_SHARDS_DIR']:
+        app.db = ShardedDb(
+            directory=app.config['DB_SHARDS_DIR'],
+            dictionary=app.config['DATABASE'],
+            max_connections=app.config['DB_SHARD_CONNECTIONS'],
+            sync_interval=app.config['DATA_VERSIONS_TTL'],
+            **db_settings
+        )
+        app.versions = ShardedVersions(app.db, ttl=app.config['DATA_VERSIONS_TTL'])
+        app.wsgi_app = LearnerPrefix(app.wsgi_app, app.config['LEARNER_HEADER'])
+    else:
+        app.db = Db(database=app.config['DATABASE'], pool_size=app.config['DB_POOL_SIZE'], **db_settings)
+        app.versions = DataVersions(app.db, ttl=app.config['DATA_VERSIONS_TTL'])
+    if app.config['SNAPSHOT_MAX_AGE'] is not None and not app.config['DB_SHARDS_DIR']:
+        app.snapshots = Snapshots(app.config['DATABASE'], max_age=app.config['SNAPSHOT_MAX_AGE'],
+                                  directory=app.config['SNAPSHOT_DIR'], pool_size=app.config['DB_POOL_SIZE'],
+                                  **db_settings)
+    else:
+        app.snapshots = None
+    app.response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE']) if app.config['RESPONSE_CACHE_SIZE'] else None
     
-    # Configure CORS with combined origins
-    CORS(app, resources={
-        r"/*": {
-            "origins": allowed_origins,
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
-        }
-    })
-
-    # Close database connection
+    # Allowed origins are those of the study activities, read on first use and re-read when
+    # study_activities changes (lib/cors.py); in development, the local frontend as well
+    app.cors_origins = OriginRegistry(
+        app.config['DATABASE'],
+        ttl=app.config['DATA_VERSIONS_TTL'],
+        extra_origins=app.config['CORS_DEV_ORIGINS'] if app.debug else ()
+    )
+    app.config['CORS_ORIGINS'] = app.cors_origins
+    app.after_request(cors_after_request(
+        app, app.cors_origins,
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", app.config['LEARNER_HEADER']]
+    ))
+
+    # Per-route latency and SQL statement counts (lib/metrics.py)
+    if app.metrics is not None:
+        @app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            started = g.get('request_started')
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                app.metrics.observe_request(request.method, route, response.status_code,
+                                            time.perf_counter() - started, app.db.request_statements())
+            return response
+
+    # Compress responses the client accepts compressed; after_request hooks run in
+    # reverse order, so this one runs before record_request and is timed with the request
+    app.after_request(compress_response)
+
+    # Per-learner mode: every request except /metrics names its learner
+    if app.config['DB_SHARDS_DIR']:
+        @app.before_request
+        def resolve_learner():
+            if request.method == 'OPTIONS' or request.endpoint in ('get_metrics', 'static'):
+                return None
+            try:
+                g.learner = learner_from_headers(request.headers, app.config['LEARNER_HEADER'])
+            except InvalidLearner as e:
+                return jsonify({"error": str(e)}), 400
+
+    # Return the request's database connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
 
+    # A write may have bumped data versions; re-read them on the next GET
+    @app.teardown_request
+    def refresh_versions(exception):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            app.versions.invalidate()
+            app.cors_origins.invalidate()
+
     # load routes -----------
-    routes.words.load(app)
-    routes.groups.load(app)
-    routes.study_sessions.load(app)
-    routes.dashboard.load(app)
-    routes.study_activities.load(app)
+    for module in ROUTES:
+        importlib.import_module(module).load(app)
     
     return app
 
-app = create_app()
+_app = None
+_app_lock = threading.Lock()
+
+def get_app():
+    """The app for words.db, created on first use; raises if a statement under sql/ is invalid."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            app = create_app()
+            app.db.validate_statements()
+            _app = app
+        return _app
+
+def __getattr__(name):
+    # `from app import app` (asgi.py, WSGI servers) creates it; a plain import does not
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True, port=8000)
\ No newline at end of file
+    # Debug from the start, so the development origins are allowed too
+    app = create_app({'DATABASE': 'words.db', 'DEBUG': True})
+    # Fail now, not on the first request, if a statement under sql/ does not prepare
+    app.db.validate_statements()
+    app.run(host='0.0.0.0', port=8000)
@@ -0,0 +1,10 @@
+from app import app as flask_app
+from lib.asgi import AsgiApp
+
+# ASGI entry point serving the same routes as app.py:
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 8000
+#
+# Connections are handled on the event loop; requests run on ASGI_THREADS
+# threads (see lib/asgi.py).
+app = AsgiApp(flask_app, threads=flask_app.config['ASGI_THREADS'], on_shutdown=flask_app.db.close_all)
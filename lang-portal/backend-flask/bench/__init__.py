@@ -0,0 +1,4 @@
+"""Benchmarks for the lang-portal Flask backend.
+
+Run the scripts from the backend-flask directory, e.g. ``python -m bench.db_pool``.
+"""
@@ -0,0 +1,137 @@
+"""Flask (thread per connection) vs. the ASGI entry point under many concurrent clients.
+
+    python -m bench.asgi --clients 50 200 1000 --duration 15
+
+Runs the mixed read/write load of bench.load in-process against a synthetic
+database, once per client count and path:
+
+- flask: every client is a thread calling the WSGI app, as the threaded dev
+  server runs one thread per open connection.
+- asgi: every client is a coroutine calling asgi.AsgiApp on one event loop;
+  requests run on --pool-size executor threads.
+
+Both paths share a pool of --pool-size SQLite connections. Reports throughput,
+p50/p99 latency, errors and the threads each path needed. To compare real
+servers over HTTP instead, start `python app.py` or `uvicorn asgi:app` and point
+`python -m bench.load --url` at each.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from bench import synthetic
+from bench.load import MIX, TestClientTarget, run_load
+from bench.results import write_results
+from bench.stats import summarize, format_row
+from lib.asgi import AsgiApp
+
+
+async def asgi_request(asgi, method, path, params, body):
+    payload = json.dumps(body).encode() if body is not None else b''
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())] if body is not None else []
+    scope = {'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+             'root_path': '', 'query_string': urlencode(params or {}).encode(), 'headers': headers,
+             'client': ('127.0.0.1', 0), 'server': ('localhost', 8000)}
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    status = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await asgi(scope, receive, send)
+    return status[0]
+
+
+def run_asgi_load(asgi, args, mix):
+    weights = [weight for _, weight, _, _ in mix]
+    latencies = {label: [] for label, _, _, _ in mix}
+    errors = {label: 0 for label, _, _, _ in mix}
+
+    async def client_loop(client_id, deadline):
+        rng = random.Random(args.seed + client_id)
+        while time.perf_counter() < deadline:
+            label, _, _, build = rng.choices(mix, weights=weights)[0]
+            method, path, params, body = build(rng, args)
+            started = time.perf_counter()
+            try:
+                status = await asgi_request(asgi, method, path, params, body)
+            except Exception:
+                status = 599
+            latencies[label].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[label] += 1
+
+    async def run():
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*[client_loop(client_id, deadline) for client_id in range(args.clients)])
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per client count and path')
+    parser.add_argument('--pool-size', type=int, default=8, help='SQLite connections (and ASGI threads)')
+    parser.add_argument('--write-weight', type=float, default=1.0, help='multiplier for the weights of write requests')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--review-items', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    mix = [(label, weight * (args.write_weight if kind == 'write' else 1), kind, build)
+           for label, weight, kind, build in MIX]
+
+    workdir = tempfile.mkdtemp(prefix='bench-asgi-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, groups=args.groups,
+                                  sessions=args.sessions, review_items=args.review_items, seed=args.seed)
+        # Clients wait for a connection as long as the run lasts rather than failing
+        app = create_app({'DATABASE': path, 'DB_POOL_SIZE': args.pool_size, 'DB_POOL_TIMEOUT': args.duration * 2})
+
+        results = {}
+        for clients in args.clients:
+            run_args = argparse.Namespace(**dict(vars(args), clients=clients))
+            for mode in ('flask', 'asgi'):
+                if mode == 'flask':
+                    latencies, errors, elapsed = run_load(TestClientTarget(app), run_args, mix)
+                    threads = clients
+                else:
+                    asgi = AsgiApp(app, threads=args.pool_size)
+                    latencies, errors, elapsed = run_asgi_load(asgi, run_args, mix)
+                    asgi.shutdown()
+                    threads = args.pool_size
+
+                values = [latency for endpoint in latencies.values() for latency in endpoint]
+                summary = dict(summarize(values), errors=sum(errors.values()), threads=threads,
+                               throughput_rps=len(values) / elapsed)
+                label = f'{mode} {clients} clients'
+                results[label] = summary
+                print(format_row(label, summary) +
+                      f"  {summary['throughput_rps']:7.0f} req/s  errors={summary['errors']}  threads={threads}")
+
+        if args.output:
+            write_results(args.output, 'asgi', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
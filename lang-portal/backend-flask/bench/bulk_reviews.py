@@ -0,0 +1,89 @@
+"""Replay a burst of offline reviews: one request per session vs. the bulk endpoint.
+
+    python -m bench.bulk_reviews --reviews 50000 --per-session 25
+
+Each variant starts from a copy of the same synthetic database and posts the same
+reviews through the Flask test client, either as one
+POST /api/study-sessions/<id>/review per session or as a single
+POST /api/study-sessions/reviews body (JSON array and NDJSON).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from app import create_app
+from bench import synthetic
+
+
+def make_reviews(count, sessions, words, seed):
+    rng = random.Random(seed)
+    return [{
+        'session_id': rng.randint(1, sessions),
+        'word_id': rng.randint(1, words),
+        'is_correct': rng.random() < 0.7
+    } for _ in range(count)]
+
+
+def per_session(client, reviews, per_session_size):
+    by_session = {}
+    for review in reviews:
+        by_session.setdefault(review['session_id'], []).append(review)
+    for session_id, session_reviews in by_session.items():
+        for start in range(0, len(session_reviews), per_session_size):
+            batch = session_reviews[start:start + per_session_size]
+            response = client.post(f'/api/study-sessions/{session_id}/review', json={
+                'reviews': [{'word_id': r['word_id'], 'is_correct': r['is_correct']} for r in batch]
+            })
+            assert response.status_code == 200, response.get_json()
+
+
+def bulk_json(client, reviews, _):
+    response = client.post('/api/study-sessions/reviews', json=reviews)
+    assert response.status_code == 200 and response.get_json()['rejected'] == 0, response.get_json()
+
+
+def bulk_ndjson(client, reviews, _):
+    body = '\n'.join(json.dumps(review) for review in reviews)
+    response = client.post('/api/study-sessions/reviews', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200 and response.get_json()['rejected'] == 0, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=50000)
+    parser.add_argument('--per-session', type=int, default=25, help='reviews per request in the per-session variant')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-bulk-reviews-')
+    try:
+        template = synthetic.generate(os.path.join(workdir, 'template.db'), words=args.words,
+                                      sessions=args.sessions, review_items=args.sessions * 10, seed=args.seed)
+        reviews = make_reviews(args.reviews, args.sessions, args.words, args.seed)
+
+        for name, variant in [('per-session requests', per_session),
+                              ('bulk JSON array', bulk_json),
+                              ('bulk NDJSON', bulk_ndjson)]:
+            path = os.path.join(workdir, 'bench.db')
+            shutil.copyfile(template, path)
+            app = create_app({'DATABASE': path})
+            client = app.test_client()
+
+            started = time.perf_counter()
+            variant(client, reviews, args.per_session)
+            elapsed = time.perf_counter() - started
+            app.db.close_all()
+            print(f"{name:<22} {args.reviews} reviews in {elapsed:7.2f}s  ({args.reviews / elapsed:,.0f} reviews/s)")
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
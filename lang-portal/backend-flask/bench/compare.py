@@ -0,0 +1,57 @@
+"""Compare two benchmark result files (from --output), e.g. across commits.
+
+    python -m bench.compare before.json after.json
+
+Prints p50/p99 (and throughput where recorded) for every endpoint or case present
+in both files, with the relative change.
+"""
+import argparse
+
+from bench.results import read_results
+
+
+def _entries(document):
+    results = document['results']
+    # bench.load nests its per-endpoint summaries; bench.routes is flat
+    return results.get('endpoints', results)
+
+
+def _change(before, after):
+    if not before:
+        return '     n/a'
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    before, after = read_results(args.before), read_results(args.after)
+    for name, document in (('before', before), ('after', after)):
+        environment = document['environment']
+        print(f"{name:<7} {document['benchmark']} @ {environment['commit']}{' (dirty)' if environment['dirty'] else ''} "
+              f"{environment['timestamp']}")
+    if 'throughput_rps' in before['results'] and 'throughput_rps' in after['results']:
+        b, a = before['results']['throughput_rps'], after['results']['throughput_rps']
+        print(f"throughput {b:9.0f} -> {a:9.0f} req/s {_change(b, a)}")
+    print()
+
+    before_entries, after_entries = _entries(before), _entries(after)
+    # Only latency summaries are compared; bench.routes also records statement cache counts
+    before_entries = {label: entry for label, entry in before_entries.items() if 'p50_ms' in entry}
+    after_entries = {label: entry for label, entry in after_entries.items() if 'p50_ms' in entry}
+    for label in before_entries:
+        if label not in after_entries:
+            continue
+        b, a = before_entries[label], after_entries[label]
+        print(f"{label:<45} p50 {b['p50_ms']:8.2f} -> {a['p50_ms']:8.2f}ms {_change(b['p50_ms'], a['p50_ms'])}"
+              f"   p99 {b['p99_ms']:8.2f} -> {a['p99_ms']:8.2f}ms {_change(b['p99_ms'], a['p99_ms'])}")
+    only = sorted(set(before_entries) ^ set(after_entries))
+    if only:
+        print(f"\nIn one file only: {', '.join(only)}")
+
+
+if __name__ == '__main__':
+    main()
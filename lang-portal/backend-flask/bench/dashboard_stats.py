@@ -0,0 +1,130 @@
+"""/dashboard/stats from the review log vs. from the study_stats / daily_activity rollups.
+
+    python -m bench.dashboard_stats --review-items 10000000 --repeat 5
+
+Generates a synthetic database (10M review items by default, which takes a few
+minutes), then times the seven aggregate queries the endpoint used to run
+against the endpoint as it is now, and checks that both give the same answer.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from app import create_app
+from bench import synthetic
+from bench.stats import summarize, format_row
+
+# The queries /dashboard/stats ran before the rollups, over the full review log; active
+# groups and the streak as they are defined now (groups touched by sessions or reviews,
+# the run of consecutive study days up to today or yesterday)
+LOG_QUERIES = {
+    'total_vocabulary': 'SELECT COUNT(*) FROM words',
+    'total_words_studied': '''
+        SELECT COUNT(DISTINCT word_id)
+        FROM word_review_items wri
+        JOIN study_sessions ss ON wri.study_session_id = ss.id
+    ''',
+    'mastered_words': '''
+        WITH word_stats AS (
+            SELECT
+                word_id,
+                COUNT(*) as total_attempts,
+                SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
+            FROM word_review_items wri
+            JOIN study_sessions ss ON wri.study_session_id = ss.id
+            GROUP BY word_id
+            HAVING total_attempts >= 5
+        )
+        SELECT COUNT(*) FROM word_stats WHERE success_rate >= 0.8
+    ''',
+    'success_rate': '''
+        SELECT COALESCE(SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*), 0)
+        FROM word_review_items wri
+        JOIN study_sessions ss ON wri.study_session_id = ss.id
+    ''',
+    'total_sessions': 'SELECT COUNT(*) FROM study_sessions',
+    'active_groups': '''
+        SELECT COUNT(DISTINCT group_id)
+        FROM (
+            SELECT group_id FROM study_sessions WHERE created_at >= date('now', '-30 days')
+            UNION ALL
+            SELECT ss.group_id
+            FROM word_review_items wri
+            JOIN study_sessions ss ON wri.study_session_id = ss.id
+            WHERE wri.created_at >= date('now', '-30 days')
+        )
+    ''',
+    'current_streak': '''
+        WITH study_days AS (
+            SELECT date(created_at) as study_date FROM study_sessions
+            UNION
+            SELECT date(created_at) FROM word_review_items
+        ),
+        runs AS (
+            SELECT
+                study_date,
+                julianday(study_date) - row_number() over (order by study_date) as run
+            FROM study_days
+            WHERE study_date <= date('now')
+        )
+        SELECT COUNT(*) FROM runs
+        WHERE run = (
+            SELECT run FROM runs WHERE study_date >= date('now', '-1 day')
+            ORDER BY study_date DESC LIMIT 1
+        )
+    ''',
+}
+
+
+def stats_from_log(connection):
+    """Compute the /dashboard/stats payload straight from the review log."""
+    return {key: connection.execute(sql).fetchone()[0] for key, sql in LOG_QUERIES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=200000)
+    parser.add_argument('--review-items', type=int, default=10000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-dashboard-stats-')
+    try:
+        started = time.perf_counter()
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, sessions=args.sessions,
+                                  review_items=args.review_items, seed=args.seed)
+        print(f"Generated {args.review_items:,} review items in {time.perf_counter() - started:.1f}s")
+
+        connection = sqlite3.connect(path)
+        log_latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            expected = stats_from_log(connection)
+            log_latencies.append(time.perf_counter() - started)
+        connection.close()
+
+        client = create_app({'DATABASE': path}).test_client()
+        rollup_latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            response = client.get('/dashboard/stats')
+            rollup_latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.get_json()
+
+        actual = response.get_json()
+        for key, value in expected.items():
+            assert abs(actual[key] - value) < 1e-9, (key, actual[key], value)
+
+        print(format_row('review log queries', summarize(log_latencies)))
+        print(format_row('GET /dashboard/stats', summarize(rollup_latencies)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
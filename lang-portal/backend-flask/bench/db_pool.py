@@ -0,0 +1,113 @@
+"""Compare per-request connections against the pooled, WAL-mode Db.
+
+    python -m bench.db_pool --threads 8 --requests 2000
+
+Both variants run the same mixed workload (GET /api/words and
+POST /api/study-sessions/<id>/review) through the Flask test client on copies
+of the same synthetic database, and report p50/p99 latency per endpoint.
+"""
+import argparse
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import os
+import time
+
+from app import create_app
+from lib.db import Db
+from bench import synthetic
+from bench.stats import summarize, format_row
+
+
+class UnpooledDb(Db):
+    """The connection handling Db had before pooling: connect per request, default journal."""
+
+    def acquire(self):
+        connection = sqlite3.connect(self.database)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def release(self, connection):
+        connection.close()
+
+
+def run_workload(app, requests_per_thread, threads, words, sessions, seed):
+    latencies = {'GET /api/words': [], 'POST /api/study-sessions/<id>/review': []}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        client = app.test_client()
+        local = {key: [] for key in latencies}
+        for _ in range(requests_per_thread):
+            if rng.random() < 0.7:
+                key = 'GET /api/words'
+                started = time.perf_counter()
+                response = client.get('/api/words', query_string={
+                    'page': rng.randint(1, 20),
+                    'sort_by': rng.choice(['italian', 'english']),
+                })
+            else:
+                key = 'POST /api/study-sessions/<id>/review'
+                reviews = [{'word_id': rng.randint(1, words), 'is_correct': rng.random() < 0.7}
+                           for _ in range(10)]
+                started = time.perf_counter()
+                response = client.post(f'/api/study-sessions/{rng.randint(1, sessions)}/review',
+                                       json={'reviews': reviews})
+            local[key].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors.append(response.get_json())
+        with lock:
+            for key, values in local.items():
+                latencies[key].extend(values)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--review-items', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='total requests per variant')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-db-pool-')
+    try:
+        base = synthetic.generate(os.path.join(workdir, 'base.db'), words=args.words,
+                                  sessions=args.sessions, review_items=args.review_items, seed=args.seed)
+        variants = [('before (connect per request)', UnpooledDb), ('after (pooled, WAL)', None)]
+        for label, db_class in variants:
+            path = os.path.join(workdir, f'{label.split()[0]}.db')
+            shutil.copy(base, path)
+            app = create_app({'DATABASE': path, 'DB_POOL_SIZE': args.threads})
+            if db_class is not None:
+                app.db = db_class(database=path)
+
+            latencies, errors, elapsed = run_workload(
+                app, args.requests // args.threads, args.threads, args.words, args.sessions, args.seed)
+            total = sum(len(values) for values in latencies.values())
+            print(f"\n{label}: {total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s), {len(errors)} errors")
+            for key, values in latencies.items():
+                print(format_row(key, summarize(values)))
+            if db_class is None:
+                print(f"pool: {app.db.pool_stats()}")
+            if errors:
+                print(f"first error: {errors[0]}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Peak memory and throughput of the streaming exports vs. building the list and jsonify-ing it.
+
+    python -m bench.exports --review-items 1000000
+
+Exports every review item from a synthetic database through
+/api/export/review-items (NDJSON and CSV) and compares the peak Python memory
+(tracemalloc) with fetching all rows and returning them with jsonify, the way
+/api/groups/<id>/words/raw builds its response.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from flask import jsonify
+
+from app import create_app
+from bench import synthetic
+
+
+def measure(run):
+    # Time an untraced run; tracemalloc slows allocation-heavy code several times over
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--review-items', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-exports-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), sessions=max(args.review_items // 50, 1),
+                                  review_items=args.review_items, seed=args.seed)
+        app = create_app({'DATABASE': path})
+        client = app.test_client()
+
+        def streamed(format):
+            def run():
+                response = client.get('/api/export/review-items', query_string={'format': format}, buffered=False)
+                size = sum(len(chunk) for chunk in response.response)
+                response.close()
+                return size
+            return run
+
+        def buffered():
+            with app.app_context():
+                cursor = app.db.cursor()
+                cursor.execute('SELECT id, word_id, study_session_id, correct, created_at FROM word_review_items ORDER BY created_at, id')
+                items = [dict(row) for row in cursor.fetchall()]
+                size = len(jsonify(items).get_data())
+                app.db.close()
+            return size
+
+        for name, run in [('stream NDJSON', streamed('ndjson')), ('stream CSV', streamed('csv')),
+                          ('fetchall + jsonify', buffered)]:
+            size, elapsed, peak = measure(run)
+            print(f"{name:<20} {size / 2**20:8.1f} MiB in {elapsed:6.2f}s "
+                  f"({args.review_items / elapsed:,.0f} rows/s)  peak Python memory {peak / 2**20:8.1f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
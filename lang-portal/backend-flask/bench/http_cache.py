@@ -0,0 +1,57 @@
+"""Full GETs vs. 304 revalidations vs. in-process response cache hits.
+
+    python -m bench.http_cache --repeat 200
+
+Times the endpoints the frontends poll most, on a synthetic database, as a plain
+200, as a revalidation with the current ETag (304), and served from the response
+cache (RESPONSE_CACHE_SIZE).
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from app import create_app
+from bench import synthetic
+from bench.stats import summarize, format_row
+
+URLS = ['/api/groups', '/api/groups/1/words/raw', '/dashboard/stats', '/api/words?page=10']
+
+
+def time_request(client, url, headers, repeat, status):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == status, response.status_code
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-http-cache-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, seed=args.seed)
+        plain = create_app({'DATABASE': path}).test_client()
+        cached = create_app({'DATABASE': path, 'RESPONSE_CACHE_SIZE': 256}).test_client()
+
+        for url in URLS:
+            print(f"\n{url}")
+            etag = plain.get(url).headers['ETag']
+            print(format_row('200', summarize(time_request(plain, url, {}, args.repeat, 200))))
+            print(format_row('304 (If-None-Match)', summarize(time_request(plain, url, {'If-None-Match': etag}, args.repeat, 304))))
+            cached.get(url)
+            print(format_row('200 (response cache)', summarize(time_request(cached, url, {}, args.repeat, 200))))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
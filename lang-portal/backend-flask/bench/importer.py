@@ -0,0 +1,97 @@
+"""Row-by-row vocabulary import vs. the streaming chunked importer.
+
+    python -m bench.importer --words 200000
+
+Writes a synthetic vocabulary file (with 1% repeated words) and imports it into a
+fresh database twice: with the loop Db.import_word_json used to run (one INSERT
+and lastrowid per word) and with lib.importer.import_words.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from flask import Flask
+
+from bench.synthetic import LETTERS, SYLLABLES, _word
+from lib.db import Db
+from lib.importer import import_words
+
+
+def write_vocabulary(path, words, seed):
+    rng = random.Random(seed)
+    rows = [{'english': _word(rng, LETTERS, 3, 12), 'italian': _word(rng, SYLLABLES, 2, 6)} for _ in range(words)]
+    rows += rng.sample(rows, words // 100)
+    with open(path, 'w') as file:
+        for row in rows:
+            file.write(json.dumps(row) + '\n')
+    return len(rows)
+
+
+def empty_database(path):
+    database = Db(database=path)
+    app = Flask(__name__)
+    with app.app_context():
+        database.setup_tables(database.cursor())
+        database.close()
+    database.close_all()
+
+
+def legacy_import(path, source):
+    # The loop import_word_json ran before the streaming importer, over the whole file in memory
+    with open(source) as file:
+        words = [json.loads(line) for line in file]
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    cursor.execute('INSERT INTO groups (name) VALUES (?)', ('Dictionary',))
+    group_id = cursor.lastrowid
+    for word in words:
+        cursor.execute('INSERT INTO words (english, italian) VALUES (?, ?)', (word['english'], word['italian']))
+        cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', (cursor.lastrowid, group_id))
+    connection.commit()
+    cursor.execute('UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = ?) WHERE id = ?',
+                   (group_id, group_id))
+    connection.commit()
+    connection.close()
+
+
+def streaming_import(path, source, chunk_size):
+    database = Db(database=path)
+    app = Flask(__name__)
+    with app.app_context():
+        import_words(database.get(), source, 'Dictionary', chunk_size=chunk_size)
+        database.close()
+    database.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-importer-')
+    try:
+        source = os.path.join(workdir, 'vocabulary.ndjson')
+        rows = write_vocabulary(source, args.words, args.seed)
+
+        for name, run in [('row by row (no dedup)', lambda path: legacy_import(path, source)),
+                          ('streaming importer', lambda path: streaming_import(path, source, args.chunk_size))]:
+            path = os.path.join(workdir, 'bench.db')
+            empty_database(path)
+            started = time.perf_counter()
+            run(path)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<24} {rows} rows in {elapsed:6.2f}s  ({rows / elapsed:,.0f} rows/s)")
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Concurrent mixed read/write load against the API.
+
+    python -m bench.load --clients 16 --duration 30 --output load.json
+    python -m bench.load --url http://localhost:8000 --words 54 --groups 2 --sessions 1
+
+Each client thread picks requests from a weighted mix of reads and writes (see MIX)
+for --duration seconds and records the latency of each. The run reports the
+overall throughput and, per endpoint, the request count, error count and
+p50/p95/p99 latency; --output saves the same as JSON for bench.compare.
+
+Without --url the load runs in-process through the Flask test client against a
+fresh synthetic database. With --url it is sent over HTTP to a running server,
+whose data should match --words / --groups / --sessions (ids are drawn from 1..N).
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from bench import synthetic
+from bench.results import write_results
+from bench.stats import summarize, format_row
+
+
+def _reviews(rng, args, count):
+    return [{'word_id': rng.randint(1, args.words), 'is_correct': rng.random() < 0.7} for _ in range(count)]
+
+
+# (label, weight, kind, request builder); the builder returns (method, path, params, json body)
+MIX = [
+    ('GET /api/words', 20, 'read',
+     lambda rng, args: ('GET', '/api/words', {'page': rng.randint(1, 20), 'sort_by': rng.choice(['italian', 'english', 'correct_count'])}, None)),
+    ('GET /api/words/<id>', 10, 'read',
+     lambda rng, args: ('GET', f'/api/words/{rng.randint(1, args.words)}', None, None)),
+    ('GET /api/groups', 10, 'read',
+     lambda rng, args: ('GET', '/api/groups', None, None)),
+    ('GET /api/groups/<id>/words', 10, 'read',
+     lambda rng, args: ('GET', f'/api/groups/{rng.randint(1, args.groups)}/words', {'page': rng.randint(1, 5)}, None)),
+    ('GET /api/groups/<id>/words/raw', 5, 'read',
+     lambda rng, args: ('GET', f'/api/groups/{rng.randint(1, args.groups)}/words/raw', None, None)),
+    ('GET /api/study-sessions', 8, 'read',
+     lambda rng, args: ('GET', '/api/study-sessions', {'page': rng.randint(1, 10)}, None)),
+    ('GET /dashboard/stats', 8, 'read',
+     lambda rng, args: ('GET', '/dashboard/stats', None, None)),
+    ('GET /dashboard/recent-session', 4, 'read',
+     lambda rng, args: ('GET', '/dashboard/recent-session', None, None)),
+    ('POST /api/study-sessions', 5, 'write',
+     lambda rng, args: ('POST', '/api/study-sessions', None, {'group_id': rng.randint(1, args.groups), 'study_activity_id': 1})),
+    ('POST /api/study-sessions/<id>/review', 15, 'write',
+     lambda rng, args: ('POST', f'/api/study-sessions/{rng.randint(1, args.sessions)}/review', None, {'reviews': _reviews(rng, args, 10)})),
+    ('POST /api/study-sessions/reviews', 5, 'write',
+     lambda rng, args: ('POST', '/api/study-sessions/reviews', None,
+                        [dict(review, session_id=rng.randint(1, args.sessions)) for review in _reviews(rng, args, 100)])),
+]
+
+
+class TestClientTarget:
+    """Send requests in-process through the Flask test client."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        return self.app.test_client()
+
+    @staticmethod
+    def send(client, method, path, params, body):
+        response = client.open(path, method=method, query_string=params, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HttpTarget:
+    """Send requests over HTTP to a running server, one keep-alive session per client."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def session(self):
+        import requests
+        return requests.Session()
+
+    def send(self, client, method, path, params, body):
+        return client.request(method, self.base_url + path, params=params, json=body).status_code
+
+
+def run_load(target, args, mix):
+    weights = [weight for _, weight, _, _ in mix]
+    latencies = {label: [] for label, _, _, _ in mix}
+    errors = {label: 0 for label, _, _, _ in mix}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client_loop(client_id):
+        rng = random.Random(args.seed + client_id)
+        session = target.session()
+        local = {label: [] for label in latencies}
+        local_errors = {label: 0 for label in errors}
+        while time.perf_counter() < deadline:
+            label, _, _, build = rng.choices(mix, weights=weights)[0]
+            method, path, params, body = build(rng, args)
+            started = time.perf_counter()
+            try:
+                status = target.send(session, method, path, params, body)
+            except Exception:
+                status = 599
+            local[label].append(time.perf_counter() - started)
+            if status >= 400:
+                local_errors[label] += 1
+        with lock:
+            for label in latencies:
+                latencies[label].extend(local[label])
+                errors[label] += local_errors[label]
+
+    threads = [threading.Thread(target=client_loop, args=(client_id,)) for client_id in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    parser.add_argument('--write-weight', type=float, default=1.0, help='multiplier for the weights of write requests')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--review-items', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    mix = [(label, weight * (args.write_weight if kind == 'write' else 1), kind, build)
+           for label, weight, kind, build in MIX]
+
+    workdir = None
+    try:
+        if args.url:
+            target = HttpTarget(args.url)
+        else:
+            from app import create_app
+            workdir = tempfile.mkdtemp(prefix='bench-load-')
+            path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, groups=args.groups,
+                                      sessions=args.sessions, review_items=args.review_items, seed=args.seed)
+            target = TestClientTarget(create_app({'DATABASE': path, 'DB_POOL_SIZE': max(args.clients, 8)}))
+
+        latencies, errors, elapsed = run_load(target, args, mix)
+
+        total = sum(len(values) for values in latencies.values())
+        print(f"{total} requests from {args.clients} clients in {elapsed:.1f}s: "
+              f"{total / elapsed:.0f} req/s, {sum(errors.values())} errors\n")
+        results = {'throughput_rps': total / elapsed, 'requests': total, 'errors': sum(errors.values()), 'endpoints': {}}
+        for label, values in latencies.items():
+            summary = dict(summarize(values), errors=errors[label], throughput_rps=len(values) / elapsed)
+            results['endpoints'][label] = summary
+            print(format_row(label, summary) + f"  errors={errors[label]}")
+
+        if args.output:
+            write_results(args.output, 'load', args, results)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
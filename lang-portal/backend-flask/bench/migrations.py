@@ -0,0 +1,104 @@
+"""Backfilling a column of the review log next to review writes: a transaction per partition vs. batches.
+
+    python -m bench.migrations --review-items 2000000 --batch-size 10000
+
+Adds a column to every review log partition, then fills it in while a writer
+thread keeps posting reviews to the app in-process:
+
+- per partition: the fill runs as one transaction per monthly partition
+  (a batch size larger than any of them), holding the write lock for each
+- batched: --batch-size rows per transaction (lib/migrations.py)
+
+Reports the backfill's duration and the writer's latency: the worst case is how
+long a write waited for the lock.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from bench.results import write_results
+
+ADD_COLUMN = '-- table: word_review_items\nALTER TABLE {table} ADD COLUMN weight INTEGER NOT NULL DEFAULT 0;\n'
+FILL = ('-- table: word_review_items\n'
+        'UPDATE {table} SET weight = CASE WHEN correct THEN 1 ELSE 2 END WHERE rowid >= :start AND rowid < :stop;\n')
+
+
+def run(database, migrations, batch_size, args):
+    from app import create_app
+    from lib.db import Db
+    from lib.migrations import migrate
+
+    app = create_app({'DATABASE': database, 'METRICS_ENABLED': False})
+    client = app.test_client()
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    rng = random.Random(args.seed)
+    latencies, stop = [], threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            reviews = [{'word_id': rng.randint(1, args.words), 'is_correct': True} for _ in range(10)]
+            started = time.perf_counter()
+            response = client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': reviews})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.get_json()
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.5)
+    connection = Db(database=database).connect()
+    started = time.perf_counter()
+    try:
+        migrate(connection, directory=migrations, batch_size=batch_size)
+    finally:
+        duration = time.perf_counter() - started
+        stop.set()
+        thread.join()
+        connection.close()
+        app.db.close_all()
+    return duration, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--review-items', type=int, default=2000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-migrations-')
+    try:
+        migrations = os.path.join(workdir, 'migrations')
+        os.makedirs(migrations)
+        with open(os.path.join(migrations, '0001_review_weight.backfill.sql'), 'w') as file:
+            file.write(ADD_COLUMN)
+        with open(os.path.join(migrations, '0002_review_weight_fill.backfill.sql'), 'w') as file:
+            file.write(FILL)
+
+        print(f'Generating {args.review_items:,} review items...')
+        template = synthetic.generate(os.path.join(workdir, 'template.db'), words=args.words, groups=20,
+                                      sessions=2000, review_items=args.review_items, seed=args.seed)
+        results = {}
+        for label, batch_size in (('per partition', args.review_items * 10), ('batched', args.batch_size)):
+            database = os.path.join(workdir, f'{label.replace(" ", "-")}.db')
+            shutil.copy(template, database)
+            duration, latencies = run(database, migrations, batch_size, args)
+            results[label] = dict(summarize(latencies), backfill_seconds=duration)
+            print(format_row(f'{label}: review writes', results[label]) + f'  backfill={duration:.2f}s')
+
+        if args.output:
+            write_results(args.output, 'migrations', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
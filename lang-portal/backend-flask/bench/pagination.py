@@ -0,0 +1,81 @@
+"""OFFSET vs. keyset (cursor) pagination at page 1 and page 10,000.
+
+    python -m bench.pagination --repeat 20
+
+Builds a synthetic database large enough for 10,000 pages of /api/words
+(50 per page), /api/groups/<id>/words and /api/study-sessions (10 per page),
+then times the same page fetched with `page=` and with the equivalent `cursor=`.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from app import create_app
+from bench import synthetic
+from bench.stats import summarize, format_row
+from lib.pagination import encode_cursor
+
+DEEP_PAGE = 10000
+
+
+def time_request(client, url, query, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, query_string=query)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_json()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # One group holds enough words for 10,000 pages of 10
+    words = DEEP_PAGE * 50 + 50
+    groups = 4
+    sessions = DEEP_PAGE * 10 + 10
+
+    workdir = tempfile.mkdtemp(prefix='bench-pagination-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=words, groups=groups,
+                                  sessions=sessions, review_items=sessions * 2, seed=args.seed)
+        app = create_app({'DATABASE': path})
+        client = app.test_client()
+        connection = sqlite3.connect(path)
+
+        cases = [
+            ('/api/words', {'sort_by': 'italian', 'order': 'asc'}, 50, 'italian', 'asc',
+             'SELECT italian, id FROM words ORDER BY italian, id LIMIT 1 OFFSET ?'),
+            ('/api/groups/1/words', {'sort_by': 'italian', 'order': 'asc'}, 10, 'italian', 'asc',
+             '''SELECT w.italian, w.id FROM words w JOIN word_groups wg ON wg.word_id = w.id
+                WHERE wg.group_id = 1 ORDER BY w.italian, w.id LIMIT 1 OFFSET ?'''),
+            ('/api/study-sessions', {}, 10, 'created_at', 'desc',
+             'SELECT created_at, id FROM study_sessions ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?'),
+        ]
+        for url, sort_query, per_page, sort_by, order, boundary_sql in cases:
+            print(f"\n{url}")
+            for page in (1, 2, DEEP_PAGE):
+                offset_latencies = time_request(client, url, dict(sort_query, page=page), args.repeat)
+                print(format_row(f'page={page} (OFFSET)', summarize(offset_latencies)))
+                if page == 1:
+                    continue  # The first page has no cursor
+
+                # The cursor a client would hold after reading the previous page
+                value, row_id = connection.execute(boundary_sql, ((page - 1) * per_page - 1,)).fetchone()
+                page_cursor = encode_cursor(sort_by, order, value, row_id)
+                cursor_latencies = time_request(client, url, {'cursor': page_cursor}, args.repeat)
+                print(format_row(f'page={page} (cursor)', summarize(cursor_latencies)))
+        connection.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
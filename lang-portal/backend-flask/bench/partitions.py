@@ -0,0 +1,130 @@
+"""Study history reset and retention: DELETEs on one review table vs. dropping monthly partitions.
+
+    python -m bench.partitions --review-items 2000000 --keep-months 6
+
+Generates a synthetic database (a year of reviews), then times each operation's
+write transaction, which is how long it holds the database's write lock, on a
+fresh copy each time:
+
+- single table: the review log copied back into one word_review_items table,
+  reset and retention as the DELETE statements they used to be
+- partitions: clear_study_history and expire_review_items (lib/partitions.py)
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from bench import synthetic
+from lib.partitions import expire_review_items, partition_name, partitions
+from lib.reviews import clear_study_history
+from lib.srs import DEFAULT_EASE
+
+
+def unpartition(path):
+    # Copy the review log back into a single table, as it was before partitioning
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE review_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word_id INTEGER NOT NULL,
+            study_session_id INTEGER NOT NULL,
+            correct BOOLEAN NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO review_log SELECT * FROM word_review_items ORDER BY id;
+        DROP VIEW word_review_items;
+    ''')
+    for table in partitions(connection.cursor()):
+        connection.execute(f'DROP TABLE {table}')
+    connection.executescript('''
+        ALTER TABLE review_log RENAME TO word_review_items;
+        CREATE INDEX idx_word_review_items_study_session_id ON word_review_items(study_session_id);
+        CREATE INDEX idx_word_review_items_word_id ON word_review_items(word_id);
+        CREATE INDEX idx_word_review_items_created_at ON word_review_items(created_at);
+        VACUUM;
+    ''')
+    connection.close()
+
+
+def reset_single_table(cursor):
+    # clear_study_history before partitioning
+    cursor.execute('DELETE FROM word_review_items')
+    cursor.execute('DELETE FROM study_sessions')
+    cursor.execute('''
+        UPDATE word_reviews
+        SET correct_count = 0, wrong_count = 0, last_reviewed = NULL,
+            repetitions = 0, interval_days = 0, ease = ?, due_at = NULL
+        WHERE correct_count > 0 OR wrong_count > 0
+    ''', (DEFAULT_EASE,))
+    cursor.execute('DELETE FROM daily_activity')
+
+
+def expire_single_table(cursor, keep_from):
+    cursor.execute('DELETE FROM word_review_items WHERE created_at < ?', (keep_from,))
+
+
+def timed(path, operation):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    cursor = connection.cursor()
+    cursor.execute('SELECT COUNT(*) FROM word_review_items')
+    before = cursor.fetchone()[0]
+    started = time.perf_counter()
+    cursor.execute('BEGIN IMMEDIATE')
+    operation(cursor)
+    connection.commit()
+    seconds = time.perf_counter() - started
+    cursor.execute('SELECT COUNT(*) FROM word_review_items')
+    removed = before - cursor.fetchone()[0]
+    connection.close()
+    return seconds, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--review-items', type=int, default=1000000)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--keep-months', type=int, default=6, help='retention window for the retention runs')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-partitions-')
+    try:
+        print(f'Generating {args.review_items:,} review items...')
+        partitioned = synthetic.generate(os.path.join(workdir, 'partitioned.db'), words=args.words,
+                                         sessions=args.sessions, review_items=args.review_items, seed=args.seed)
+        single = os.path.join(workdir, 'single.db')
+        shutil.copy(partitioned, single)
+        unpartition(single)
+
+        connection = sqlite3.connect(partitioned)
+        newest = partitions(connection.cursor())[-1]
+        connection.close()
+        index = int(newest[-7:-3]) * 12 + int(newest[-2:]) - 1 - (args.keep_months - 1)
+        keep_from = f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+        runs = [
+            ('reset, single table', single, reset_single_table),
+            ('reset, partitions', partitioned, clear_study_history),
+            ('retention, single table', single, lambda cursor: expire_single_table(cursor, keep_from)),
+            ('retention, partitions', partitioned,
+             lambda cursor: expire_review_items(cursor, args.keep_months) and None),
+        ]
+        print(f'Retention keeps {args.keep_months} months (from {partition_name(keep_from)})')
+        for label, template, operation in runs:
+            path = os.path.join(workdir, 'run.db')
+            shutil.copy(template, path)
+            seconds, removed = timed(path, operation)
+            print(f'{label:28s} {seconds * 1000:10.1f}ms  {removed:>10,} review items removed')
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark results as JSON, tagged with the commit and environment they ran on."""
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def write_results(path, benchmark, args, results):
+    """Save `results` ({name: summary}) with the arguments and environment of the run."""
+    document = {
+        'benchmark': benchmark,
+        'environment': environment(),
+        'args': vars(args),
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+    print(f"\nResults written to {path}")
+
+
+def read_results(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,144 @@
+"""Micro-benchmark of every route through the Flask test client.
+
+    python -m bench.routes --repeat 200 --output routes.json
+
+Builds a synthetic database, then times each case below sequentially (after a
+short warm-up) and prints p50/p95/p99 per case. Routes without a case are listed
+so new endpoints do not go unmeasured. Write cases run against the same database,
+so the reset case runs last.
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from app import create_app
+from bench import synthetic
+from bench.results import write_results
+from bench.stats import summarize, format_row
+
+# (label, method, url, request kwargs); {session} is replaced by a session created for the run
+CASES = [
+    ('GET /api/words', 'GET', '/api/words', {'query_string': {'page': 5, 'sort_by': 'italian'}}),
+    ('GET /api/words (counter sort)', 'GET', '/api/words', {'query_string': {'page': 5, 'sort_by': 'correct_count', 'order': 'desc'}}),
+    ('GET /api/words/<id>', 'GET', '/api/words/42', {}),
+    ('GET /api/words?ids=', 'GET', '/api/words', {'query_string': {'ids': ','.join(map(str, range(1, 2000, 20)))}}),
+    ('POST /api/words/batch', 'POST', '/api/words/batch', {'json': {'ids': list(range(1, 20000, 20))}}),
+    ('GET /api/words/search', 'GET', '/api/words/search', {'query_string': {'q': 'ba'}}),
+    ('GET /api/groups', 'GET', '/api/groups', {}),
+    ('GET /api/groups/<id>', 'GET', '/api/groups/1', {}),
+    ('GET /api/groups/<id>/words', 'GET', '/api/groups/1/words', {'query_string': {'page': 3}}),
+    ('GET /api/groups/<id>/words/raw', 'GET', '/api/groups/1/words/raw', {}),
+    ('GET /api/groups/<id>/due', 'GET', '/api/groups/1/due', {'query_string': {'limit': 20}}),
+    ('GET /api/groups/<id>/study_sessions', 'GET', '/api/groups/1/study_sessions', {}),
+    ('GET /api/study-sessions', 'GET', '/api/study-sessions', {'query_string': {'page': 3}}),
+    ('GET /api/study-sessions?fields=', 'GET', '/api/study-sessions',
+     {'query_string': {'page': 3, 'fields': 'id,group_name,start_time'}}),
+    ('GET /api/study-sessions/<id>', 'GET', '/api/study-sessions/10', {}),
+    ('GET /api/study-activities', 'GET', '/api/study-activities', {}),
+    ('GET /api/study-activities/<id>', 'GET', '/api/study-activities/1', {}),
+    ('GET /api/study-activities/<id>/sessions', 'GET', '/api/study-activities/1/sessions', {}),
+    ('GET /api/study-activities/<id>/launch', 'GET', '/api/study-activities/1/launch', {}),
+    ('GET /dashboard/recent-session', 'GET', '/dashboard/recent-session', {}),
+    ('GET /dashboard/stats', 'GET', '/dashboard/stats', {}),
+    ('GET /dashboard/history', 'GET', '/dashboard/history', {}),
+    ('GET /api/export/groups/<id>/words', 'GET', '/api/export/groups/1/words', {}),
+    ('GET /api/export/study-sessions', 'GET', '/api/export/study-sessions', {'query_string': {'from': '2020-01-01', 'to': '2020-01-31'}}),
+    ('GET /api/export/review-items', 'GET', '/api/export/review-items', {'query_string': {'from': '2020-01-01', 'to': '2020-01-01'}}),
+    ('GET /api/export/words', 'GET', '/api/export/words', {}),
+    ('GET /metrics', 'GET', '/metrics', {}),
+    ('POST /api/study-sessions', 'POST', '/api/study-sessions', {'json': {'group_id': 1, 'study_activity_id': 1}}),
+    ('POST /api/study-sessions/<id>/review', 'POST', '/api/study-sessions/{session}/review',
+     {'json': {'reviews': [{'word_id': word_id, 'is_correct': word_id % 3 != 0} for word_id in range(1, 21)]}}),
+    ('POST /api/study-sessions/reviews', 'POST', '/api/study-sessions/reviews',
+     {'json': [{'session_id': '{session}', 'word_id': word_id, 'is_correct': True} for word_id in range(1, 201)]}),
+    ('POST /api/groups/<id>/words', 'POST', '/api/groups/2/words', {'json': {'word_ids': list(range(1, 20000, 20))}}),
+    ('POST /api/groups/<id>/words/move', 'POST', '/api/groups/2/words/move',
+     {'json': {'word_ids': list(range(1, 20000, 20)), 'to_group_id': 3}}),
+    ('DELETE /api/groups/<id>/words', 'DELETE', '/api/groups/3/words', {'json': {'word_ids': list(range(1, 20000, 20))}}),
+    ('POST /api/study-sessions/reset', 'POST', '/api/study-sessions/reset', {}),
+]
+
+
+def fill_session(value, session_id):
+    # Substitute the run's session id into URLs and JSON bodies
+    if isinstance(value, str):
+        return session_id if value == '{session}' else value.replace('{session}', str(session_id))
+    if isinstance(value, list):
+        return [fill_session(item, session_id) for item in value]
+    if isinstance(value, dict):
+        return {key: fill_session(item, session_id) for key, item in value.items()}
+    return value
+
+
+def run_case(client, method, url, kwargs, repeat, warmup):
+    latencies = []
+    for iteration in range(warmup + repeat):
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()  # Include streamed bodies
+        elapsed = time.perf_counter() - started
+        assert response.status_code < 400, (url, response.status_code, response.get_data()[:200])
+        if iteration >= warmup:
+            latencies.append(elapsed)
+    return latencies
+
+
+def unmeasured_routes(app):
+    measured = {(method, label.split(' ', 2)[1]) for label, method, _, _ in CASES}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        path = re.sub(r'<(?:\w+:)?\w+>', '<id>', rule.rule)
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            if (method, path) not in measured:
+                missing.append(f'{method} {rule.rule}')
+    return sorted(missing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--review-items', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-routes-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, groups=args.groups,
+                                  sessions=args.sessions, review_items=args.review_items, seed=args.seed)
+        app = create_app({'DATABASE': path})
+        client = app.test_client()
+        session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+
+        results = {}
+        for label, method, url, kwargs in CASES:
+            latencies = run_case(client, method, fill_session(url, session_id), fill_session(kwargs, session_id),
+                                 args.repeat, args.warmup)
+            results[label] = summarize(latencies)
+            print(format_row(label, results[label]))
+
+        statements = app.db.statement_stats()
+        print(f"\nNamed statements: {statements['executions']} executions, "
+              f"estimated statement cache hit rate {statements['estimated_hit_rate']:.1%}")
+        results['statement_cache'] = statements
+
+        missing = unmeasured_routes(app)
+        if missing:
+            print(f"\nRoutes without a benchmark case: {', '.join(missing)}")
+        if args.output:
+            write_results(args.output, 'routes', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Latency of /api/words/search on a large vocabulary.
+
+    python -m bench.search --words 1000000
+
+Builds a synthetic database and times search requests through the test client
+for prefixes of existing words, from type-ahead (2 characters) to whole words,
+typed with and without accents. Prints p50/p95/p99 per prefix length.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import unicodedata
+
+from app import create_app
+from bench import synthetic
+from bench.results import write_results
+from bench.stats import summarize, format_row
+
+
+def strip_accents(text):
+    return ''.join(ch for ch in unicodedata.normalize('NFD', text) if unicodedata.category(ch) != 'Mn')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200, help='per prefix length')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-search-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, sessions=100,
+                                  review_items=1000, seed=args.seed)
+        connection = sqlite3.connect(path)
+        rng = random.Random(args.seed)
+        sample = [row[0] for row in connection.execute(
+            'SELECT italian FROM words WHERE id IN (SELECT abs(random()) % ? + 1 FROM words LIMIT ?)',
+            (args.words, args.queries * 2))]
+        connection.close()
+
+        app = create_app({'DATABASE': path})
+        client = app.test_client()
+
+        results = {}
+        for length in (2, 3, 4, 6, None):
+            latencies, matches = [], 0
+            for word in rng.sample(sample, min(args.queries, len(sample))):
+                query = word if length is None else word[:length]
+                # Half the queries are typed without accents
+                if rng.random() < 0.5:
+                    query = strip_accents(query)
+                started = time.perf_counter()
+                response = client.get('/api/words/search', query_string={'q': query})
+                latencies.append(time.perf_counter() - started)
+                matches += len(response.get_json()['words'])
+            label = 'whole word' if length is None else f'{length}-character prefix'
+            results[label] = summarize(latencies)
+            print(format_row(label, results[label]) + f"  avg results={matches / len(latencies):.1f}")
+
+        if args.output:
+            write_results(args.output, 'search', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
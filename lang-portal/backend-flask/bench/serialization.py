@@ -0,0 +1,80 @@
+"""Large JSON responses: encoder, compression and ?fields= vs. payload size and time.
+
+    python -m bench.serialization --rows 100000 --repeat 5
+
+Generates a database with --rows words in one group and --rows study sessions,
+then fetches the 100k-row responses (/api/groups/1/words/raw and
+/api/study-sessions?per_page=<rows>) in-process with each JSON_ENCODER, each
+Accept-Encoding (identity, gzip, and br when the brotli package is installed)
+and with and without a ?fields= subset. Reports the time to produce the whole
+body and its size on the wire.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from bench.results import write_results
+
+
+def measure(client, url, query_string, encoding, repeat):
+    headers = {'Accept-Encoding': encoding} if encoding != 'identity' else {}
+    latencies, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, query_string=query_string, headers=headers)
+        size = len(response.get_data())
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        assert response.headers.get('Content-Encoding', 'identity') == encoding
+    return latencies, size
+
+
+def main():
+    from app import create_app
+    from lib.compression import available_encodings
+    from lib.json_encoding import JSON_PROVIDERS, default_encoder
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    cases = [
+        ('words raw', '/api/groups/1/words/raw', {}),
+        ('words raw (italian)', '/api/groups/1/words/raw', {'fields': 'italian'}),
+        ('sessions', '/api/study-sessions', {'per_page': args.rows}),
+        ('sessions (id,start_time)', '/api/study-sessions', {'per_page': args.rows, 'fields': 'id,start_time'}),
+    ]
+    encoders = ['json'] + (['orjson'] if default_encoder() == 'orjson' else [])
+    workdir = tempfile.mkdtemp(prefix='bench-serialization-')
+    try:
+        print(f'Generating {args.rows:,} words and sessions...')
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.rows, groups=1,
+                                  sessions=args.rows, review_items=args.rows, seed=args.seed)
+        results = {}
+        for encoder in encoders:
+            assert encoder in JSON_PROVIDERS
+            app = create_app({'DATABASE': path, 'METRICS_ENABLED': False, 'JSON_ENCODER': encoder})
+            client = app.test_client()
+            for label, url, query_string in cases:
+                for encoding in ('identity',) + available_encodings():
+                    latencies, size = measure(client, url, query_string, encoding, args.repeat)
+                    name = f'{label}, {encoder}, {encoding}'
+                    results[name] = dict(summarize(latencies), bytes=size)
+                    print(format_row(name, results[name]) + f'  {size / 1024 / 1024:7.2f} MiB')
+            app.db.close_all()
+
+        if args.output:
+            write_results(args.output, 'serialization', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Review write throughput: one shared database vs. per-learner shards.
+
+    python -m bench.shards --writers 1 2 4 8 --duration 10
+
+Each writer is a separate process (as with several server workers) running the
+app in-process for one learner: it creates a study session and posts batches of
+--batch reviews to /api/study-sessions/<id>/review for --duration seconds.
+
+- single: every writer uses the same words.db, so commits queue on its write lock
+- sharded: every writer is a different learner with its own shard (DB_SHARDS_DIR)
+  next to the read-only dictionary
+
+Reports reviews/s and post latency for each writer count.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from bench.results import write_results
+
+
+def writer(config, learner, args, start_at):
+    from app import create_app
+    app = create_app(config)
+    client = app.test_client()
+    headers = {'X-Learner-Id': learner} if config.get('DB_SHARDS_DIR') else {}
+    rng = random.Random(learner)
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1},
+                             headers=headers).get_json()['session_id']
+
+    # Start together, after every process has set up its app
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        reviews = [{'word_id': rng.randint(1, args.words), 'is_correct': rng.random() < 0.7} for _ in range(args.batch)]
+        started = time.perf_counter()
+        response = client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': reviews}, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+    app.db.close_all()
+    return latencies, errors
+
+
+def run(config, writers, args):
+    start_at = time.time() + 3.0
+    with multiprocessing.get_context('spawn').Pool(writers) as pool:
+        results = pool.starmap(writer, [(config, f'learner-{index}', args, start_at) for index in range(writers)])
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    errors = sum(worker_errors for _, worker_errors in results)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--batch', type=int, default=20, help='reviews per post')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-shards-')
+    try:
+        template = synthetic.generate(os.path.join(workdir, 'template.db'), words=args.words, groups=20,
+                                      sessions=100, review_items=10000, seed=args.seed)
+        results = {}
+        for writers in args.writers:
+            for mode in ('single', 'sharded'):
+                rundir = os.path.join(workdir, f'{mode}-{writers}')
+                os.makedirs(rundir)
+                database = os.path.join(rundir, 'words.db')
+                shutil.copy(template, database)
+                config = {'DATABASE': database, 'METRICS_ENABLED': False}
+                if mode == 'sharded':
+                    config['DB_SHARDS_DIR'] = os.path.join(rundir, 'learners')
+
+                latencies, errors = run(config, writers, args)
+                summary = dict(summarize(latencies), errors=errors,
+                               reviews_per_second=len(latencies) * args.batch / args.duration)
+                label = f'{mode} {writers} writers'
+                results[label] = summary
+                print(format_row(label, summary) + f"  {summary['reviews_per_second']:9,.0f} reviews/s  errors={errors}")
+
+        if args.output:
+            write_results(args.output, 'shards', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Heavy dashboard and export reads next to review writes: live database vs. read snapshots.
+
+    python -m bench.snapshots --writers 2 --readers 2 --duration 20
+
+Runs --writers processes posting batches of reviews and --readers processes
+looping over full review log exports and the year's /dashboard/history, all in
+the app in-process on the same database file, for --duration seconds:
+
+- live: the readers query words.db itself
+- snapshot: the readers query a copy refreshed every --max-age seconds (lib/snapshots.py)
+
+Reports latency and errors per side, and the largest size the WAL reached: a
+reader on the live database pins the WAL for the length of its read, so
+checkpoints cannot restart it while reviews keep being appended.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from bench.results import write_results
+
+
+def writer(config, index, args, start_at):
+    from app import create_app
+    app = create_app(config)
+    client = app.test_client()
+    rng = random.Random(index)
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        reviews = [{'word_id': rng.randint(1, args.words), 'is_correct': rng.random() < 0.7} for _ in range(args.batch)]
+        started = time.perf_counter()
+        response = client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': reviews})
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+    app.db.close_all()
+    return latencies, errors
+
+
+def reader(config, index, args, start_at):
+    from app import create_app
+    app = create_app(config)
+    client = app.test_client()
+
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        for url in ('/api/export/review-items', '/dashboard/history', '/dashboard/stats'):
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+    if app.snapshots is not None:
+        app.snapshots.remove()
+    app.db.close_all()
+    return latencies, errors
+
+
+def run(config, args):
+    start_at = time.time() + 3.0
+    wal = config['DATABASE'] + '-wal'
+    jobs = [(writer, index) for index in range(args.writers)] + [(reader, index) for index in range(args.readers)]
+    with multiprocessing.get_context('spawn').Pool(len(jobs)) as pool:
+        pending = [pool.apply_async(job, (config, index, args, start_at)) for job, index in jobs]
+        wal_max = 0
+        while not all(result.ready() for result in pending):
+            if os.path.exists(wal):
+                wal_max = max(wal_max, os.path.getsize(wal))
+            time.sleep(0.05)
+        results = [result.get() for result in pending]
+    sides = {'writes': results[:args.writers], 'reads': results[args.writers:]}
+    return {side: ([latency for latencies, _ in runs for latency in latencies], sum(errors for _, errors in runs))
+            for side, runs in sides.items()}, wal_max
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per run')
+    parser.add_argument('--batch', type=int, default=20, help='reviews per post')
+    parser.add_argument('--max-age', type=float, default=2.0, help='SNAPSHOT_MAX_AGE of the snapshot run')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--review-items', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-snapshots-')
+    try:
+        print(f'Generating {args.review_items:,} review items...')
+        template = synthetic.generate(os.path.join(workdir, 'template.db'), words=args.words, groups=20,
+                                      sessions=2000, review_items=args.review_items, seed=args.seed)
+        results = {}
+        for mode in ('live', 'snapshot'):
+            rundir = os.path.join(workdir, mode)
+            os.makedirs(rundir)
+            database = os.path.join(rundir, 'words.db')
+            shutil.copy(template, database)
+            config = {'DATABASE': database, 'METRICS_ENABLED': False}
+            if mode == 'snapshot':
+                config['SNAPSHOT_MAX_AGE'] = args.max_age
+
+            sides, wal_max = run(config, args)
+            for side, (latencies, errors) in sides.items():
+                label = f'{mode} {side}'
+                results[label] = dict(summarize(latencies), errors=errors)
+                print(format_row(label, results[label]) + f'  errors={errors}')
+            results[f'{mode} wal'] = {'max_bytes': wal_max}
+            print(f'{mode} largest WAL: {wal_max / 1024 / 1024:.1f} MiB')
+
+        if args.output:
+            write_results(args.output, 'snapshots', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Spaced repetition scheduling throughput.
+
+    python -m bench.srs --replay 5000000 --days 365 --groups-per-day 20 --words-per-session 150
+
+Two measurements:
+
+1. Scheduler replay: --replay reviews spread over the vocabulary are folded through
+   lib.srs.schedule in memory, the way rebuild_aggregates replays the review log.
+2. Study simulation: for --days simulated days a learner studies --groups-per-day
+   groups. Each session reads the group's due queue (the SQL behind
+   /api/groups/<id>/due, at the simulated time), answers each word with a
+   forgetting-curve recall probability and writes the answers with record_reviews,
+   one transaction per session. Reports reviews/s end to end and inside
+   record_reviews, due-queue latency, and the share of answers the memory model
+   recalled under the schedule.
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from lib.reviews import record_reviews
+from lib.srs import NEW_STATE, TIMESTAMP_FORMAT, schedule
+from lib.statements import Statements
+
+
+def replay(reviews, words, seed):
+    rng = random.Random(seed)
+    answers = [rng.random() < 0.8 for _ in range(100003)]
+    states = {}
+    started = time.perf_counter()
+    for index in range(reviews):
+        word_id = index % words
+        states[word_id] = schedule(states.get(word_id, NEW_STATE), answers[index % len(answers)])
+    return time.perf_counter() - started
+
+
+def simulate(path, args):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    cursor = connection.cursor()
+    statements = Statements()
+    due_sql, new_sql = statements.get('groups/due'), statements.get('groups/due_new')
+    groups = [row[0] for row in cursor.execute('SELECT id FROM groups')]
+
+    rng = random.Random(args.seed)
+    # Hidden memory model: recall decays as exp(-days since last seen / stability); a
+    # recalled word's stability triples, a forgotten one's halves
+    stability, last_seen = {}, {}
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    due_latencies, reviews, correct = [], 0, 0
+    record_seconds = 0.0
+    started = time.perf_counter()
+    for day in range(args.days):
+        for session, group_id in enumerate(rng.sample(groups, min(args.groups_per_day, len(groups)))):
+            now = start + timedelta(days=day, minutes=30 * session)
+            stamp = now.strftime(TIMESTAMP_FORMAT)
+
+            queue_started = time.perf_counter()
+            words = [row[0] for row in cursor.execute(due_sql, (group_id, stamp, args.words_per_session))]
+            if len(words) < args.words_per_session:
+                words += [row[0] for row in cursor.execute(new_sql, (group_id, args.words_per_session - len(words)))]
+            due_latencies.append(time.perf_counter() - queue_started)
+
+            answers = []
+            for position, word_id in enumerate(words):
+                if word_id in last_seen:
+                    elapsed = (now - last_seen[word_id]).total_seconds() / 86400
+                    recalled = rng.random() < math.exp(-elapsed / stability[word_id])
+                    stability[word_id] = stability[word_id] * 3 if recalled else max(1.0, stability[word_id] / 2)
+                else:
+                    recalled = rng.random() < 0.5
+                    stability[word_id] = 4.0 if recalled else 1.5
+                last_seen[word_id] = now
+                answers.append((word_id, recalled, (now + timedelta(seconds=5 * position)).strftime(TIMESTAMP_FORMAT)))
+
+            write_started = time.perf_counter()
+            cursor.execute('INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (?, 1, ?)',
+                           (group_id, stamp))
+            session_id = cursor.lastrowid
+            record_reviews(cursor, [(session_id, word_id, recalled, created_at) for word_id, recalled, created_at in answers])
+            record_seconds += time.perf_counter() - write_started
+            connection.commit()
+
+            reviews += len(answers)
+            correct += sum(1 for _, recalled, _ in answers if recalled)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return reviews, correct, elapsed, record_seconds, due_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replay', type=int, default=5000000, help='reviews folded through the scheduler in memory')
+    parser.add_argument('--words', type=int, default=50000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--groups-per-day', type=int, default=20)
+    parser.add_argument('--words-per-session', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    seconds = replay(args.replay, args.words, args.seed)
+    print(f"replay      {args.replay} reviews in {seconds:.2f}s ({args.replay / seconds:,.0f} reviews/s)")
+
+    workdir = tempfile.mkdtemp(prefix='bench-srs-')
+    try:
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, groups=args.groups,
+                                  sessions=0, review_items=0, seed=args.seed)
+        reviews, correct, elapsed, record_seconds, due_latencies = simulate(path, args)
+        print(f"simulation  {reviews} reviews over {args.days} days in {elapsed:.1f}s ({reviews / elapsed:,.0f} reviews/s "
+              f"with a commit per session, {reviews / record_seconds:,.0f} reviews/s in record_reviews)")
+        print(f"            simulated recall {correct / reviews:.1%}")
+        print(format_row('due queue', summarize(due_latencies)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
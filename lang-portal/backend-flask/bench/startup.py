@@ -0,0 +1,79 @@
+"""Startup time: cold import of app.py, create_app and the first requests, in fresh processes.
+
+    python -m bench.startup --repeat 10
+    python -m bench.startup --database words.db --url /api/groups
+
+Each run starts a new interpreter, imports app.py, creates the app, then sends
+--url twice with an Origin header (the first request opens the pooled
+connection and reads the data versions and allowed origins). Reports each
+phase, and the process wall time from spawn to the first response.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+from bench.results import write_results
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app({"DATABASE": sys.argv[1], "METRICS_ENABLED": False})
+created = time.perf_counter()
+client = flask_app.test_client()
+timings = {"import app": imported - started, "create_app": created - imported}
+for label in ("first request", "second request"):
+    before = time.perf_counter()
+    response = client.get(sys.argv[2], headers={"Origin": "http://localhost:8080"})
+    response.get_data()
+    assert response.status_code == 200, response.status_code
+    timings[label] = time.perf_counter() - before
+timings["import to first response"] = sum(timings[key] for key in ("import app", "create_app", "first request"))
+print(json.dumps(timings))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--url', default='/api/study-activities')
+    parser.add_argument('--database', help='an existing database (default: a synthetic one)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    try:
+        database = args.database or synthetic.generate(os.path.join(workdir, 'bench.db'), seed=args.seed)
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        phases = {}
+        for _ in range(args.repeat):
+            spawned = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', CHILD, os.path.abspath(database), args.url],
+                                    cwd=cwd, check=True, capture_output=True, text=True).stdout
+            wall = time.perf_counter() - spawned
+            timings = json.loads(output.splitlines()[-1])
+            timings['process wall time'] = wall
+            for label, seconds in timings.items():
+                phases.setdefault(label, []).append(seconds)
+
+        results = {}
+        for label, latencies in phases.items():
+            results[label] = summarize(latencies)
+            print(format_row(label, results[label]))
+        if args.output:
+            write_results(args.output, 'startup', args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
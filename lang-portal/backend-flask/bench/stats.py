@@ -0,0 +1,32 @@
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    """Summarize latencies (in seconds) as milliseconds."""
+    if not latencies:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def format_row(label, summary):
+    return (
+        f"{label:<45} n={summary['count']:<6} "
+        f"p50={summary['p50_ms']:8.2f}ms  p95={summary['p95_ms']:8.2f}ms  "
+        f"p99={summary['p99_ms']:8.2f}ms  max={summary['max_ms']:8.2f}ms"
+    )
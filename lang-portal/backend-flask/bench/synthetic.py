@@ -0,0 +1,141 @@
+"""Deterministic synthetic lang-portal database generator.
+
+    python -m bench.synthetic bench.db --words 100000 --sessions 20000 --review-items 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from lib.db import Db
+from lib.partitions import insert_review_items
+from lib.reviews import rebuild_aggregates
+
+SYLLABLES = [
+    'ba', 'be', 'ca', 'ce', 'chi', 'da', 'de', 'fa', 'fe', 'ga', 'gli', 'la', 'le', 'lo',
+    'ma', 'me', 'na', 'ne', 'no', 'pa', 'pe', 'ra', 're', 'ri', 'sa', 'se', 'ta', 'te',
+    'to', 'va', 've', 'za', 'ché', 'tà', 'rò', 'più',
+]
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _word(rng, alphabet, min_parts, max_parts):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(min_parts, max_parts)))
+
+
+def generate(path, words=10000, groups=20, sessions=2000, review_items=100000,
+             days=365, seed=42, now=None, batch_size=50000):
+    """Create a fresh database at ``path`` filled with synthetic study data.
+
+    The same arguments always produce the same rows, except that timestamps are
+    relative to ``now`` (defaults to the current UTC time).
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(microsecond=0)
+
+    # Create the schema through Db so the synthetic database matches words.db
+    database = Db(database=path)
+    app = Flask(__name__)
+    with app.app_context():
+        database.setup_tables(database.cursor())
+        database.close()
+    database.close_all()
+
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+
+    cursor.execute('''
+        INSERT INTO study_activities (name, url, preview_url)
+        VALUES ('Typing Tutor', 'http://localhost:8080', '/assets/study_activities/typing-tutor.png')
+    ''')
+    cursor.executemany(
+        'INSERT INTO groups (id, name) VALUES (?, ?)',
+        ((group_id, f'Group {group_id:04d}') for group_id in range(1, groups + 1))
+    )
+
+    def word_rows():
+        for word_id in range(1, words + 1):
+            yield (word_id, _word(rng, LETTERS, 3, 10), _word(rng, SYLLABLES, 2, 5))
+
+    cursor.executemany('INSERT INTO words (id, english, italian) VALUES (?, ?, ?)', word_rows())
+
+    # Every word belongs to one group; every tenth word also to a second one
+    def membership_rows():
+        for word_id in range(1, words + 1):
+            group_id = (word_id - 1) % groups + 1
+            yield (word_id, group_id)
+            if groups > 1 and word_id % 10 == 0:
+                yield (word_id, group_id % groups + 1)
+
+    # The word_groups triggers count them into groups.words_count
+    cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', membership_rows())
+
+    # Sessions are created in chronological order so ids grow with created_at
+    start = now - timedelta(days=days)
+    offsets = sorted(rng.randint(0, days * 86400 - 3600) for _ in range(sessions))
+    session_starts = [start + timedelta(seconds=offset) for offset in offsets]
+    cursor.executemany(
+        'INSERT INTO study_sessions (id, group_id, study_activity_id, created_at) VALUES (?, ?, 1, ?)',
+        ((session_id, rng.randint(1, groups), session_starts[session_id - 1].strftime(TIMESTAMP_FORMAT))
+         for session_id in range(1, sessions + 1))
+    )
+
+    def review_rows():
+        per_session = review_items // sessions if sessions else 0
+        remainder = review_items - per_session * sessions if sessions else 0
+        for session_id in range(1, sessions + 1):
+            count = per_session + (1 if session_id <= remainder else 0)
+            session_start = session_starts[session_id - 1]
+            for position in range(count):
+                created_at = session_start + timedelta(seconds=5 * position)
+                yield (
+                    session_id,
+                    rng.randint(1, words),
+                    1 if rng.random() < 0.7 else 0,
+                    created_at.strftime(TIMESTAMP_FORMAT)
+                )
+
+    rows = review_rows()
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        # Into each review's monthly partition (lib/partitions.py)
+        insert_review_items(cursor, batch)
+
+    # Derive the aggregates the write path would have maintained
+    rebuild_aggregates(cursor)
+
+    connection.commit()
+    # Leave the file in the default rollback-journal mode; Db switches it to WAL on connect
+    connection.execute('PRAGMA journal_mode = DELETE')
+    connection.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--words', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--review-items', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.path, words=args.words, groups=args.groups, sessions=args.sessions,
+             review_items=args.review_items, days=args.days, seed=args.seed)
+    print(f"Generated {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Looking up n words: one GET /api/words/<id> per word vs. one POST /api/words/batch.
+
+    python -m bench.word_batch --ids 10 100 1000 --repeat 5
+    python -m bench.word_batch --url http://localhost:8000 --words 54 --ids 10 50
+
+Runs in-process on a synthetic database by default, or against a running server
+with --url, where every request also pays a network round trip. Reports the time
+to resolve the same random ids both ways.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench import synthetic
+from bench.stats import summarize, format_row
+
+
+class HttpClient:
+    # The two calls of the Flask test client the benchmark uses, over HTTP
+    def __init__(self, url):
+        import requests
+        self.session = requests.Session()
+        self.url = url.rstrip('/')
+
+    def get(self, path):
+        return self.session.get(self.url + path)
+
+    def post(self, path, json):
+        return self.session.post(self.url + path, json=json)
+
+
+def one_by_one(client, ids):
+    for word_id in ids:
+        response = client.get(f'/api/words/{word_id}')
+        assert response.status_code == 200, response.status_code
+
+
+def batch(client, ids):
+    response = client.post('/api/words/batch', json={'ids': ids})
+    assert response.status_code == 200, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ids', type=int, nargs='+', default=[10, 100, 1000], help='words per lookup')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--url', help='benchmark a running server instead of an in-process app')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = None
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        from app import create_app
+        workdir = tempfile.mkdtemp(prefix='bench-word-batch-')
+        path = synthetic.generate(os.path.join(workdir, 'bench.db'), words=args.words, groups=20,
+                                  sessions=100, review_items=10000, seed=args.seed)
+        client = create_app({'DATABASE': path, 'METRICS_ENABLED': False}).test_client()
+
+    try:
+        rng = random.Random(args.seed)
+        for count in args.ids:
+            ids = rng.sample(range(1, args.words + 1), min(count, args.words))
+            for label, lookup in (('one GET per word', one_by_one), ('one batch POST', batch)):
+                latencies = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    lookup(client, ids)
+                    latencies.append(time.perf_counter() - started)
+                print(format_row(f'{len(ids):>5} words, {label}', summarize(latencies)))
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# ASGI front end for the Flask app (see asgi.py).
+#
+# The event loop owns the client connections: accepting them, keeping idle ones
+# open and reading request bodies all happen on it, so a connection that is not
+# running a request costs a coroutine instead of a thread. Each request is then
+# run through the unchanged WSGI app on a dedicated executor whose size matches
+# the SQLite connection pool, so at most that many requests touch the database
+# at once and every executor thread can always check out a connection. Requests
+# beyond that wait on the event loop, not on the pool.
+#
+# A request runs on one executor thread from start to end, including iterating a
+# streamed response (exports): Flask's request context and the pooled connection
+# stay on that thread, and each chunk is handed to the event loop and sent
+# before the next one is produced, so a slow client throttles its own export.
+
+# Request bodies up to this size are buffered in memory, larger ones in a temporary file
+BODY_SPOOL_SIZE = 1024 * 1024
+
+class AsgiApp:
+  def __init__(self, wsgi_app, threads, on_shutdown=None):
+    self.wsgi_app = wsgi_app
+    self.threads = threads
+    self.on_shutdown = on_shutdown
+    self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='db')
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      await self.lifespan(receive, send)
+      return
+    if scope['type'] != 'http':
+      raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    body = await self.read_body(receive)
+    if body is None:
+      return  # The client went away before sending the whole request
+
+    loop = asyncio.get_running_loop()
+    def send_from_thread(message):
+      asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    try:
+      await loop.run_in_executor(self.executor, self.run_request, self.environ(scope, body), send_from_thread)
+    finally:
+      body.close()
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  def shutdown(self):
+    """Wait for running requests, then release resources (e.g. pooled connections)."""
+    self.executor.shutdown(wait=True)
+    if self.on_shutdown:
+      self.on_shutdown()
+
+  async def read_body(self, receive):
+    body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+    while True:
+      message = await receive()
+      if message['type'] == 'http.disconnect':
+        body.close()
+        return None
+      body.write(message.get('body', b''))
+      if not message.get('more_body', False):
+        body.seek(0)
+        return body
+
+  @staticmethod
+  def environ(scope, body):
+    """The WSGI environ (PEP 3333) of an ASGI http scope."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+      'REQUEST_METHOD': scope['method'],
+      'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+      'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+      'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+      'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+      'SERVER_NAME': server[0],
+      'SERVER_PORT': str(server[1]),
+      'wsgi.version': (1, 0),
+      'wsgi.url_scheme': scope.get('scheme', 'http'),
+      'wsgi.input': body,
+      'wsgi.errors': sys.stderr,
+      'wsgi.multithread': True,
+      'wsgi.multiprocess': False,
+      'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+      environ['REMOTE_ADDR'] = scope['client'][0]
+      environ['REMOTE_PORT'] = str(scope['client'][1])
+
+    for name, value in scope.get('headers', []):
+      name, value = name.decode('latin1').upper().replace('-', '_'), value.decode('latin1')
+      if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+        name = f'HTTP_{name}'
+      environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+  def run_request(self, environ, send):
+    """Run one WSGI request on the current (executor) thread, sending the response with `send`."""
+    response = {'started': False}
+
+    def start_response(status, headers, exc_info=None):
+      if exc_info and response['started']:
+        raise exc_info[1].with_traceback(exc_info[2])
+      response['status'] = int(status.split(' ', 1)[0])
+      response['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+      return write
+
+    def write(data, more_body=True):
+      if not response['started']:
+        send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        response['started'] = True
+      if data or not more_body:
+        send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+    chunks = self.wsgi_app(environ, start_response)
+    try:
+      for chunk in chunks:
+        write(chunk)
+      write(b'', more_body=False)
+    finally:
+      if hasattr(chunks, 'close'):
+        chunks.close()
@@ -0,0 +1,38 @@
+# Batch lookups by id.
+#
+# GET /api/words?ids= and POST /api/words/batch resolve many ids with one query: the
+# ids are bound as a single JSON array parameter and joined through json_each, so
+# the SQL text is the same whatever the number of ids (one cached statement, and
+# no limit on bound parameters).
+
+class InvalidIds(ValueError):
+  pass
+
+def _parse_id(value):
+  if isinstance(value, str):
+    value = value.strip()
+    if not value.isdigit():
+      raise InvalidIds(f'Invalid id: {value!r}')
+    value = int(value)
+  elif isinstance(value, bool) or not isinstance(value, int):
+    raise InvalidIds(f'Invalid id: {value!r}')
+  if value < 1:
+    raise InvalidIds(f'Invalid id: {value!r}')
+  return value
+
+def parse_ids(values, limit):
+  """The distinct ids in `values`, in first-seen order.
+
+  `values` holds ints (a JSON body) or strings of comma-separated ints (query
+  parameters). Raises InvalidIds if one is not a positive integer, or if there
+  are none or more than `limit`.
+  """
+  ids = {}
+  for value in values:
+    for item in value.split(',') if isinstance(value, str) else [value]:
+      ids[_parse_id(item)] = True
+  if not ids:
+    raise InvalidIds('Expected at least one id')
+  if len(ids) > limit:
+    raise InvalidIds(f'At most {limit} ids per request')
+  return list(ids)
@@ -0,0 +1,94 @@
+import zlib
+
+from flask import current_app, g, request
+
+try:
+  import brotli
+except ImportError:  # Optional: without it only gzip is offered
+  brotli = None
+
+# Response compression.
+#
+# A response is compressed with the first of COMPRESSION_ENCODINGS the client
+# accepts (Accept-Encoding); by default br (with the brotli package installed),
+# then gzip. Bodies smaller than COMPRESSION_MIN_BYTES are sent as they are.
+# Streamed responses (the exports) are compressed chunk by chunk, each chunk
+# flushed, so the client still receives rows as they are read.
+#
+# Each encoding of a resource is a representation of its own, so the negotiated
+# encoding is also part of the ETag (lib/http_cache.py).
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+def available_encodings():
+  return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding():
+  """The encoding the current response is sent with, or None for identity."""
+  if 'content_encoding' not in g:
+    encodings = current_app.config['COMPRESSION_ENCODINGS']
+    g.content_encoding = request.accept_encodings.best_match(encodings) if encodings else None
+  return g.content_encoding
+
+class Compressor:
+  """Incremental compression: compress() chunks, flush() what is pending, finish() the stream."""
+
+  def __init__(self, encoding):
+    if encoding == 'br':
+      self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+      self._zlib = None
+    elif encoding == 'gzip':
+      self._brotli = None
+      self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    else:
+      raise ValueError(f'Unsupported encoding: {encoding}')
+
+  def compress(self, data):
+    return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+  def flush(self):
+    return self._brotli.flush() if self._brotli else self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self._brotli.finish() if self._brotli else self._zlib.flush(zlib.Z_FINISH)
+
+def compress(data, encoding):
+  compressor = Compressor(encoding)
+  return compressor.compress(data) + compressor.finish()
+
+def _compress_stream(chunks, encoding):
+  compressor = Compressor(encoding)
+  try:
+    for chunk in chunks:
+      if isinstance(chunk, str):
+        chunk = chunk.encode('utf-8')
+      data = compressor.compress(chunk) + compressor.flush()
+      if data:
+        yield data
+    yield compressor.finish()
+  finally:
+    # Close the wrapped generator too (e.g. a client that went away mid-export)
+    if hasattr(chunks, 'close'):
+      chunks.close()
+
+def compress_response(response):
+  """after_request hook compressing the response with the negotiated encoding."""
+  if not current_app.config['COMPRESSION_ENCODINGS']:
+    return response
+  response.vary.add('Accept-Encoding')
+  encoding = negotiate_encoding()
+  if (encoding is None or response.status_code != 200 or 'Content-Encoding' in response.headers
+      or response.mimetype not in COMPRESSIBLE_TYPES):
+    return response
+
+  if response.is_streamed:
+    response.response = _compress_stream(response.response, encoding)
+  else:
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESSION_MIN_BYTES']:
+      return response
+    response.set_data(compress(body, encoding))
+  response.headers['Content-Encoding'] = encoding
+  return response
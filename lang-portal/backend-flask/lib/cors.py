@@ -0,0 +1,114 @@
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+from flask_cors.core import ACL_ORIGIN, FLASK_CORS_EVALUATED, get_cors_options, set_cors_headers
+
+# Allowed CORS origins.
+#
+# The API is called from the study activities' pages, so the allowed origins are
+# those of the study_activities URLs (https://example.com/app -> https://example.com),
+# or every origin while there are none. OriginRegistry reads them on first use, not
+# when the app is created, and re-reads them when the data version of
+# study_activities moves, checked at most every `ttl` seconds: a new activity is
+# allowed without restarting the server.
+#
+# It is set as CORS_ORIGINS, which flask-cors resolves on every request to a
+# @cross_origin() route; responses of other routes (and errors) get the same
+# headers from cors_after_request.
+
+logger = logging.getLogger(__name__)
+
+ACTIVITIES_VERSION_SQL = "SELECT version FROM data_versions WHERE table_name = 'study_activities'"
+
+def origins_from_urls(urls):
+  origins = set()
+  for url in urls:
+    parsed = urlparse(url or '')
+    if parsed.scheme and parsed.netloc:
+      origins.add(f'{parsed.scheme}://{parsed.netloc}')
+  return origins
+
+class OriginRegistry:
+  """The origins allowed to call the API, kept in step with study_activities."""
+
+  def __init__(self, database, ttl=1.0, extra_origins=()):
+    # study_activities lives in `database` (the shared dictionary in per-learner mode)
+    self.database = database
+    self.ttl = ttl
+    self.extra_origins = tuple(extra_origins)
+    self.loads = 0
+    self._lock = threading.Lock()
+    self._connection = None
+    self._version = None
+    self._origins = None
+    self._checked_at = None
+    self._options = {}  # resource options -> flask-cors options for the current origins
+
+  def _connect(self):
+    if self._connection is None:
+      self._connection = sqlite3.connect(f'file:{quote(self.database)}?mode=ro', uri=True,
+                                         check_same_thread=False)  # Used under self._lock
+    return self._connection
+
+  def _refresh(self):
+    try:
+      connection = self._connect()
+      row = connection.execute(ACTIVITIES_VERSION_SQL).fetchone()
+      version = row[0] if row else 0
+      if self._origins is None or version != self._version:
+        urls = [url for (url,) in connection.execute('SELECT url FROM study_activities')]
+        origins = origins_from_urls(urls)
+        self._origins = sorted(origins | set(self.extra_origins)) if origins else ['*']
+        self._version = version
+        self._options = {}
+        self.loads += 1
+    except sqlite3.Error as e:
+      # Not initialized yet (or unreadable): keep the last origins, or allow every origin
+      logger.warning('Could not read the study activity origins: %s', e)
+      if self._origins is None:
+        self._origins = ['*']
+      self._version = None
+    self._checked_at = time.monotonic()
+
+  def origins(self):
+    with self._lock:
+      if self._checked_at is None or time.monotonic() - self._checked_at > self.ttl:
+        self._refresh()
+      return self._origins
+
+  def __iter__(self):
+    return iter(self.origins())
+
+  def invalidate(self):
+    with self._lock:
+      self._checked_at = None
+
+  def options(self, app, **resource):
+    """flask-cors options for the current origins and `resource` (methods, allow_headers)."""
+    origins = self.origins()
+    key = repr(sorted(resource.items()))
+    with self._lock:
+      cached = self._options.get(key)
+      if cached is None or cached[0] is not origins:
+        cached = (origins, get_cors_options(app, resource, {'origins': origins}))
+        self._options[key] = cached
+      return cached[1]
+
+  def close(self):
+    with self._lock:
+      if self._connection is not None:
+        self._connection.close()
+        self._connection = None
+
+def cors_after_request(app, registry, **resource):
+  """An after_request hook adding CORS headers to responses no @cross_origin() route handled."""
+  def apply_cors(response):
+    if getattr(response, FLASK_CORS_EVALUATED, False) or response.headers.get(ACL_ORIGIN):
+      return response
+    set_cors_headers(response, registry.options(app, **resource))
+    setattr(response, FLASK_CORS_EVALUATED, True)
+    return response
+  return apply_cors
@@ -1,35 +1,236 @@
 import sqlite3
 import json
+import queue
+import threading
+import time
+from collections import OrderedDict
 from flask import g
 
+from lib.importer import import_words
+from lib.metrics import InstrumentedCursor
+from lib.migrations import mark_applied, migrate, setup_schema_version
+from lib.partitions import setup_review_items
+from lib.reviews import rebuild_aggregates
+from lib.statements import Statements
+from lib.versions import bump_versions
+
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=8, pool_timeout=30.0,
+               busy_timeout_ms=5000, cache_size_kib=16384, mmap_size=268435456,
+               cached_statements=256, statements=None, metrics=None):
     self.database = database
     self.connection = None
 
+    # Request cursors report statement time and rows here when set (see lib/metrics.py)
+    self.metrics = metrics
+
+    # Named SQL, read from sql/ once (see lib/statements.py)
+    self.statements = statements or Statements()
+
+    # Pool and per-connection settings
+    self.pool_size = pool_size
+    self.pool_timeout = pool_timeout
+    self.busy_timeout_ms = busy_timeout_ms
+    self.cache_size_kib = cache_size_kib
+    self.mmap_size = mmap_size
+    self.cached_statements = cached_statements
+
+    # Idle connections; LIFO so the most recently used (warmest) connection is reused first
+    self._pool = queue.LifoQueue()
+    self._lock = threading.Lock()
+    self._opened = 0
+    self._in_use = 0
+    self._checkouts = 0
+    self._waits = 0
+    self._wait_seconds = 0.0
+    self._max_wait_seconds = 0.0
+
+    # Per-connection mirror of sqlite3's statement cache (an LRU of SQL strings of
+    # size cached_statements), used to count how often execute() reuses a statement
+    self._prepared = {}
+    self._statement_hits = 0
+    self._statement_misses = 0
+
+  # Open a new connection and apply the per-connection settings
+  def connect(self, database=None, uri=False):
+    connection = sqlite3.connect(
+      database or self.database,
+      timeout=self.busy_timeout_ms / 1000,
+      check_same_thread=False,  # Connections move between request threads via the pool
+      cached_statements=self.cached_statements,
+      uri=uri
+    )
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+    connection.execute(f'PRAGMA cache_size = -{int(self.cache_size_kib)}')
+    connection.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+    connection.execute('PRAGMA temp_store = MEMORY')
+    with self._lock:
+      self._prepared[id(connection)] = OrderedDict()
+    return connection
+
+  def _discard(self, connection):
+    with self._lock:
+      self._opened -= 1
+      self._prepared.pop(id(connection), None)
+    connection.close()
+
+  # Check a connection out of the pool, opening a new one while below pool_size.
+  # `learner` only applies to per-learner databases (lib/shards.py).
+  def acquire(self, learner=None):
+    started = time.perf_counter()
+    connection = None
+    try:
+      connection = self._pool.get_nowait()
+    except queue.Empty:
+      with self._lock:
+        can_open = self._opened < self.pool_size
+        if can_open:
+          self._opened += 1
+      if can_open:
+        try:
+          connection = self.connect()
+        except Exception:
+          with self._lock:
+            self._opened -= 1
+          raise
+      else:
+        try:
+          connection = self._pool.get(timeout=self.pool_timeout)
+        except queue.Empty:
+          raise sqlite3.OperationalError(
+            f'Timed out after {self.pool_timeout}s waiting for a database connection'
+          )
+        waited = time.perf_counter() - started
+        with self._lock:
+          self._waits += 1
+          self._wait_seconds += waited
+          self._max_wait_seconds = max(self._max_wait_seconds, waited)
+
+    with self._lock:
+      self._checkouts += 1
+      self._in_use += 1
+    return connection
+
+  # Return a connection to the pool, discarding any uncommitted work
+  def release(self, connection):
+    with self._lock:
+      self._in_use -= 1
+    try:
+      if connection.in_transaction:
+        connection.rollback()
+    except sqlite3.Error:
+      # A broken connection is dropped so the pool can open a fresh one
+      self._discard(connection)
+      return
+    self._pool.put(connection)
+
+  # The request's connection; from the pool in g.db_pool if a route set one (lib/snapshots.py)
   def get(self):
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      g.db = g.get('db_pool', self).acquire()
     return g.db
 
   def commit(self):
     self.get().commit()
 
+  def rollback(self):
+    self.get().rollback()
+
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
     connection = self.get()
-    return connection.cursor()
+    return self._instrument(connection.cursor())
+
+  # Wrap a request cursor so its statements are measured; Db.close reports the last ones
+  def _instrument(self, cursor, label=None):
+    if self.metrics is None:
+      return cursor
+    cursor = InstrumentedCursor(cursor, self.metrics, label)
+    g.setdefault('db_cursors', []).append(cursor)
+    return cursor
+
+  # SQL statements run by the request's cursors so far
+  def request_statements(self):
+    return sum(cursor.statements for cursor in g.get('db_cursors', ()))
+
+  # Run a named statement (or sort variant, see Statements.get) on the request's connection
+  def execute(self, name, params=(), **variant):
+    connection = self.get()
+    sql = self.statements.get(name, **variant)
+    with self._lock:
+      prepared = self._prepared.get(id(connection))
+      if prepared is not None:
+        if sql in prepared:
+          prepared.move_to_end(sql)
+          self._statement_hits += 1
+        else:
+          prepared[sql] = True
+          if len(prepared) > self.cached_statements:
+            prepared.popitem(last=False)
+          self._statement_misses += 1
+    return self._instrument(connection.cursor(), name).execute(sql, params)
 
   def close(self):
+    for cursor in g.pop('db_cursors', ()):
+      cursor.finish()
     db = g.pop('db', None)
     if db is not None:
-      db.close()
+      g.pop('db_pool', self).release(db)
 
-  # Function to load SQL from a file
+  # Close every idle connection (e.g. before deleting the database file)
+  def close_all(self):
+    while True:
+      try:
+        connection = self._pool.get_nowait()
+      except queue.Empty:
+        break
+      self._discard(connection)
+
+  def pool_stats(self):
+    with self._lock:
+      return {
+        "pool_size": self.pool_size,
+        "open_connections": self._opened,
+        "in_use": self._in_use,
+        "idle": self._pool.qsize(),
+        "checkouts": self._checkouts,
+        "waits": self._waits,
+        "wait_seconds_total": self._wait_seconds,
+        "wait_seconds_max": self._max_wait_seconds
+      }
+
+  # How often execute() ran a statement its connection had already prepared, as
+  # estimated from the _prepared mirror: sqlite3 does not expose its cache, and the
+  # mirror counts only named statements, so it is an upper bound when ad-hoc SQL
+  # competes for the cache.
+  def statement_stats(self):
+    with self._lock:
+      executions = self._statement_hits + self._statement_misses
+      return {
+        "statements": len(list(self.statements.queries())),
+        "cached_statements": self.cached_statements,
+        "executions": executions,
+        "estimated_hits": self._statement_hits,
+        "estimated_misses": self._statement_misses,
+        "estimated_hit_rate": self._statement_hits / executions if executions else None
+      }
+
+  # Prepare every named statement against the database's schema, so a broken file
+  # under sql/ stops startup instead of the first request that runs it. Opened
+  # read-only: a missing database is an error, not a new empty file.
+  def validate_statements(self):
+    connection = sqlite3.connect(f'file:{self.database}?mode=ro', uri=True)
+    try:
+      self.statements.validate(connection)
+    finally:
+      connection.close()
+
+  # SQL of a file under sql/ (read once at startup)
   def sql(self, filepath):
-    with open('sql/' + filepath, 'r') as file:
-      return file.read()
+    return self.statements.get(filepath[:-len('.sql')] if filepath.endswith('.sql') else filepath)
 
   # Function to load the words from a JSON file
   def load_json(self, filepath):
@@ -37,27 +238,91 @@ class Db:
       return json.load(file)
 
   def setup_tables(self,cursor):
+    # A new database gets the latest schema. An existing one first gets the pending
+    # migrations (lib/migrations.py), then whatever else the setup SQL adds.
+    # Commits on the cursor's connection, so migrate.py can run it without an app.
+    connection = cursor.connection
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'words'")
+    new_database = cursor.fetchone() is None
+
+    # An existing database from before the rollups gets them, and every other
+    # aggregate, from its review log once the triggers are in place
+    cursor.execute('''
+      SELECT COUNT(*) FROM sqlite_master
+      WHERE name IN ('study_stats', 'daily_activity', 'daily_group_activity')
+    ''')
+    rebuild = not new_database and cursor.fetchone()[0] < 3
+
+    # Data versions for HTTP caching, bumped by the steps below; a fresh database
+    # gets a fresh random id
+    cursor.execute(self.sql('setup/create_table_data_versions.sql'))
+    cursor.execute('''
+      INSERT OR IGNORE INTO data_versions (table_name, version)
+      VALUES ('database', abs(random() % 1000000000))
+    ''')
+    connection.commit()
+
+    if not new_database:
+      migrate(connection)
+
     # Create the necessary tables
     cursor.execute(self.sql('setup/create_table_words.sql'))
-    self.get().commit()
+    connection.commit()
+
+    # Full-text index over words; built from the existing rows if it is new
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'words_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.execute(self.sql('setup/create_table_words_fts.sql'))
+    if not fts_exists:
+      cursor.execute("INSERT INTO words_fts (words_fts) VALUES ('rebuild')")
+    connection.commit()
 
     cursor.execute(self.sql('setup/create_table_word_reviews.sql'))
-    self.get().commit()
+    connection.commit()
 
-    cursor.execute(self.sql('setup/create_table_word_review_items.sql'))
-    self.get().commit()
+    # The review log: a view over monthly partitions (see lib/partitions.py)
+    setup_review_items(cursor)
+    connection.commit()
 
     cursor.execute(self.sql('setup/create_table_groups.sql'))
-    self.get().commit()
+    connection.commit()
 
     cursor.execute(self.sql('setup/create_table_word_groups.sql'))
-    self.get().commit()
+    connection.commit()
 
     cursor.execute(self.sql('setup/create_table_study_activities.sql'))
-    self.get().commit()
+    connection.commit()
 
     cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
-    self.get().commit()
+    cursor.execute(self.sql('setup/create_table_expired_session_reviews.sql'))
+    connection.commit()
+
+    # Dashboard rollups, kept current by the triggers below and lib/reviews.py
+    cursor.execute(self.sql('setup/create_table_study_stats.sql'))
+    cursor.execute('INSERT OR IGNORE INTO study_stats (id) VALUES (1)')
+    connection.commit()
+
+    cursor.execute(self.sql('setup/create_table_daily_activity.sql'))
+    cursor.execute(self.sql('setup/create_table_daily_group_activity.sql'))
+    connection.commit()
+
+    # Create the indexes (the file holds several statements)
+    cursor.executescript(self.sql('setup/create_indexes.sql'))
+    connection.commit()
+
+    # Create the triggers that keep derived rows in step with their tables
+    cursor.executescript(self.sql('setup/create_triggers.sql'))
+    connection.commit()
+
+    if rebuild:
+      rebuild_aggregates(cursor)
+      connection.commit()
+
+    # Applied migrations; a new database already has what every migration adds
+    setup_schema_version(cursor)
+    if new_database:
+      mark_applied(cursor)
+    connection.commit()
 
   def import_study_activities_json(self,cursor,data_json_path):
     study_actvities = self.load_json(data_json_path)
@@ -65,55 +330,21 @@ class Db:
       cursor.execute('''
       INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
       ''', (activity['name'],activity['url'],activity['preview_url'],))
+    bump_versions(cursor, 'study_activities')
     self.get().commit()
 
   def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
-
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (english, italian) VALUES (?, ?)
-        ''', (word['english'], word['italian']))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
-
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
-
-      # Update the words_count in the groups table by counting all words in the group
-      cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
-
-      self.get().commit()
+      # Stream the words into the group in chunks (see lib/importer.py)
+      stats = import_words(self.get(), data_json_path, group_name)
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+      print(f"Successfully added {stats['words_added']} verbs to the '{group_name}' group.")
 
   # Initialize the database with sample data
   def init(self, app):
     with app.app_context():
       cursor = self.cursor()
       self.setup_tables(cursor)
+      self.statements.validate(self.get())
       self.import_word_json(
         cursor=cursor,
         group_name='Core Verbs',
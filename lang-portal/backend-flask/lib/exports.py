@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+# Streaming exports.
+#
+# stream_rows runs a query on its own pooled connection and yields the rows in
+# fetchmany batches, so the response generator does not depend on the request's
+# connection (which is returned to the pool when the view returns). Each batch is
+# encoded to one NDJSON or CSV chunk, so memory stays flat however many rows
+# are exported.
+
+EXPORT_FORMATS = {
+  'ndjson': 'application/x-ndjson',
+  'csv': 'text/csv'
+}
+
+# One encoder for every row; json.dumps with options builds a new one per call
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+class InvalidExport(ValueError):
+  pass
+
+def _parse_timestamp(value, name, end_of_day):
+  try:
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+  except ValueError:
+    raise InvalidExport(f'Invalid {name}: expected YYYY-MM-DD or an ISO 8601 timestamp')
+  if timestamp.tzinfo is not None:
+    timestamp = timestamp.replace(tzinfo=None) - timestamp.utcoffset()
+  # A bare date in `to` covers that whole day
+  if end_of_day and len(value) == 10:
+    return (timestamp + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'), '<'
+  return timestamp.strftime('%Y-%m-%d %H:%M:%S'), '<=' if end_of_day else '>='
+
+def date_range_filter(args, column):
+  """Return (SQL conditions, params) for the `from` / `to` query parameters on `column`.
+
+  Both bounds are inclusive; a bare date in `to` includes the whole day.
+  """
+  conditions, params = [], []
+  for name, end_of_day in (('from', False), ('to', True)):
+    value = args.get(name)
+    if value:
+      timestamp, operator = _parse_timestamp(value, name, end_of_day)
+      conditions.append(f'{column} {operator} ?')
+      params.append(timestamp)
+  return conditions, params
+
+def export_format(args):
+  format = args.get('format', 'ndjson')
+  if format not in EXPORT_FORMATS:
+    raise InvalidExport(f"Invalid format: expected one of {', '.join(EXPORT_FORMATS)}")
+  return format
+
+def stream_rows(db, sql, params=(), fetch_size=1000, learner=None):
+  """Yield batches of rows of `sql` (one query, or a list run in turn with the same params)
+  from a connection held only while iterating."""
+  # The learner is passed in: the request context is gone by the time this runs
+  connection = db.acquire(learner)
+  try:
+    for query in [sql] if isinstance(sql, str) else sql:
+      cursor = connection.execute(query, params)
+      while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+          break
+        yield rows
+  finally:
+    db.release(connection)
+
+def encode_batches(batches, columns, format):
+  """Encode row batches as NDJSON lines or CSV records (with a header row), one chunk per batch."""
+  if format == 'csv':
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+      buffer.seek(0)
+      buffer.truncate()
+      writer.writerows(tuple(row) for row in rows)
+      yield buffer.getvalue()
+  else:
+    for rows in batches:
+      encode = _json_encoder.encode
+      yield ''.join(encode(dict(zip(columns, row))) + '\n' for row in rows)
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, current_app, g, request
+
+from lib.compression import negotiate_encoding
+
+# Conditional GETs keyed on data versions.
+#
+# A read route declares the tables it reads with @conditional(...). Its strong ETag
+# is a hash of the URL, those tables' data versions (lib/versions.py) and the UTC
+# date (some queries are relative to 'now'). A client sending a matching
+# If-None-Match gets 304 Not Modified before the view runs, so no SQL is executed.
+# With RESPONSE_CACHE_SIZE > 0, the last responses are also kept in memory and
+# served again while their ETag still matches (streamed exports are never cached).
+#
+# A compressed response is a different representation of the same resource, so the
+# negotiated Content-Encoding (lib/compression.py) is appended to the ETag sent:
+# a cached gzip body is never revalidated for a client expecting identity. The
+# in-memory cache holds the uncompressed body and is shared by all encodings.
+
+def compute_etag(tables):
+  # A route served from a snapshot uses the versions the snapshot was taken at
+  versions = g.get('data_versions', current_app.versions).get(*tables)
+  today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+  key = f"{request.full_path}|{today}|{','.join(map(str, versions))}"
+  return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+class ResponseCache:
+  """A small thread-safe LRU of (etag, body, status, mimetype) keyed by URL."""
+
+  def __init__(self, size):
+    self.size = size
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key, etag):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None or entry[0] != etag:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry
+
+  def put(self, key, etag, body, status, mimetype):
+    with self._lock:
+      self._entries[key] = (etag, body, status, mimetype)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.size:
+        self._entries.popitem(last=False)
+
+def _with_etag(response, etag):
+  response.set_etag(etag)
+  response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; a 304 is cheap
+  return response
+
+def representation_etag(etag):
+  encoding = negotiate_encoding()
+  return f'{etag}-{encoding}' if encoding else etag
+
+def conditional(*tables):
+  """Answer GETs with an ETag derived from the data versions of `tables`."""
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      etag = compute_etag(tables)
+      sent_etag = representation_etag(etag)
+      if request.if_none_match.contains(sent_etag):
+        return _with_etag(Response(status=304), sent_etag)
+
+      cache = current_app.response_cache
+      if cache is not None:
+        entry = cache.get(request.full_path, etag)
+        if entry is not None:
+          _, body, status, mimetype = entry
+          return _with_etag(Response(body, status=status, mimetype=mimetype), sent_etag)
+
+      response = current_app.make_response(view(*args, **kwargs))
+      if response.status_code != 200:
+        return response
+      if cache is not None and not response.is_streamed:
+        cache.put(request.full_path, etag, response.get_data(), response.status_code, response.mimetype)
+      return _with_etag(response, sent_etag)
+    return wrapper
+  return decorator
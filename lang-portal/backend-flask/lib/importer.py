@@ -0,0 +1,106 @@
+import json
+import time
+
+from lib.records import iter_file_records
+from lib.versions import bump_versions
+
+# Streaming vocabulary importer.
+#
+# Words are read one record at a time (lib/records.py) and written in chunks, one
+# transaction per chunk:
+# 1. de-duplicate the chunk on (italian, english)
+# 2. look the pairs up in words with one json_each query, insert the missing ones
+#    with executemany and read their ids back by rowid range
+# 3. add the group memberships the words do not have yet with one INSERT ... SELECT
+# groups.words_count follows the new memberships through the word_groups triggers.
+
+IMPORT_TABLES = ('words', 'word_groups', 'groups', 'word_reviews', 'study_stats')
+
+def _lookup_ids(cursor, pairs):
+  # Map (italian, english) -> id for the pairs that exist in words
+  cursor.execute('''
+    SELECT w.id, w.italian, w.english
+    FROM json_each(?) pair
+    JOIN words w
+      ON w.italian = json_extract(pair.value, '$[0]')
+      AND w.english = json_extract(pair.value, '$[1]')
+  ''', (json.dumps(pairs),))
+  return {(row[1], row[2]): row[0] for row in cursor.fetchall()}
+
+def get_or_create_group(cursor, group_name):
+  cursor.execute('SELECT id FROM groups WHERE name = ? ORDER BY id LIMIT 1', (group_name,))
+  row = cursor.fetchone()
+  if row:
+    return row[0]
+  cursor.execute('INSERT INTO groups (name) VALUES (?)', (group_name,))
+  bump_versions(cursor, 'groups')
+  return cursor.lastrowid
+
+def import_chunk(cursor, group_id, pairs):
+  """Write one chunk of unique (italian, english) pairs. Returns (new words, new memberships)."""
+  existing = _lookup_ids(cursor, pairs)
+  missing = [pair for pair in pairs if pair not in existing]
+  if missing:
+    # The new rows get ids above the old maximum; only the chunk's own pairs are kept
+    # in case another writer added words in between
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM words')
+    last_id = cursor.fetchone()[0]
+    cursor.executemany('INSERT INTO words (italian, english) VALUES (?, ?)', missing)
+    cursor.execute('SELECT id, italian, english FROM words WHERE id > ?', (last_id,))
+    wanted = set(missing)
+    existing.update({(row[1], row[2]): row[0] for row in cursor.fetchall() if (row[1], row[2]) in wanted})
+
+  cursor.execute('''
+    INSERT INTO word_groups (word_id, group_id)
+    SELECT ids.value, ?
+    FROM json_each(?) ids
+    WHERE NOT EXISTS (
+      SELECT 1 FROM word_groups wg
+      WHERE wg.group_id = ? AND wg.word_id = ids.value
+    )
+  ''', (group_id, json.dumps(sorted(existing.values())), group_id))
+  memberships = cursor.rowcount
+
+  bump_versions(cursor, *IMPORT_TABLES)
+  return len(missing), memberships
+
+def import_words(connection, path, group_name, format=None, chunk_size=10000, progress=None):
+  """Stream the words in `path` into `group_name`, committing every `chunk_size` records.
+
+  Records need `english` and `italian` fields; others are ignored and records missing
+  either are skipped. Returns a dict of counts and the elapsed time.
+  """
+  started = time.perf_counter()
+  stats = {'rows': 0, 'words_added': 0, 'duplicates': 0, 'skipped': 0, 'memberships_added': 0}
+  cursor = connection.cursor()
+
+  group_id = get_or_create_group(cursor, group_name)
+  connection.commit()
+
+  def flush(chunk):
+    words_added, memberships = import_chunk(cursor, group_id, list(chunk))
+    connection.commit()
+    stats['words_added'] += words_added
+    stats['memberships_added'] += memberships
+    if progress:
+      progress(stats)
+
+  chunk = {}
+  for record in iter_file_records(path, format):
+    stats['rows'] += 1
+    english = (record.get('english') or '').strip() if isinstance(record, dict) else ''
+    italian = (record.get('italian') or '').strip() if isinstance(record, dict) else ''
+    if not english or not italian:
+      stats['skipped'] += 1
+      continue
+    chunk[(italian, english)] = None  # A dict keeps the file order while de-duplicating
+    if len(chunk) >= chunk_size:
+      flush(chunk)
+      chunk = {}
+  if chunk:
+    flush(chunk)
+
+  stats['duplicates'] = stats['rows'] - stats['skipped'] - stats['words_added']
+  stats['group_id'] = group_id
+  stats['seconds'] = time.perf_counter() - started
+  return stats
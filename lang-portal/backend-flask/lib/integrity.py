@@ -0,0 +1,113 @@
+import json
+
+from lib.reviews import recount_study_stats
+from lib.versions import bump_versions
+
+# Counter cache checks.
+#
+# Several columns are counters kept in step with the rows they count, by triggers
+# or by the write paths in lib/:
+# - groups.words_count: rows in word_groups (triggers on word_groups)
+# - study_stats: words, studied and mastered words, reviews and sessions
+#   (triggers, lib/reviews.py)
+# - study_sessions.review_count and correct_count: the session's reviews (lib/reviews.py)
+#
+# check_counters recounts each from its source rows and reports the ones that
+# drifted; fix_counters repairs them (`invoke check-integrity --fix`). Reviews the
+# retention policy dropped from the log (lib/partitions.py) are counted from
+# expired_session_reviews, and nothing is recounted from the log alone.
+
+def check_group_counts(cursor):
+  """Groups whose words_count differs from their number of word_groups rows."""
+  cursor.execute('''
+    SELECT g.id, g.words_count, COALESCE(wg.words, 0)
+    FROM groups g
+    LEFT JOIN (SELECT group_id, COUNT(*) AS words FROM word_groups GROUP BY group_id) wg
+      ON wg.group_id = g.id
+    WHERE g.words_count IS NOT COALESCE(wg.words, 0)
+    ORDER BY g.id
+  ''')
+  return [{"check": 'groups.words_count', "id": row[0], "column": 'words_count', "stored": row[1], "actual": row[2]}
+          for row in cursor.fetchall()]
+
+def check_study_stats(cursor):
+  """study_stats columns that differ from a recount of words, word_reviews and study_sessions."""
+  cursor.execute('''
+    SELECT
+      (SELECT COUNT(*) FROM words),
+      COUNT(*) FILTER (WHERE correct_count + wrong_count > 0),
+      COUNT(*) FILTER (
+        WHERE correct_count + wrong_count >= 5
+        AND correct_count * 1.0 / (correct_count + wrong_count) >= 0.8
+      ),
+      COALESCE(SUM(correct_count + wrong_count), 0),
+      COALESCE(SUM(correct_count), 0),
+      (SELECT COUNT(*) FROM study_sessions)
+    FROM word_reviews
+  ''')
+  actual = cursor.fetchone()
+  columns = ('vocabulary_count', 'words_studied', 'mastered_words', 'reviews_count', 'correct_count',
+             'sessions_count')
+  cursor.execute(f'SELECT {", ".join(columns)} FROM study_stats WHERE id = 1')
+  stored = cursor.fetchone() or (None,) * len(columns)
+  return [{"check": 'study_stats', "id": 1, "column": column, "stored": stored[index], "actual": actual[index]}
+          for index, column in enumerate(columns) if stored[index] != actual[index]]
+
+def check_session_counts(cursor):
+  """Study sessions whose review_count or correct_count differs from their reviews, those
+  in the log plus those expired from it."""
+  cursor.execute('''
+    SELECT s.id, s.review_count, s.correct_count,
+           COALESCE(agg.review_count, 0) + COALESCE(e.review_count, 0),
+           COALESCE(agg.correct_count, 0) + COALESCE(e.correct_count, 0)
+    FROM study_sessions s
+    LEFT JOIN (
+      SELECT study_session_id, COUNT(*) AS review_count, SUM(correct) AS correct_count
+      FROM word_review_items
+      GROUP BY study_session_id
+    ) agg ON agg.study_session_id = s.id
+    LEFT JOIN expired_session_reviews e ON e.study_session_id = s.id
+    WHERE s.review_count != COALESCE(agg.review_count, 0) + COALESCE(e.review_count, 0)
+      OR s.correct_count != COALESCE(agg.correct_count, 0) + COALESCE(e.correct_count, 0)
+    ORDER BY s.id
+  ''')
+  mismatches = []
+  for session_id, review_count, correct_count, actual_reviews, actual_correct in cursor.fetchall():
+    for column, stored, actual in (('review_count', review_count, actual_reviews),
+                                   ('correct_count', correct_count, actual_correct)):
+      if stored != actual:
+        mismatches.append({"check": 'study_sessions', "id": session_id, "column": column,
+                           "stored": stored, "actual": actual})
+  return mismatches
+
+CHECKS = (check_group_counts, check_study_stats, check_session_counts)
+
+def check_counters(cursor):
+  """Every counter that differs from a recount of its rows, as dicts of check, id, column, stored and actual."""
+  return [mismatch for check in CHECKS for mismatch in check(cursor)]
+
+def fix_counters(cursor, mismatches):
+  """Recount the counters `mismatches` found drifted. Does not commit."""
+  checks = {mismatch['check'] for mismatch in mismatches}
+  groups = [mismatch['id'] for mismatch in mismatches if mismatch['check'] == 'groups.words_count']
+  if groups:
+    cursor.execute('''
+      UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id)
+      WHERE id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(groups),))
+    bump_versions(cursor, 'groups')
+  sessions = [mismatch['id'] for mismatch in mismatches if mismatch['check'] == 'study_sessions']
+  if sessions:
+    # Only the drifted sessions, from their reviews in the log and those expired from it
+    cursor.execute('''
+      UPDATE study_sessions SET
+        review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id)
+          + COALESCE((SELECT review_count FROM expired_session_reviews WHERE study_session_id = study_sessions.id), 0),
+        correct_count = (SELECT COALESCE(SUM(correct), 0) FROM word_review_items WHERE study_session_id = study_sessions.id)
+          + COALESCE((SELECT correct_count FROM expired_session_reviews WHERE study_session_id = study_sessions.id), 0)
+      WHERE id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(sessions),))
+    bump_versions(cursor, 'study_sessions')
+  if 'study_stats' in checks:
+    # From word_reviews, which keeps counting expired reviews
+    recount_study_stats(cursor)
@@ -0,0 +1,59 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+except ImportError:  # Optional: responses are encoded with the standard library without it
+  orjson = None
+
+# JSON encoding of responses.
+#
+# JSON_ENCODER picks the app's JSON provider (app.json, used by jsonify and
+# request.get_json):
+# - 'orjson': encodes in C straight to UTF-8 bytes, several times faster than the
+#   standard library on large lists; the default when the orjson package is installed
+# - 'json': Flask's provider over the standard library json module
+# Both sort keys and encode dates the same way; orjson leaves non-ASCII characters
+# unescaped, which is also smaller.
+
+class OrjsonProvider(DefaultJSONProvider):
+  def _options(self, indent=False):
+    # Dates and datetimes go through Flask's default (HTTP dates), as with 'json'
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if self.sort_keys:
+      option |= orjson.OPT_SORT_KEYS
+    if indent:
+      option |= orjson.OPT_INDENT_2
+    return option
+
+  def dumps(self, obj, **kwargs):
+    # Options orjson has no equivalent for are left to the standard library
+    if kwargs:
+      return super().dumps(obj, **kwargs)
+    return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+  def loads(self, s, **kwargs):
+    if kwargs:
+      return super().loads(s, **kwargs)
+    return orjson.loads(s)
+
+  def response(self, *args, **kwargs):
+    obj = self._prepare_response_obj(args, kwargs)
+    indent = (self.compact is None and self._app.debug) or self.compact is False
+    body = orjson.dumps(obj, default=self.default, option=self._options(indent)) + b'\n'
+    return self._app.response_class(body, mimetype=self.mimetype)
+
+JSON_PROVIDERS = {
+  'json': DefaultJSONProvider,
+  'orjson': OrjsonProvider
+}
+
+def default_encoder():
+  return 'orjson' if orjson is not None else 'json'
+
+def json_provider(app, encoder):
+  """The JSON provider for JSON_ENCODER `encoder`."""
+  if encoder not in JSON_PROVIDERS:
+    raise ValueError(f"Unknown JSON_ENCODER {encoder!r}: expected one of {', '.join(JSON_PROVIDERS)}")
+  if encoder == 'orjson' and orjson is None:
+    raise ValueError("JSON_ENCODER 'orjson' needs the orjson package")
+  return JSON_PROVIDERS[encoder](app)
@@ -0,0 +1,89 @@
+import json
+
+from lib.versions import bump_versions
+
+# Group membership writes.
+#
+# POST/DELETE /api/groups/:id/words and POST /api/groups/:id/words/move change many
+# word_groups rows with one statement per step: the word ids are bound as a single
+# JSON array and joined through json_each (as lib/batch.py lookups). A word is in a
+# group at most once (the unique word_id, group_id index), and the word_groups
+# triggers keep groups.words_count in step with every row inserted, deleted or
+# moved, so nothing here recounts a group.
+
+MEMBERSHIP_TABLES = ('word_groups', 'groups')
+
+def _not_in_group(cursor, group_id, ids):
+  # The ids, in the order given, that are not members of the group
+  cursor.execute('''
+    SELECT ids.value
+    FROM json_each(?) ids
+    WHERE NOT EXISTS (
+      SELECT 1 FROM word_groups wg
+      WHERE wg.group_id = ? AND wg.word_id = ids.value
+    )
+  ''', (json.dumps(ids), group_id))
+  missing = {row[0] for row in cursor.fetchall()}
+  return [word_id for word_id in ids if word_id in missing]
+
+def add_words(cursor, group_id, ids):
+  """Add the words `ids` to a group. Returns the number added and the ids that are not words. Does not commit."""
+  cursor.execute('''
+    SELECT ids.value
+    FROM json_each(?) ids
+    WHERE NOT EXISTS (SELECT 1 FROM words w WHERE w.id = ids.value)
+  ''', (json.dumps(ids),))
+  unknown = {row[0] for row in cursor.fetchall()}
+  missing = [word_id for word_id in ids if word_id in unknown]
+
+  # WHERE true: an upsert's SELECT needs a WHERE clause for SQLite to parse ON CONFLICT
+  cursor.execute('''
+    INSERT INTO word_groups (word_id, group_id)
+    SELECT w.id, ?
+    FROM json_each(?) ids
+    JOIN words w ON w.id = ids.value
+    WHERE true
+    ON CONFLICT (word_id, group_id) DO NOTHING
+  ''', (group_id, json.dumps(ids)))
+  added = cursor.rowcount
+
+  bump_versions(cursor, *MEMBERSHIP_TABLES)
+  return added, missing
+
+def remove_words(cursor, group_id, ids):
+  """Remove the words `ids` from a group. Returns the number removed and the ids that were not members. Does not commit."""
+  missing = _not_in_group(cursor, group_id, ids)
+  cursor.execute('''
+    DELETE FROM word_groups
+    WHERE group_id = ? AND word_id IN (SELECT value FROM json_each(?))
+  ''', (group_id, json.dumps(ids)))
+  removed = cursor.rowcount
+
+  bump_versions(cursor, *MEMBERSHIP_TABLES)
+  return removed, missing
+
+def move_words(cursor, source_id, target_id, ids):
+  """Move the words `ids` from one group to another. Does not commit.
+
+  Returns the number moved, how many of those were already in the target group
+  (their source row is dropped) and the ids that were not in the source group.
+  Moved rows keep their due_at, so the target's due queue has them right away.
+  """
+  missing = _not_in_group(cursor, source_id, ids)
+  cursor.execute('''
+    DELETE FROM word_groups
+    WHERE group_id = ? AND word_id IN (SELECT value FROM json_each(?))
+    AND EXISTS (
+      SELECT 1 FROM word_groups target
+      WHERE target.group_id = ? AND target.word_id = word_groups.word_id
+    )
+  ''', (source_id, json.dumps(ids), target_id))
+  merged = cursor.rowcount
+  cursor.execute('''
+    UPDATE word_groups SET group_id = ?
+    WHERE group_id = ? AND word_id IN (SELECT value FROM json_each(?))
+  ''', (target_id, source_id, json.dumps(ids)))
+  moved = cursor.rowcount + merged
+
+  bump_versions(cursor, *MEMBERSHIP_TABLES)
+  return moved, merged, missing
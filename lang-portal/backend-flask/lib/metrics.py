@@ -0,0 +1,200 @@
+import bisect
+import logging
+import re
+import threading
+import time
+
+# Request and SQL instrumentation, exposed at /metrics (routes/metrics.py).
+#
+# Every request records its latency and the number of SQL statements it ran,
+# labelled by method and route rule (/api/words/<int:id>, not the URL). Every
+# statement run through a Db cursor (lib/db.py) records its time (execute plus
+# fetches) and the rows fetched, labelled by its name in sql/ or, for inline SQL,
+# by its normalized text. A statement slower than the slow-query threshold is
+# also logged to the 'slow_query' logger with its normalized SQL.
+#
+# Everything is kept in memory per process and rendered in the Prometheus text
+# exposition format.
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_query_log = logging.getLogger('slow_query')
+
+COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_sql(sql):
+  """SQL with comments, whitespace runs and literals collapsed, so equal statements group together."""
+  sql = COMMENT.sub(' ', sql)
+  sql = STRING.sub('?', sql)
+  sql = NUMBER.sub('?', sql)
+  sql = PLACEHOLDER_LIST.sub('?, ...', sql)
+  return WHITESPACE.sub(' ', sql).strip()
+
+class Histogram:
+  def __init__(self, buckets):
+    self.buckets = buckets
+    self.series = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+  def observe(self, labels, value):
+    series = self.series.get(labels)
+    if series is None:
+      series = self.series[labels] = [0] * (len(self.buckets) + 2)
+    series[bisect.bisect_left(self.buckets, value)] += 1
+    series[-1] += value
+
+class Metrics:
+  def __init__(self, slow_query_seconds=0.1):
+    self.slow_query_seconds = slow_query_seconds
+    self._lock = threading.Lock()
+    self._requests = {}  # (method, route, status) -> count
+    self._request_seconds = Histogram(SECONDS_BUCKETS)
+    self._request_statements = Histogram(STATEMENT_COUNT_BUCKETS)
+    self._statement_seconds = Histogram(SECONDS_BUCKETS)
+    self._statement_rows = {}  # statement -> rows fetched
+    self._slow_statements = {}  # statement -> count
+    self._labels = {}  # inline SQL -> its normalized text
+
+  def statement_label(self, sql):
+    label = self._labels.get(sql)
+    if label is None:
+      label = self._labels[sql] = normalize_sql(sql)
+    return label
+
+  def observe_request(self, method, route, status, seconds, statements):
+    with self._lock:
+      key = (method, route, str(status))
+      self._requests[key] = self._requests.get(key, 0) + 1
+      self._request_seconds.observe((method, route), seconds)
+      self._request_statements.observe((method, route), statements)
+
+  def observe_statement(self, label, sql, seconds, rows):
+    with self._lock:
+      self._statement_seconds.observe((label,), seconds)
+      self._statement_rows[label] = self._statement_rows.get(label, 0) + rows
+      slow = seconds >= self.slow_query_seconds
+      if slow:
+        self._slow_statements[label] = self._slow_statements.get(label, 0) + 1
+    if slow:
+      slow_query_log.warning('slow query: %.1fms, %d rows: %s', seconds * 1000, rows, normalize_sql(sql),
+                             extra={'statement': label, 'duration_ms': seconds * 1000, 'rows': rows})
+
+  def render(self, extra=()):
+    """The Prometheus text exposition of every metric, plus (name, type, help, value) of extra ones."""
+    lines = []
+    with self._lock:
+      lines += _header('http_requests_total', 'counter', 'Requests by method, route and status.')
+      for (method, route, status), count in sorted(self._requests.items()):
+        lines.append(f'http_requests_total{_labels(method=method, route=route, status=status)} {count}')
+      lines += _histogram('http_request_duration_seconds', 'Request latency in seconds.',
+                          self._request_seconds, ('method', 'route'))
+      lines += _histogram('http_request_sql_statements', 'SQL statements run per request.',
+                          self._request_statements, ('method', 'route'))
+      lines += _histogram('sql_statement_duration_seconds', 'SQL statement time (execute and fetches) in seconds.',
+                          self._statement_seconds, ('statement',))
+      lines += _header('sql_statement_rows_total', 'counter', 'Rows fetched per SQL statement.')
+      for label, rows in sorted(self._statement_rows.items()):
+        lines.append(f'sql_statement_rows_total{_labels(statement=label)} {rows}')
+      lines += _header('sql_slow_statements_total', 'counter', 'SQL statements slower than the slow-query threshold.')
+      for label, count in sorted(self._slow_statements.items()):
+        lines.append(f'sql_slow_statements_total{_labels(statement=label)} {count}')
+    for name, kind, help, value in extra:
+      lines += _header(name, kind, help)
+      lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+class InstrumentedCursor:
+  """A sqlite3 cursor that reports each statement's time and fetched rows to Metrics.
+
+  A statement is reported when the cursor runs the next one, is closed, or is
+  finished (Db.close calls finish on the request's cursors).
+  """
+
+  def __init__(self, cursor, metrics, label=None):
+    self._cursor = cursor
+    self._metrics = metrics
+    self._label = label
+    self._statement = None  # [label, sql, seconds, rows]
+    self.statements = 0
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+  def _run(self, method, sql, params):
+    self.finish()
+    started = time.perf_counter()
+    getattr(self._cursor, method)(sql, params)
+    label = self._label or self._metrics.statement_label(sql)
+    self._statement = [label, sql, time.perf_counter() - started, 0]
+    self.statements += 1
+    return self
+
+  def execute(self, sql, params=()):
+    return self._run('execute', sql, params)
+
+  def executemany(self, sql, params):
+    return self._run('executemany', sql, params)
+
+  def _fetched(self, started, rows):
+    if self._statement is not None:
+      self._statement[2] += time.perf_counter() - started
+      self._statement[3] += rows
+
+  def fetchone(self):
+    started = time.perf_counter()
+    row = self._cursor.fetchone()
+    self._fetched(started, row is not None)
+    return row
+
+  def fetchmany(self, size=None):
+    started = time.perf_counter()
+    rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+    self._fetched(started, len(rows))
+    return rows
+
+  def fetchall(self):
+    started = time.perf_counter()
+    rows = self._cursor.fetchall()
+    self._fetched(started, len(rows))
+    return rows
+
+  def __iter__(self):
+    while True:
+      row = self.fetchone()
+      if row is None:
+        return
+      yield row
+
+  def finish(self):
+    if self._statement is not None:
+      self._metrics.observe_statement(*self._statement)
+      self._statement = None
+
+  def close(self):
+    self.finish()
+    self._cursor.close()
+
+def _header(name, kind, help):
+  return [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+
+def _escape(value):
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+  return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _histogram(name, help, histogram, label_names):
+  lines = _header(name, 'histogram', help)
+  for labels, series in sorted(histogram.series.items()):
+    base = dict(zip(label_names, labels))
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ('+Inf',), series):
+      cumulative += count
+      lines.append(f'{name}_bucket{_labels(**base, le=str(bound))} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**base)} {series[-1]}')
+    lines.append(f'{name}_count{_labels(**base)} {cumulative}')
+  return lines
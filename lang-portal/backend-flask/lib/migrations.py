@@ -0,0 +1,254 @@
+import hashlib
+import os
+import re
+import time
+
+from lib.partitions import begin_write, partitions
+from lib.statements import SQL_DIRECTORY, split_script
+from lib.versions import bump_versions
+
+# Versioned schema migrations.
+#
+# sql/migrations holds one file per migration, applied in version order:
+# - NNNN_name.sql: a schema change; its statements run in one transaction, together
+#   with its schema_version row, so it is applied entirely or not at all
+# - NNNN_name.backfill.sql: an online backfill, one statement run against each
+#   table named by a `-- table: <name>` line ({table} in the statement).
+#   word_review_items stands for each of its monthly partitions (lib/partitions.py).
+#   A statement using :start and :stop runs over rowid ranges of batch_size rows,
+#   one short transaction per batch (writers get the lock in between), recording
+#   where it got to in schema_backfills, so an interrupted backfill resumes there.
+#   Other statements (e.g. CREATE INDEX ... ON {table}) run once per table, each
+#   table in its own transaction.
+# - NNNN_name.py: a change that needs Python, e.g. to look at the schema first; its
+#   apply(cursor) runs in one transaction with its schema_version row, as an .sql one.
+#   One too long for a single transaction defines steps(cursor) instead, a generator
+#   yielding after each step: every step is committed, the last one with the
+#   schema_version row, so writers get the lock in between. Rerun after an
+#   interruption, the steps start over and must skip the work already committed.
+#
+# schema_version records each applied migration with a checksum of its file; a
+# file changed after it was applied is an error, not silently skipped. A new
+# database is created with the latest schema (sql/setup), so Db.setup_tables marks
+# every migration as applied: a migration must also update the setup SQL. On an
+# existing database, Db.setup_tables (invoke init-db, migrate.py) applies the
+# pending migrations before it creates what the setup SQL has and the database lacks.
+#
+# Applying a migration bumps the 'database' data version, so no ETag from before
+# it is reused (lib/versions.py).
+
+MIGRATIONS_DIRECTORY = os.path.join(SQL_DIRECTORY, 'migrations')
+MIGRATION_FILE = re.compile(r'(\d+)_(\w+?)(\.backfill\.sql|\.sql|\.py)$')
+TABLE_LINE = re.compile(r'^--\s*table:\s*(\w+)\s*$', re.MULTILINE)
+
+with open(os.path.join(SQL_DIRECTORY, 'setup', 'create_table_schema_version.sql')) as file:
+  SCHEMA_VERSION_SQL = file.read()
+
+class MigrationError(Exception):
+  pass
+
+class Migration:
+  def __init__(self, version, name, path, kind, source):
+    self.version = version
+    self.name = name
+    self.path = path
+    self.kind = kind  # 'sql', 'backfill' or 'python'
+    self.source = source
+    self.checksum = hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+  def __repr__(self):
+    return f'{self.version:04d}_{self.name}'
+
+  def tables(self):
+    """The tables a backfill runs against, as named by its `-- table:` lines."""
+    return TABLE_LINE.findall(self.source)
+
+def discover(directory=MIGRATIONS_DIRECTORY):
+  """The migrations in `directory`, by version. Raises MigrationError on a misnamed or duplicate file."""
+  if not os.path.isdir(directory):
+    return []
+  migrations = {}
+  for filename in sorted(os.listdir(directory)):
+    if not filename.endswith(('.sql', '.py')):
+      continue
+    match = MIGRATION_FILE.fullmatch(filename)
+    if not match:
+      raise MigrationError(f'Invalid migration file name: {filename} '
+                           f'(expected NNNN_name.sql, NNNN_name.backfill.sql or NNNN_name.py)')
+    version = int(match.group(1))
+    if version in migrations:
+      raise MigrationError(f'Two migrations with version {version}: {migrations[version].path} and {filename}')
+    path = os.path.join(directory, filename)
+    kind = {'.backfill.sql': 'backfill', '.sql': 'sql', '.py': 'python'}[match.group(3)]
+    with open(path) as file:
+      migration = Migration(version, match.group(2), path, kind, file.read())
+    if kind == 'backfill' and (not migration.tables() or len(split_script(migration.source)) != 1):
+      raise MigrationError(f'{filename}: a backfill is one statement and at least one `-- table:` line')
+    migrations[version] = migration
+  return [migrations[version] for version in sorted(migrations)]
+
+def setup_schema_version(cursor):
+  for sql in split_script(SCHEMA_VERSION_SQL):
+    cursor.execute(sql)
+
+def applied_versions(cursor):
+  """{version: (name, checksum)} of the applied migrations."""
+  cursor.execute('SELECT version, name, checksum FROM schema_version')
+  return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+def pending(cursor, migrations):
+  """The migrations not applied yet. Raises MigrationError if an applied one changed or is unknown."""
+  applied = applied_versions(cursor)
+  known = {migration.version: migration for migration in migrations}
+  for version, (name, checksum) in sorted(applied.items()):
+    migration = known.get(version)
+    if migration is None:
+      raise MigrationError(f'Migration {version:04d}_{name} is applied but not in this version of the code')
+    if migration.checksum != checksum:
+      raise MigrationError(f'{migration!r} changed after it was applied (checksum {checksum[:12]}, '
+                           f'file {migration.checksum[:12]})')
+  return [migration for migration in migrations if migration.version not in applied]
+
+def _record(cursor, migration, started):
+  cursor.execute('''
+    INSERT INTO schema_version (version, name, checksum, applied_at, duration_ms)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+  ''', (migration.version, migration.name, migration.checksum, round((time.perf_counter() - started) * 1000)))
+  cursor.execute('DELETE FROM schema_backfills WHERE version = ?', (migration.version,))
+  cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'data_versions'")
+  if cursor.fetchone():
+    bump_versions(cursor, 'database')
+
+def _run_python(cursor, migration):
+  # Compiled from the checksummed source; nothing is imported or cached as .pyc
+  namespace = {'__name__': f'migration_{migration!r}', '__file__': migration.path}
+  exec(compile(migration.source, migration.path, 'exec'), namespace)
+  if callable(namespace.get('steps')):
+    for _ in namespace['steps'](cursor):
+      cursor.connection.commit()
+      begin_write(cursor)
+  elif callable(namespace.get('apply')):
+    namespace['apply'](cursor)
+  else:
+    raise MigrationError(f'{migration!r} defines no apply(cursor) or steps(cursor)')
+
+def _apply(cursor, migration, started):
+  begin_write(cursor)
+  try:
+    if migration.kind == 'python':
+      _run_python(cursor, migration)
+    else:
+      for sql in split_script(migration.source):
+        cursor.execute(sql)
+    _record(cursor, migration, started)
+    cursor.connection.commit()
+  except BaseException:
+    cursor.connection.rollback()
+    raise
+
+def _targets(cursor, table):
+  # word_review_items is a view over its monthly partitions
+  if table == 'word_review_items':
+    return partitions(cursor)
+  return [table]
+
+def _run_batch(cursor, migration, table, sql, params, next_start):
+  # One statement and the point to resume from, in one transaction
+  begin_write(cursor)
+  try:
+    cursor.execute(sql, params)
+    rows = max(cursor.rowcount, 0)
+    cursor.execute('''
+      INSERT OR REPLACE INTO schema_backfills (version, table_name, next_start) VALUES (?, ?, ?)
+    ''', (migration.version, table, next_start))
+    cursor.connection.commit()
+    return rows
+  except BaseException:
+    cursor.connection.rollback()
+    raise
+
+def _apply_backfill(cursor, migration, started, batch_size, pause, progress):
+  template = split_script(migration.source)[0]
+  batched = ':start' in template and ':stop' in template
+  cursor.execute('SELECT table_name, next_start FROM schema_backfills WHERE version = ?', (migration.version,))
+  resume = {row[0]: row[1] for row in cursor.fetchall()}
+  tables = [target for table in migration.tables() for target in _targets(cursor, table)]
+  stats = {'migration': repr(migration), 'table': None, 'tables': len(tables), 'tables_done': 0,
+           'batches': 0, 'rows': 0, 'table_fraction': 0.0}
+
+  for table in tables:
+    stats['table'] = table
+    stats['table_fraction'] = 0.0
+    sql = template.replace('{table}', table)
+    if table in resume and resume[table] is None:
+      pass  # Finished before an interruption
+    elif not batched:
+      stats['rows'] += _run_batch(cursor, migration, table, sql, (), None)
+      stats['batches'] += 1
+    else:
+      # Rows inserted from here on are written by code that already fills them in
+      cursor.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table}')
+      low, high = cursor.fetchone()
+      start = resume.get(table, low) if low is not None else None
+      while start is not None:
+        stop = start + batch_size
+        next_start = stop if stop <= high else None
+        stats['rows'] += _run_batch(cursor, migration, table, sql, {'start': start, 'stop': stop}, next_start)
+        stats['batches'] += 1
+        stats['table_fraction'] = 1.0 if next_start is None else (next_start - low) / (high + 1 - low)
+        if progress and next_start is not None:
+          progress(dict(stats))
+        if pause and next_start is not None:
+          time.sleep(pause)  # Let waiting writers in
+        start = next_start
+    stats['tables_done'] += 1
+    stats['table_fraction'] = 1.0
+    if progress:
+      progress(dict(stats))
+
+  begin_write(cursor)
+  _record(cursor, migration, started)
+  cursor.connection.commit()
+  return stats
+
+def migrate(connection, directory=MIGRATIONS_DIRECTORY, batch_size=10000, pause=0.0, progress=None):
+  """Apply the pending migrations in order. Returns the migrations applied.
+
+  Backfills commit every `batch_size` rows and sleep `pause` seconds between
+  batches; `progress` is called with a stats dict after each batch and table.
+  """
+  cursor = connection.cursor()
+  begin_write(cursor)
+  setup_schema_version(cursor)
+  connection.commit()
+
+  applied = []
+  for migration in pending(cursor, discover(directory)):
+    started = time.perf_counter()
+    if migration.kind == 'backfill':
+      _apply_backfill(cursor, migration, started, batch_size, pause, progress)
+    else:
+      _apply(cursor, migration, started)
+    applied.append(migration)
+  return applied
+
+def add_columns(cursor, table, columns):
+  """Add the (name, definition) `columns` that `table` does not have yet. Does not commit.
+
+  For migrations adding a column that databases created from newer setup SQL, before
+  schema_version existed, may already have.
+  """
+  cursor.execute('SELECT name FROM pragma_table_xinfo(?)', (table,))
+  existing = {row[0] for row in cursor.fetchall()}
+  for name, definition in columns:
+    if name not in existing:
+      cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+def mark_applied(cursor, directory=MIGRATIONS_DIRECTORY):
+  """Record every migration as applied without running it (a database created with the latest schema). Does not commit."""
+  setup_schema_version(cursor)
+  for migration in pending(cursor, discover(directory)):
+    cursor.execute('''
+      INSERT INTO schema_version (version, name, checksum, applied_at, duration_ms)
+      VALUES (?, ?, ?, CURRENT_TIMESTAMP, 0)
+    ''', (migration.version, migration.name, migration.checksum))
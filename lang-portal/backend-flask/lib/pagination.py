@@ -0,0 +1,39 @@
+import base64
+import json
+
+# Keyset (cursor) pagination helpers.
+#
+# A cursor is an opaque, URL-safe token holding the sort key, the order and the
+# (sort value, id) of the last row of the previous page. The next page is then
+# fetched with `WHERE (sort_column, id) > (?, ?)` (or `<` for descending order),
+# which a composite index on (sort_column, id) serves without scanning skipped rows.
+
+class InvalidCursor(ValueError):
+  pass
+
+def encode_cursor(sort_by, order, value, row_id):
+  payload = json.dumps([sort_by, order, value, row_id], separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, valid_sort_keys):
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    sort_by, order, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+  except (ValueError, TypeError):
+    raise InvalidCursor('Invalid cursor')
+  if sort_by not in valid_sort_keys or order not in ('asc', 'desc') or not isinstance(row_id, int):
+    raise InvalidCursor('Invalid cursor')
+  return sort_by, order, value, row_id
+
+# WHERE condition selecting the rows after the cursor position
+def keyset_condition(sort_column, id_column, order):
+  comparison = '>' if order == 'asc' else '<'
+  return f'({sort_column}, {id_column}) {comparison} (?, ?)'
+
+# Split a page fetched with LIMIT per_page + 1 into the page rows and the cursor for the next page
+def page_and_cursor(rows, per_page, sort_by, order, id_key='id'):
+  if len(rows) <= per_page:
+    return rows, None
+  rows = rows[:per_page]
+  last = rows[-1]
+  return rows, encode_cursor(sort_by, order, last[sort_by], last[id_key])
@@ -0,0 +1,318 @@
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+from lib.statements import SQL_DIRECTORY, split_script
+from lib.versions import bump_versions
+
+# Monthly partitions of the review log.
+#
+# word_review_items is a view over one table per calendar month of created_at,
+# word_review_items_YYYY_MM, each with the indexes the single table used to have
+# (sql/setup/create_table_word_review_items.sql). Reads go through the view
+# unchanged: SQLite pushes their WHERE terms into every partition and searches
+# each one's indexes. Writes go to each row's partition (insert_review_items); a
+# month's first review creates its partition and redefines the view.
+#
+# Removing whole months is a DROP TABLE, which puts the pages on the freelist
+# without visiting rows or zeroing pages, instead of a row-by-row DELETE:
+# - expire_review_items: the retention policy, keeps the latest N months; with it
+#   on, insert_review_items refuses reviews from before them, whose new partition
+#   would be expired again right away. The dropped reviews are first counted per
+#   session into expired_session_reviews, so the session summaries can still be
+#   checked against the log, and so rebuild_aggregates (lib/reviews.py) knows the
+#   log no longer holds every review
+# - truncate_review_items: the study history reset swaps in one empty partition
+# swap_empty_table does the same for an ordinary table (study_sessions on reset).
+#
+# A review log from before partitioning (one word_review_items table) is moved
+# into partitions by a migration (partition_review_items, sql/migrations), one
+# month per transaction.
+#
+# Ids stay unique and increasing across partitions: an insert hands out the ids
+# after the highest one in any partition's AUTOINCREMENT sequence, and dropping
+# partitions carries that high-water mark over to the newest remaining one.
+#
+# Every name is qualified with main, so a per-learner shard (lib/shards.py) only
+# ever sees its own partitions, not those of the attached dictionary.
+
+PARTITION_PREFIX = 'word_review_items_'
+PARTITION_GLOB = PARTITION_PREFIX + '[0-9][0-9][0-9][0-9]_[0-9][0-9]'
+COLUMNS = 'id, word_id, study_session_id, correct, created_at'
+MONTH = re.compile(r'(\d{4})-(\d{2})')
+
+with open(os.path.join(SQL_DIRECTORY, 'setup', 'create_table_word_review_items.sql')) as file:
+  PARTITION_SQL = file.read()
+
+def partition_name(created_at):
+  """The partition holding a review stamped created_at ('YYYY-MM-DD HH:MM:SS' or 'YYYY-MM')."""
+  match = MONTH.match(created_at or '')
+  if not match:
+    raise ValueError(f'Invalid review timestamp: {created_at!r}')
+  return f'{PARTITION_PREFIX}{match.group(1)}_{match.group(2)}'
+
+def _month_index(table):
+  return int(table[-7:-3]) * 12 + int(table[-2:]) - 1
+
+def _month(index):
+  return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+def partitions(cursor):
+  """The partition names, oldest month first."""
+  cursor.execute('''
+    SELECT name FROM main.sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name
+  ''', (PARTITION_GLOB,))
+  return [row[0] for row in cursor.fetchall()]
+
+def begin_write(cursor):
+  """Take the write lock now, unless the caller's transaction already holds it."""
+  if not cursor.connection.in_transaction:
+    cursor.execute('BEGIN IMMEDIATE')
+
+def high_water_mark(cursor):
+  """The highest review id handed out so far."""
+  cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM main.sqlite_sequence WHERE name GLOB ?', (PARTITION_GLOB,))
+  return cursor.fetchone()[0]
+
+def _raise_sequence(cursor, table, seq):
+  # Raise an AUTOINCREMENT table's sequence to at least seq
+  cursor.execute('UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq, table))
+  if cursor.rowcount == 0 and seq:
+    cursor.execute('INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)', (table, seq))
+
+def _drop_tables(cursor, tables):
+  # With secure_delete on (the default in some SQLite builds) a DROP overwrites every
+  # page of the table with zeros first; off, the pages just go on the freelist
+  cursor.execute('PRAGMA main.secure_delete')
+  secure_delete = cursor.fetchone()[0]
+  cursor.execute('PRAGMA main.secure_delete = 0')
+  try:
+    for table in tables:
+      cursor.execute(f'DROP TABLE main.{table}')
+  finally:
+    cursor.execute(f'PRAGMA main.secure_delete = {int(secure_delete)}')
+
+def _create_table(cursor, table):
+  for sql in split_script(PARTITION_SQL.format(table=table)):
+    cursor.execute(sql)
+
+def _define_view(cursor):
+  # (Re)define the view over every partition; a database without any gets the current month's
+  tables = partitions(cursor)
+  if not tables:
+    tables = [partition_name(datetime.now(timezone.utc).strftime('%Y-%m'))]
+    _create_table(cursor, tables[0])
+  cursor.execute('DROP VIEW IF EXISTS main.word_review_items')
+  cursor.execute('CREATE VIEW main.word_review_items AS\n' +
+                 '\nUNION ALL\n'.join(f'SELECT {COLUMNS} FROM {table}' for table in tables))
+  return tables
+
+def retention_start(months, now=None):
+  """The first month ('YYYY-MM') of the latest `months` months, the current one included."""
+  if months < 1:
+    raise ValueError('Retention must keep at least one month')
+  now = now or datetime.now(timezone.utc)
+  return _month(now.year * 12 + now.month - 1 - (months - 1))
+
+def create_partition(cursor, table):
+  """Create an empty partition and add it to the view. Does not commit."""
+  begin_write(cursor)
+  _create_table(cursor, table)
+  _define_view(cursor)
+
+def insert_review_items(cursor, rows, retention_months=None):
+  """Insert (study_session_id, word_id, correct, created_at) rows into their months' partitions.
+
+  Creating a partition also applies the retention policy when retention_months is
+  set (expire_review_items); rows from before the retention window are refused with
+  a ValueError. Does not commit.
+  """
+  if retention_months:
+    oldest = retention_start(retention_months)
+    for row in rows:
+      if row[3] < oldest:
+        raise ValueError(f'Review at {row[3]} is older than the review log retention window '
+                         f'({retention_months} months, from {oldest})')
+
+  # Under the write lock, so no other connection hands out the same ids
+  begin_write(cursor)
+  next_id = high_water_mark(cursor) + 1
+  by_partition = {}
+  for offset, (session_id, word_id, correct, created_at) in enumerate(rows):
+    by_partition.setdefault(partition_name(created_at), []).append(
+      (next_id + offset, word_id, session_id, correct, created_at))
+
+  created = False
+  for table, partition_rows in by_partition.items():
+    sql = f'INSERT INTO main.{table} ({COLUMNS}) VALUES (?, ?, ?, ?, ?)'
+    try:
+      cursor.executemany(sql, partition_rows)
+    except sqlite3.OperationalError as e:
+      if 'no such table' not in str(e):
+        raise
+      create_partition(cursor, table)
+      created = True
+      cursor.executemany(sql, partition_rows)
+
+  if created and retention_months:
+    expire_review_items(cursor, retention_months)
+  return len(rows)
+
+def drop_partitions(cursor, tables):
+  """Drop whole partitions, keeping the view and the id sequence going. Does not commit."""
+  begin_write(cursor)
+  high_water = high_water_mark(cursor)
+  _drop_tables(cursor, tables)
+  remaining = _define_view(cursor)
+  _raise_sequence(cursor, remaining[-1], high_water)
+  bump_versions(cursor, 'word_review_items')
+
+def truncate_review_items(cursor):
+  """Empty the review log by swapping in one empty partition. Does not commit."""
+  drop_partitions(cursor, partitions(cursor))
+
+def expire_review_items(cursor, months, now=None):
+  """Drop the partitions before the latest `months` months (the current one included).
+
+  Returns the names of the dropped partitions. Only the review log shrinks: the
+  aggregates (word counters and schedules, session summaries, daily activity,
+  study_stats) keep counting the expired reviews, and expired_session_reviews
+  counts them per session. Does not commit.
+  """
+  keep_from = partition_name(retention_start(months, now))
+  expired = [table for table in partitions(cursor) if table < keep_from]
+  if expired:
+    begin_write(cursor)
+    for table in expired:
+      cursor.execute(f'''
+        INSERT INTO main.expired_session_reviews (study_session_id, review_count, correct_count)
+        SELECT study_session_id, COUNT(*), SUM(correct) FROM main.{table}
+        GROUP BY study_session_id
+        ON CONFLICT(study_session_id) DO UPDATE SET
+          review_count = review_count + excluded.review_count,
+          correct_count = correct_count + excluded.correct_count
+      ''')
+    drop_partitions(cursor, expired)
+  return expired
+
+def _copy_months(cursor, source):
+  # Copy the review log `source` (a table or view) into partitions, one month at a time
+  cursor.execute(f'SELECT DISTINCT substr(created_at, 1, 7) FROM {source} WHERE created_at IS NOT NULL')
+  months = sorted(row[0] for row in cursor.fetchall())
+  copied = 0
+  for month in months:
+    table = partition_name(month)
+    _create_table(cursor, table)
+    cursor.execute(f'''
+      INSERT INTO main.{table} ({COLUMNS})
+      SELECT {COLUMNS} FROM {source}
+      WHERE created_at >= ? AND created_at < ?
+    ''', (month, _month(_month_index(table) + 1)))
+    copied += cursor.rowcount
+  cursor.execute(f'SELECT COUNT(*) FROM {source}')
+  total = cursor.fetchone()[0]
+  if copied != total:
+    raise ValueError(f'{total - copied} rows of {source} have no valid created_at')
+
+def _replace_partitions(cursor, source, high_water=0):
+  begin_write(cursor)
+  high_water = max(high_water, high_water_mark(cursor))
+  _drop_tables(cursor, partitions(cursor))
+  _copy_months(cursor, source)
+  remaining = _define_view(cursor)
+  _raise_sequence(cursor, remaining[-1], high_water)
+  bump_versions(cursor, 'word_review_items')
+
+def replace_review_items(cursor, source):
+  """Replace the review log with a copy of the review log `source`, e.g. 'other.word_review_items'.
+
+  Ids are kept. Does not commit.
+  """
+  _replace_partitions(cursor, source)
+
+def partition_review_items(cursor):
+  """Move a single-table review log (from before partitioning) into monthly partitions,
+  keeping its ids and sequence, then swap in the view. Creates the view if there is no
+  review log yet.
+
+  A generator copying one month per step: the caller commits after each step (a
+  migration's steps(cursor), lib/migrations.py), so no transaction holds the write
+  lock for the whole log, and swaps in the view in its own transaction after the last
+  one. Rerun after an interruption, it keeps the months already copied and only copies
+  the rows they are missing. Does not commit.
+  """
+  cursor.execute("SELECT type FROM main.sqlite_master WHERE name = 'word_review_items'")
+  existing = cursor.fetchone()
+  if existing and existing[0] == 'view':
+    return
+  begin_write(cursor)
+  if existing is None:
+    _define_view(cursor)
+    return
+
+  cursor.execute('SELECT DISTINCT substr(created_at, 1, 7) FROM main.word_review_items WHERE created_at IS NOT NULL')
+  months = sorted(row[0] for row in cursor.fetchall())
+  for month in months:
+    begin_write(cursor)
+    table = partition_name(month)
+    _create_table(cursor, table)
+    # Ids are AUTOINCREMENT: the month's rows written since it was copied come after its last one
+    cursor.execute(f'''
+      INSERT INTO main.{table} ({COLUMNS})
+      SELECT {COLUMNS} FROM main.word_review_items
+      WHERE created_at >= ? AND created_at < ?
+        AND id > (SELECT COALESCE(MAX(id), 0) FROM main.{table})
+    ''', (month, _month(_month_index(table) + 1)))
+    yield table
+
+  begin_write(cursor)
+  cursor.execute('SELECT COUNT(*) FROM main.word_review_items')
+  total = cursor.fetchone()[0]
+  copied = 0
+  for table in partitions(cursor):
+    cursor.execute(f'SELECT COUNT(*) FROM main.{table}')
+    copied += cursor.fetchone()[0]
+  if copied != total:
+    raise ValueError(f'{total - copied} rows of word_review_items have no valid created_at')
+
+  cursor.execute("SELECT seq FROM main.sqlite_sequence WHERE name = 'word_review_items'")
+  sequence = cursor.fetchone()
+  high_water = max(sequence[0] if sequence else 0, high_water_mark(cursor))
+  _drop_tables(cursor, ['word_review_items'])
+  remaining = _define_view(cursor)
+  _raise_sequence(cursor, remaining[-1], high_water)
+  bump_versions(cursor, 'word_review_items')
+
+def setup_review_items(cursor):
+  """Create the view and a first partition for a new database. Does not commit.
+
+  Raises ValueError on a single-table review log: partition_review_items moves it,
+  through the migrations (migrate.py).
+  """
+  cursor.execute("SELECT type FROM main.sqlite_master WHERE name = 'word_review_items'")
+  existing = cursor.fetchone()
+  if existing and existing[0] == 'view':
+    return
+  if existing is not None:
+    raise ValueError('word_review_items is a single table: apply the migrations (python migrate.py) to partition it')
+  begin_write(cursor)
+  _define_view(cursor)
+
+def swap_empty_table(cursor, table):
+  """Replace an ordinary table with an empty one with the same schema, indexes, triggers and
+  AUTOINCREMENT sequence. Dropping it fires no DELETE triggers. Does not commit."""
+  begin_write(cursor)
+  cursor.execute('''
+    SELECT sql FROM main.sqlite_master
+    WHERE tbl_name = ? AND sql IS NOT NULL
+    ORDER BY type != 'table'
+  ''', (table,))
+  schema = [row[0] for row in cursor.fetchall()]
+  cursor.execute('SELECT seq FROM main.sqlite_sequence WHERE name = ?', (table,))
+  sequence = cursor.fetchone()
+  _drop_tables(cursor, [table])
+  for sql in schema:
+    cursor.execute(sql)
+  if sequence:
+    _raise_sequence(cursor, table, sequence[0])
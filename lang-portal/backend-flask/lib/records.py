@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import os
+
+# Request bodies and files holding many records.
+#
+# Bulk endpoints accept either a JSON array or NDJSON (one JSON object per line,
+# Content-Type application/x-ndjson). NDJSON is read line by line from the request
+# stream, so a large upload is never held in memory as one document.
+#
+# iter_file_records reads a JSON array, NDJSON or CSV file incrementally, one record
+# at a time, for importers.
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+class InvalidBody(ValueError):
+  pass
+
+def is_ndjson(request):
+  return request.mimetype in NDJSON_TYPES
+
+def iter_records(request):
+  """Yield (index, record) for every record in the request body.
+
+  A record that fails to parse is yielded as the exception instead, so callers
+  can report it against its index and carry on. Raises InvalidBody when the
+  body as a whole is unusable (e.g. a JSON body that is not an array).
+  """
+  if is_ndjson(request):
+    return _iter_ndjson(request.stream)
+
+  data = request.get_json(silent=True)
+  if not isinstance(data, list):
+    raise InvalidBody('Expected a JSON array or NDJSON body')
+  return enumerate(data)
+
+def _iter_ndjson(stream):
+  index = 0
+  for line in io.TextIOWrapper(stream, encoding='utf-8'):
+    if not line.strip():
+      continue
+    try:
+      yield index, json.loads(line)
+    except ValueError as e:
+      yield index, e
+    index += 1
+
+def _iter_lines(text):
+  # Parse one JSON document per non-blank line
+  for line in text:
+    if line.strip():
+      yield json.loads(line)
+
+def iter_json_array(text, read_size=65536):
+  """Yield the items of a top-level JSON array from a text file, reading it in blocks."""
+  decoder = json.JSONDecoder()
+  buffer = ''
+  pos = 0
+
+  def fill():
+    nonlocal buffer, pos
+    block = text.read(read_size)
+    if not block:
+      return False
+    buffer = buffer[pos:] + block
+    pos = 0
+    return True
+
+  opened = False
+  while True:
+    # Skip whitespace (and the separating commas once inside the array)
+    while pos < len(buffer) and (buffer[pos].isspace() or (opened and buffer[pos] == ',')):
+      pos += 1
+    if pos == len(buffer):
+      if not fill():
+        raise ValueError('Unterminated JSON array' if opened else 'Expected a JSON array')
+      continue
+
+    if not opened:
+      if buffer[pos] != '[':
+        raise ValueError('Expected a JSON array')
+      opened = True
+      pos += 1
+      continue
+    if buffer[pos] == ']':
+      return
+
+    try:
+      item, end = decoder.raw_decode(buffer, pos)
+    except json.JSONDecodeError:
+      # The item runs past the end of the buffer; read more and try again
+      if not fill():
+        raise
+      continue
+    if end == len(buffer) and fill():
+      continue  # A bare number may continue in the next block
+    yield item
+    pos = end
+
+def iter_file_records(path, format=None):
+  """Yield the records of a .json (array), .ndjson/.jsonl or .csv file as dicts.
+
+  The format is taken from the extension unless given. CSV files need a header row.
+  """
+  format = format or os.path.splitext(path)[1].lstrip('.').lower()
+  with open(path, 'r', encoding='utf-8', newline='') as text:
+    if format == 'json':
+      yield from iter_json_array(text)
+    elif format in ('ndjson', 'jsonl'):
+      yield from _iter_lines(text)
+    elif format == 'csv':
+      yield from csv.DictReader(text)
+    else:
+      raise ValueError(f'Unsupported format: {format}')
@@ -0,0 +1,352 @@
+# Review write path.
+#
+# Every write to word_review_items goes through record_reviews so the aggregates
+# derived from the review log stay in step with it inside the caller's transaction:
+# - word_reviews: per-word correct/wrong counters, last review time and spaced
+#   repetition schedule (lib/srs.py)
+# - study_sessions: per-session review and correct counts and last activity time
+# - study_stats: review totals, studied and mastered words (triggers on word_reviews)
+# - daily_activity: reviews per day (sessions per day come from triggers on study_sessions)
+# - daily_group_activity: reviews per day and group, whose rows count the groups
+#   touched per day into daily_activity.groups_count (triggers); its data version
+#   is daily_activity's
+#
+# rebuild_aggregates recomputes them from word_review_items in bulk, as long as no
+# review has expired from it (expired_session_reviews, lib/partitions.py). Each
+# function also bumps the data versions (lib/versions.py) of the tables it changes.
+#
+# word_review_items is a view over monthly partitions (lib/partitions.py): reviews
+# are inserted into their month's partition, and the reset swaps in empty tables.
+
+import json
+from datetime import datetime, timezone
+
+from lib.partitions import insert_review_items, retention_start, swap_empty_table, truncate_review_items
+from lib.srs import DEFAULT_EASE, NEW_STATE, TIMESTAMP_FORMAT, due_at, load_states, rebuild_schedule, schedule
+from lib.versions import bump_versions
+
+REVIEW_TABLES = ('word_review_items', 'word_reviews', 'study_sessions', 'study_stats', 'daily_activity')
+
+class TruncatedReviewLog(ValueError):
+  pass
+
+def record_reviews(cursor, reviews, retention_months=None):
+  """Insert (study_session_id, word_id, is_correct[, created_at]) reviews and update the aggregates.
+
+  created_at is a 'YYYY-MM-DD HH:MM:SS' UTC string; reviews without one are stamped
+  with the current time. retention_months is the review log retention policy, applied
+  when a review starts a new month (lib/partitions.py). Does not commit; the caller
+  owns the transaction.
+  """
+  # Unstamped reviews are stamped here, so the log, the counters and the schedule agree
+  now = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+  rows = [(review[0], review[1], 1 if review[2] else 0, (review[3] if len(review) > 3 else None) or now)
+          for review in reviews]
+  if not rows:
+    return 0
+
+  insert_review_items(cursor, rows, retention_months)
+
+  # Group the batch by word, in review order
+  by_word = {}
+  for _, word_id, correct, created_at in rows:
+    by_word.setdefault(word_id, []).append((created_at, correct))
+
+  # Fold each word's reviews into one counter delta, its latest review time and its new schedule
+  states = load_states(cursor, by_word)
+  updates = []
+  for word_id, word_reviews in by_word.items():
+    word_reviews.sort(key=lambda review: review[0])
+    state = states.get(word_id, NEW_STATE)
+    for _, correct in word_reviews:
+      state = schedule(state, correct)
+    correct_count = sum(correct for _, correct in word_reviews)
+    last_reviewed = word_reviews[-1][0]
+    updates.append((word_id, correct_count, len(word_reviews) - correct_count, last_reviewed,
+                    *state, due_at(last_reviewed, state[1])))
+
+  # The next review is due after the word's latest review, which may be a stored one
+  # later than this batch (a back-dated ingest): due_at never moves back before it
+  cursor.executemany('''
+    INSERT INTO word_reviews
+    (word_id, correct_count, wrong_count, last_reviewed, repetitions, interval_days, ease, due_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(word_id) DO UPDATE SET
+      correct_count = correct_count + excluded.correct_count,
+      wrong_count = wrong_count + excluded.wrong_count,
+      last_reviewed = MAX(COALESCE(last_reviewed, ''), excluded.last_reviewed),
+      repetitions = excluded.repetitions,
+      interval_days = excluded.interval_days,
+      ease = excluded.ease,
+      due_at = CASE
+        WHEN last_reviewed > excluded.last_reviewed
+        THEN datetime(last_reviewed, '+' || excluded.interval_days || ' days')
+        ELSE excluded.due_at
+      END
+  ''', updates)
+
+  # Fold the batch into one summary update per session
+  sessions = {}
+  for session_id, _, correct, created_at in rows:
+    review_count, correct_count, last_activity_at = sessions.get(session_id, (0, 0, created_at))
+    sessions[session_id] = (review_count + 1, correct_count + correct, max(last_activity_at, created_at))
+
+  cursor.executemany('''
+    UPDATE study_sessions SET
+      review_count = review_count + ?,
+      correct_count = correct_count + ?,
+      last_activity_at = MAX(COALESCE(last_activity_at, ''), ?)
+    WHERE id = ?
+  ''', [(review_count, correct_count, last_activity_at, session_id)
+        for session_id, (review_count, correct_count, last_activity_at) in sessions.items()])
+
+  # Fold the batch into one delta per day, and per day and session for the groups
+  days = {}
+  session_days = {}
+  for session_id, _, correct, created_at in rows:
+    day = created_at[:10]
+    reviews_count, correct_count = days.get(day, (0, 0))
+    days[day] = (reviews_count + 1, correct_count + correct)
+    session_days[(day, session_id)] = session_days.get((day, session_id), 0) + 1
+
+  cursor.executemany('''
+    INSERT INTO daily_activity (activity_date, reviews_count, correct_count)
+    VALUES (?, ?, ?)
+    ON CONFLICT(activity_date) DO UPDATE SET
+      reviews_count = reviews_count + excluded.reviews_count,
+      correct_count = correct_count + excluded.correct_count
+  ''', [(day, reviews_count, correct_count) for day, (reviews_count, correct_count) in days.items()])
+
+  cursor.executemany('''
+    INSERT INTO daily_group_activity (activity_date, group_id, reviews_count)
+    SELECT ?, group_id, ? FROM study_sessions WHERE id = ?
+    ON CONFLICT(activity_date, group_id) DO UPDATE SET
+      reviews_count = reviews_count + excluded.reviews_count
+  ''', [(day, reviews_count, session_id) for (day, session_id), reviews_count in session_days.items()])
+
+  bump_versions(cursor, *REVIEW_TABLES)
+  return len(rows)
+
+def existing_ids(cursor, table, ids):
+  """Return the subset of ids that exist in table, with one set-based query."""
+  cursor.execute(f'''
+    SELECT id FROM {table}
+    WHERE id IN (SELECT value FROM json_each(?))
+  ''', (json.dumps(sorted(set(ids))),))
+  return {row[0] for row in cursor.fetchall()}
+
+def ingest_reviews(cursor, items, chunk_size=5000, retention_months=None):
+  """Validate and record bulk review items, returning one result per item.
+
+  items yields (index, item) pairs, where item is a parsed JSON object or an
+  Exception raised while parsing it. Valid items are written chunk by chunk
+  with record_reviews; invalid ones are reported and skipped. Does not commit,
+  so the whole ingestion lands in the caller's single transaction.
+  """
+  results = []
+  chunk = []
+  for index, item in items:
+    chunk.append((index, item))
+    if len(chunk) >= chunk_size:
+      results.extend(_ingest_chunk(cursor, chunk, retention_months))
+      chunk = []
+  if chunk:
+    results.extend(_ingest_chunk(cursor, chunk, retention_months))
+  return results
+
+def _parse_review_item(item):
+  # Return (session_id, word_id, is_correct, created_at), or raise ValueError
+  if isinstance(item, Exception):
+    raise ValueError(f'Invalid JSON: {item}')
+  if not isinstance(item, dict):
+    raise ValueError('Review must be an object')
+  for field in ('session_id', 'word_id', 'is_correct'):
+    if field not in item:
+      raise ValueError(f'Missing {field}')
+  session_id, word_id, is_correct = item['session_id'], item['word_id'], item['is_correct']
+  if not isinstance(session_id, int) or isinstance(session_id, bool):
+    raise ValueError('session_id must be an integer')
+  if not isinstance(word_id, int) or isinstance(word_id, bool):
+    raise ValueError('word_id must be an integer')
+  if is_correct not in (True, False):
+    raise ValueError('is_correct must be a boolean')
+  created_at = item.get('created_at')
+  if created_at is not None:
+    try:
+      timestamp = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+    except ValueError:
+      raise ValueError('created_at must be an ISO 8601 timestamp')
+    if timestamp.tzinfo is not None:
+      timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    created_at = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+  return session_id, word_id, bool(is_correct), created_at
+
+def _ingest_chunk(cursor, chunk, retention_months):
+  parsed = {}
+  results = {}
+  for index, item in chunk:
+    try:
+      parsed[index] = _parse_review_item(item)
+    except ValueError as e:
+      results[index] = {"index": index, "status": "rejected", "error": str(e)}
+
+  # Check every referenced session and word with one query each
+  sessions = existing_ids(cursor, 'study_sessions', [review[0] for review in parsed.values()])
+  words = existing_ids(cursor, 'words', [review[1] for review in parsed.values()])
+  # A review from before the retention window would only be expired again
+  oldest = retention_start(retention_months) if retention_months else None
+
+  accepted = []
+  for index, review in parsed.items():
+    if review[0] not in sessions:
+      results[index] = {"index": index, "status": "rejected", "error": "Study session not found"}
+    elif review[1] not in words:
+      results[index] = {"index": index, "status": "rejected", "error": "Word not found"}
+    elif oldest and review[3] is not None and review[3] < oldest:
+      results[index] = {"index": index, "status": "rejected",
+                        "error": f"Review is older than the review log retention window (from {oldest})"}
+    else:
+      accepted.append(review)
+      results[index] = {"index": index, "status": "recorded"}
+
+  record_reviews(cursor, accepted, retention_months)
+  return [results[index] for index, _ in chunk]
+
+def clear_study_history(cursor):
+  """Delete all sessions and reviews and zero the aggregates. Does not commit."""
+  # Swap in an empty review log and an empty sessions table instead of deleting row
+  # by row; the sessions' delete triggers do not fire, so zero their counts here
+  truncate_review_items(cursor)
+  swap_empty_table(cursor, 'study_sessions')
+  cursor.execute('DELETE FROM expired_session_reviews')
+  cursor.execute('UPDATE study_stats SET sessions_count = 0 WHERE id = 1')
+
+  # Zero the counters and schedules (a trigger clears word_groups.due_at)
+  cursor.execute('''
+    UPDATE word_reviews
+    SET correct_count = 0, wrong_count = 0, last_reviewed = NULL,
+        repetitions = 0, interval_days = 0, ease = ?, due_at = NULL
+    WHERE correct_count > 0 OR wrong_count > 0
+  ''', (DEFAULT_EASE,))
+
+  swap_empty_table(cursor, 'daily_group_activity')
+  cursor.execute('DELETE FROM daily_activity')
+  bump_versions(cursor, *REVIEW_TABLES)
+
+def recount_study_stats(cursor):
+  """Recount study_stats from words, word_reviews and study_sessions (not the review log,
+  so expired reviews stay counted). Does not commit."""
+  cursor.execute('''
+    INSERT OR REPLACE INTO study_stats
+    (id, vocabulary_count, words_studied, mastered_words, reviews_count, correct_count, sessions_count)
+    SELECT
+      1,
+      (SELECT COUNT(*) FROM words),
+      COUNT(*) FILTER (WHERE correct_count + wrong_count > 0),
+      COUNT(*) FILTER (
+        WHERE correct_count + wrong_count >= 5
+        AND correct_count * 1.0 / (correct_count + wrong_count) >= 0.8
+      ),
+      COALESCE(SUM(correct_count + wrong_count), 0),
+      COALESCE(SUM(correct_count), 0),
+      (SELECT COUNT(*) FROM study_sessions)
+    FROM word_reviews
+  ''')
+  bump_versions(cursor, 'study_stats')
+
+def rebuild_aggregates(cursor):
+  """Recompute every aggregate from word_review_items. Does not commit.
+
+  Raises TruncatedReviewLog once the retention policy has dropped reviews from the
+  log: a rebuild would lose them from every aggregate.
+  """
+  cursor.execute('SELECT COALESCE(SUM(review_count), 0) FROM expired_session_reviews')
+  expired = cursor.fetchone()[0]
+  if expired:
+    raise TruncatedReviewLog(f'{expired} reviews have expired from the review log; '
+                             f'rebuilding the aggregates from it would drop them')
+
+  # One row per word, so word lists can join word_reviews instead of LEFT JOIN + COALESCE
+  cursor.execute('DELETE FROM word_reviews')
+  cursor.execute('''
+    INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+    SELECT
+      w.id,
+      COALESCE(agg.correct_count, 0),
+      COALESCE(agg.wrong_count, 0),
+      agg.last_reviewed
+    FROM words w
+    LEFT JOIN (
+      SELECT
+        word_id,
+        SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) AS correct_count,
+        SUM(CASE WHEN correct = 0 THEN 1 ELSE 0 END) AS wrong_count,
+        MAX(created_at) AS last_reviewed
+      FROM word_review_items
+      GROUP BY word_id
+    ) agg ON agg.word_id = w.id
+  ''')
+  rows = cursor.rowcount
+
+  # Replay the review log through the scheduler
+  rebuild_schedule(cursor)
+
+  # The triggers kept study_stats in step with the rows above; recount it from the
+  # source tables anyway so a rebuild also repairs any drift
+  recount_study_stats(cursor)
+
+  # Session summaries
+  cursor.execute('''
+    UPDATE study_sessions SET review_count = 0, correct_count = 0, last_activity_at = NULL
+    WHERE review_count != 0 OR last_activity_at IS NOT NULL
+  ''')
+  cursor.execute('''
+    UPDATE study_sessions SET
+      review_count = agg.review_count,
+      correct_count = agg.correct_count,
+      last_activity_at = agg.last_activity_at
+    FROM (
+      SELECT study_session_id, COUNT(*) AS review_count, SUM(correct) AS correct_count,
+             MAX(created_at) AS last_activity_at
+      FROM word_review_items
+      GROUP BY study_session_id
+    ) agg
+    WHERE study_sessions.id = agg.study_session_id
+  ''')
+
+  # Emptied first, as its delete trigger decrements daily_activity.groups_count
+  cursor.execute('DELETE FROM daily_group_activity')
+  cursor.execute('DELETE FROM daily_activity')
+  cursor.execute('''
+    INSERT INTO daily_activity (activity_date, sessions_count, reviews_count, correct_count)
+    SELECT activity_date, SUM(sessions_count), SUM(reviews_count), SUM(correct_count)
+    FROM (
+      SELECT date(created_at) AS activity_date, COUNT(*) AS sessions_count, 0 AS reviews_count, 0 AS correct_count
+      FROM study_sessions
+      GROUP BY date(created_at)
+      UNION ALL
+      SELECT date(created_at), 0, COUNT(*), SUM(correct)
+      FROM word_review_items
+      GROUP BY date(created_at)
+    )
+    GROUP BY activity_date
+  ''')
+
+  # Per day and group; each new row counts its group into daily_activity.groups_count
+  cursor.execute('''
+    INSERT INTO daily_group_activity (activity_date, group_id, sessions_count, reviews_count)
+    SELECT activity_date, group_id, SUM(sessions_count), SUM(reviews_count)
+    FROM (
+      SELECT date(created_at) AS activity_date, group_id, COUNT(*) AS sessions_count, 0 AS reviews_count
+      FROM study_sessions
+      GROUP BY date(created_at), group_id
+      UNION ALL
+      SELECT date(wri.created_at), ss.group_id, 0, COUNT(*)
+      FROM word_review_items wri
+      JOIN study_sessions ss ON ss.id = wri.study_session_id
+      GROUP BY date(wri.created_at), ss.group_id
+    )
+    GROUP BY activity_date, group_id
+  ''')
+  bump_versions(cursor, 'word_reviews', 'study_sessions', 'study_stats', 'daily_activity')
+  return rows
@@ -0,0 +1,26 @@
+import re
+
+# Word search over the words_fts index (sql/setup/create_table_words_fts.sql).
+#
+# User input is never passed to MATCH as FTS5 syntax. It is split into the same
+# tokens the unicode61 tokenizer produces (runs of letters and digits), each token
+# is quoted, and the last one becomes a prefix query so results follow the user
+# as they type: "acqua fre" -> "acqua" "fre"*. A single character is matched as a
+# whole token, since the prefix indexes start at two characters and a one-letter
+# prefix matches a large part of the vocabulary. Accents are folded by the
+# tokenizer on both sides, so the query needs no normalization of its own.
+
+TOKEN = re.compile(r'[^\W_]+')
+
+# Shortest last token searched as a prefix (matches the smallest prefix index)
+MIN_PREFIX = 2
+
+def match_query(text):
+  """The FTS5 MATCH expression for a search string, or None if it has no tokens."""
+  tokens = TOKEN.findall(text or '')
+  if not tokens:
+    return None
+  terms = [f'"{token}"' for token in tokens]
+  if len(tokens[-1]) >= MIN_PREFIX:
+    terms[-1] += '*'
+  return ' '.join(terms)
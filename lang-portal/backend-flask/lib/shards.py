@@ -0,0 +1,358 @@
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+
+from lib.db import Db
+from lib.partitions import replace_review_items, setup_review_items
+from lib.statements import split_script
+from lib.versions import DataVersions, bump_versions
+
+# Per-learner databases.
+#
+# With DB_SHARDS_DIR set, every learner gets an SQLite file of their own,
+# <DB_SHARDS_DIR>/<learner>.db, holding only their study data (LEARNER_TABLES).
+# The dictionary (words, groups and study activities) stays in DATABASE, which
+# each shard connection attaches read-only as `dictionary`. SQLite resolves an
+# unqualified table name to the shard first and to the dictionary otherwise, so
+# every query in sql/ and routes/ runs unchanged. Writes only touch the shard,
+# so learners no longer queue on one database's write lock.
+#
+# Two kinds of dictionary row are copied into each shard, because learner data
+# hangs off them:
+# - word_reviews: a zeroed row per word, so counters can be read with a plain JOIN
+# - word_groups: group membership, which carries the learner's due_at (lib/srs.py)
+# sync_dictionary brings the copies up to date when the dictionary's versions
+# for those tables move (e.g. after `invoke import-words`).
+#
+# ShardedDb keeps idle connections in an LRU across learners: at most
+# max_connections are open, and a learner without an idle connection takes the
+# place of the least recently used one.
+
+LEARNER_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+# Tables a shard holds; everything else is read from the dictionary
+LEARNER_TABLES = ('word_reviews', 'word_review_items', 'word_groups', 'study_sessions', 'expired_session_reviews',
+                  'study_stats', 'daily_group_activity', 'daily_activity', 'data_versions')
+
+# Dictionary tables whose data versions the shards' ETags use
+SHARED_TABLES = ('words', 'words_fts', 'groups', 'study_activities')
+
+# A shard's data versions, with the dictionary's for the shared tables; the database id
+# combines both, so a re-created dictionary or shard never reuses an ETag
+SHARD_VERSIONS_SQL = f'''
+  SELECT 'database', (SELECT version FROM main.data_versions WHERE table_name = 'database') || '.' ||
+                     (SELECT version FROM dictionary.data_versions WHERE table_name = 'database')
+  UNION ALL
+  SELECT table_name, version FROM main.data_versions
+  WHERE table_name NOT IN ('database', {', '.join(f"'{table}'" for table in SHARED_TABLES)})
+  UNION ALL
+  SELECT table_name, version FROM dictionary.data_versions
+  WHERE table_name IN ({', '.join(f"'{table}'" for table in SHARED_TABLES)})
+'''
+
+class InvalidLearner(ValueError):
+  pass
+
+def learner_from_headers(headers, header):
+  """The learner id sent in `header`; raises InvalidLearner if it is missing or malformed."""
+  learner = headers.get(header)
+  if not learner:
+    raise InvalidLearner(f'Missing learner: send the {header} header or use /learners/<id>/...')
+  if not LEARNER_ID.fullmatch(learner):
+    raise InvalidLearner(f'Invalid learner id: {learner!r}')
+  return learner
+
+class LearnerPrefix:
+  """WSGI middleware serving /learners/<id>/<path> as /<path> for learner <id>.
+
+  The id is passed on in the learner header, so both ways of naming a learner
+  resolve in one place (learner_from_headers).
+  """
+
+  def __init__(self, wsgi_app, header):
+    self.wsgi_app = wsgi_app
+    self.environ_key = 'HTTP_' + header.upper().replace('-', '_')
+
+  def __call__(self, environ, start_response):
+    path = environ.get('PATH_INFO', '')
+    if path.startswith('/learners/'):
+      learner, _, rest = path[len('/learners/'):].partition('/')
+      environ['SCRIPT_NAME'] = f"{environ.get('SCRIPT_NAME', '')}/learners/{learner}"
+      environ['PATH_INFO'] = f'/{rest}'
+      environ[self.environ_key] = learner
+    return self.wsgi_app(environ, start_response)
+
+def shard_schema(statements):
+  """The setup statements of a shard: its tables, and the indexes and triggers on them.
+
+  The review log's partitions and view are set up by lib/partitions.py instead.
+  """
+  schema = [statements.get(f'setup/create_table_{table}') for table in LEARNER_TABLES
+            if table != 'word_review_items']
+  for script in ('setup/create_indexes', 'setup/create_triggers'):
+    for sql in split_script(statements.get(script)):
+      code = re.sub(r'--[^\n]*', '', sql)
+      target = re.search(r'\bON\s+(\w+)', code)
+      # Triggers keeping dictionary counters (groups.words_count) stay in the dictionary
+      writes = re.findall(r'\b(?:(?<!DO )UPDATE|INSERT\s+(?:OR\s+\w+\s+)?INTO|DELETE\s+FROM)\s+(\w+)', code.split('BEGIN', 1)[-1])
+      if target and target.group(1) in LEARNER_TABLES and all(table in LEARNER_TABLES for table in writes):
+        schema.append(sql)
+  return schema
+
+def setup_shard(connection, statements):
+  """Create a shard's schema if it is new. Commits."""
+  if connection.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'data_versions'").fetchone():
+    # A shard from before the retention policy's per-session counts
+    with connection:
+      connection.execute(statements.get('setup/create_table_expired_session_reviews'))
+    return
+  with connection:
+    for sql in shard_schema(statements):
+      connection.execute(sql)
+    setup_review_items(connection.cursor())
+    connection.execute('INSERT OR IGNORE INTO study_stats (id) VALUES (1)')
+    connection.execute('''
+      INSERT OR IGNORE INTO data_versions (table_name, version)
+      VALUES ('database', abs(random() % 1000000000))
+    ''')
+
+def sync_dictionary(connection):
+  """Copy new dictionary words and memberships into a shard. Commits; returns whether anything changed."""
+  versions = dict(connection.execute('''
+    SELECT table_name, version FROM dictionary.data_versions WHERE table_name IN ('database', 'words', 'word_groups')
+  ''').fetchall())
+  synced = dict(connection.execute('''
+    SELECT substr(table_name, 12), version FROM main.data_versions WHERE table_name LIKE 'dictionary.%'
+  ''').fetchall())
+  # A new shard, or a different dictionary: check every copy
+  full = not synced or synced.get('database') != versions.get('database')
+  words_changed = full or synced.get('words') != versions.get('words')
+  groups_changed = full or synced.get('word_groups') != versions.get('word_groups')
+  if not (words_changed or groups_changed):
+    return False
+
+  with connection:
+    if words_changed:
+      connection.execute('''
+        INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+        SELECT d.id, 0, 0, NULL
+        FROM dictionary.words d
+        WHERE NOT EXISTS (SELECT 1 FROM main.word_reviews r WHERE r.word_id = d.id)
+      ''')
+      connection.execute('UPDATE study_stats SET vocabulary_count = (SELECT COUNT(*) FROM dictionary.words) WHERE id = 1')
+      bump_versions(connection, 'word_reviews', 'study_stats')
+    if groups_changed:
+      connection.execute('''
+        DELETE FROM main.word_groups
+        WHERE NOT EXISTS (
+          SELECT 1 FROM dictionary.word_groups d
+          WHERE d.word_id = main.word_groups.word_id AND d.group_id = main.word_groups.group_id
+        )
+      ''')
+      connection.execute('''
+        INSERT INTO main.word_groups (word_id, group_id)
+        SELECT d.word_id, d.group_id
+        FROM dictionary.word_groups d
+        WHERE NOT EXISTS (
+          SELECT 1 FROM main.word_groups m WHERE m.word_id = d.word_id AND m.group_id = d.group_id
+        )
+      ''')
+      bump_versions(connection, 'word_groups')
+    connection.executemany('''
+      INSERT INTO data_versions (table_name, version) VALUES (?, ?)
+      ON CONFLICT(table_name) DO UPDATE SET version = excluded.version
+    ''', [(f'dictionary.{table}', version) for table, version in versions.items()])
+  return True
+
+def copy_study_data(connection, source):
+  """Replace a shard's study data with that of the database file `source` (e.g. words.db). Commits."""
+  connection.execute('ATTACH DATABASE ? AS source', (source,))
+  try:
+    with connection:
+      # In LEARNER_TABLES order, so the rollups copied last overwrite what triggers derived
+      tables = [table for table in LEARNER_TABLES if table != 'data_versions']
+      for table in tables:
+        if table == 'word_review_items':
+          replace_review_items(connection.cursor(), 'source.word_review_items')
+          continue
+        source_columns = {row[1] for row in connection.execute(f'PRAGMA source.table_info({table})')}
+        columns = ', '.join(row[1] for row in connection.execute(f'PRAGMA main.table_info({table})')
+                            if row[1] in source_columns)
+        connection.execute(f'DELETE FROM main.{table}')
+        connection.execute(f'INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table}')
+      bump_versions(connection, *tables)
+  finally:
+    connection.execute('DETACH DATABASE source')
+
+class ShardedDb(Db):
+  def __init__(self, directory, dictionary, max_connections=32, sync_interval=1.0, **settings):
+    super().__init__(database=dictionary, pool_size=max_connections, **settings)
+    self.directory = directory
+    self.sync_interval = sync_interval
+    os.makedirs(directory, exist_ok=True)
+
+    # Idle connections by learner, least recently used learner first
+    self._idle = OrderedDict()
+    self._idle_count = 0
+    self._available = threading.Condition(self._lock)
+    self._learners = {}  # id(connection) -> learner
+    self._synced_at = {}  # id(connection) -> time of its last dictionary check
+    self._evictions = 0
+
+  def shard_path(self, learner):
+    return os.path.join(self.directory, f'{learner}.db')
+
+  def connect(self, learner):
+    connection = super().connect(self.shard_path(learner), uri=True)
+    dictionary = pathlib.Path(self.database).resolve().as_uri() + '?mode=ro'
+    connection.execute('ATTACH DATABASE ? AS dictionary', (dictionary,))
+    connection.execute(f'PRAGMA dictionary.cache_size = -{int(self.cache_size_kib)}')
+    connection.execute(f'PRAGMA dictionary.mmap_size = {int(self.mmap_size)}')
+    setup_shard(connection, self.statements)
+    with self._lock:
+      self._learners[id(connection)] = learner
+    return connection
+
+  def _close(self, connection):
+    with self._lock:
+      self._prepared.pop(id(connection), None)
+      self._learners.pop(id(connection), None)
+      self._synced_at.pop(id(connection), None)
+    connection.close()
+
+  def _discard(self, connection):
+    self._close(connection)
+    with self._available:
+      self._opened -= 1
+      self._available.notify()
+
+  # Check out a connection to the learner's shard (the request's learner by default)
+  def acquire(self, learner=None):
+    learner = learner or g.get('learner')
+    if learner is None:
+      raise InvalidLearner('No learner for this request')
+
+    started = time.perf_counter()
+    connection, evicted, waited = None, None, False
+    with self._available:
+      while True:
+        idle = self._idle.get(learner)
+        if idle:
+          connection = idle.pop()
+          if not idle:
+            del self._idle[learner]
+          self._idle_count -= 1
+          break
+        if self._opened < self.pool_size:
+          self._opened += 1
+          break
+        if self._idle_count:
+          # Close the least recently used idle connection and open one in its place
+          oldest = next(iter(self._idle))
+          evicted = self._idle[oldest].pop(0)
+          if not self._idle[oldest]:
+            del self._idle[oldest]
+          self._idle_count -= 1
+          self._evictions += 1
+          break
+        remaining = self.pool_timeout - (time.perf_counter() - started)
+        waited = True
+        if remaining <= 0 or not self._available.wait(remaining):
+          raise sqlite3.OperationalError(
+            f'Timed out after {self.pool_timeout}s waiting for a database connection'
+          )
+      self._checkouts += 1
+      self._in_use += 1
+      if waited:
+        elapsed = time.perf_counter() - started
+        self._waits += 1
+        self._wait_seconds += elapsed
+        self._max_wait_seconds = max(self._max_wait_seconds, elapsed)
+
+    try:
+      if evicted is not None:
+        self._close(evicted)
+      if connection is None:
+        connection = self.connect(learner)
+      self._check_dictionary(connection)
+    except Exception:
+      with self._available:
+        self._in_use -= 1
+      if connection is not None:
+        self._discard(connection)
+      else:
+        with self._available:
+          self._opened -= 1
+          self._available.notify()
+      raise
+    return connection
+
+  def _check_dictionary(self, connection):
+    now = time.monotonic()
+    if now - self._synced_at.get(id(connection), float('-inf')) > self.sync_interval:
+      sync_dictionary(connection)
+      self._synced_at[id(connection)] = now
+
+  def release(self, connection):
+    with self._lock:
+      self._in_use -= 1
+    try:
+      if connection.in_transaction:
+        connection.rollback()
+    except sqlite3.Error:
+      self._discard(connection)
+      return
+    with self._available:
+      learner = self._learners[id(connection)]
+      self._idle.setdefault(learner, []).append(connection)
+      self._idle.move_to_end(learner)
+      self._idle_count += 1
+      self._available.notify()
+
+  def close_all(self):
+    with self._available:
+      connections = [connection for idle in self._idle.values() for connection in idle]
+      self._idle.clear()
+      self._idle_count = 0
+    for connection in connections:
+      self._discard(connection)
+
+  def pool_stats(self):
+    stats = super().pool_stats()
+    with self._lock:
+      stats.update(idle=self._idle_count, learners_idle=len(self._idle), evictions=self._evictions)
+    return stats
+
+class ShardedVersions:
+  """Data versions per learner (lib/versions.py), for the learners seen most recently."""
+
+  def __init__(self, db, ttl=1.0, size=1024):
+    self.db = db
+    self.ttl = ttl
+    self.size = size
+    self._lock = threading.Lock()
+    self._learners = OrderedDict()
+
+  def _current(self):
+    learner = g.learner
+    with self._lock:
+      versions = self._learners.get(learner)
+      if versions is None:
+        versions = self._learners[learner] = DataVersions(self.db, self.ttl, learner=learner, sql=SHARD_VERSIONS_SQL)
+        while len(self._learners) > self.size:
+          self._learners.popitem(last=False)
+      self._learners.move_to_end(learner)
+      return versions
+
+  def invalidate(self):
+    if g.get('learner'):
+      self._current().invalidate()
+
+  def get(self, *tables):
+    return self._current().get(*tables)
@@ -0,0 +1,205 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from urllib.parse import quote
+
+from flask import current_app, g
+
+from lib.db import Db
+from lib.versions import DATABASE_ID, VERSIONS_SQL
+
+# Read snapshots for the heavy read routes.
+#
+# Dashboard aggregates and exports can read for a long time. On the live database
+# such a read holds a WAL read mark for its whole duration, so checkpoints cannot
+# recycle the WAL behind it while reviews keep being written, and it competes with
+# the writers for the same page cache. Routes decorated with @from_snapshot read a
+# copy instead: Snapshots takes it with the SQLite backup API in one step (a single
+# read transaction, so the copy is consistent and writers are never blocked) and
+# serves it over read-only, immutable connections.
+#
+# A snapshot is refreshed by the first request that finds it older than
+# SNAPSHOT_MAX_AGE seconds; requests arriving during the refresh keep reading the
+# previous one. If the data versions (lib/versions.py) have not moved since, no
+# copy is made. Each copy is a new file, <SNAPSHOT_DIR>/<database>.snapshot-<pid>-<n>,
+# so every process has its own and readers of the previous copy finish undisturbed;
+# the previous file is unlinked once replaced.
+#
+# ETags of snapshot routes are computed from the versions the snapshot was taken
+# at (not the live ones), and every response reports the snapshot's age in
+# X-Snapshot-Age (seconds).
+
+logger = logging.getLogger(__name__)
+
+AGE_HEADER = 'X-Snapshot-Age'
+
+class SnapshotVersions:
+  """The data versions a snapshot was taken at, in the shape of DataVersions.get."""
+
+  def __init__(self, versions):
+    self.versions = versions
+
+  def get(self, *tables):
+    return (self.versions.get(DATABASE_ID, 0),) + tuple(self.versions.get(table, 0) for table in tables)
+
+class Snapshots(Db):
+  """A pool of read-only connections to the latest snapshot of `source`."""
+
+  def __init__(self, source, max_age=5.0, directory=None, **settings):
+    super().__init__(database=None, **settings)
+    self.source = source
+    self.max_age = max_age
+    self.directory = directory or os.path.dirname(os.path.abspath(source))
+    self.generation = 0
+    self.versions = None
+    self.refreshes = 0
+    self.copies = 0
+    self._taken_at = None  # monotonic time the snapshot was last known to be current
+    self._refresh_lock = threading.Lock()
+    self._files = {}  # id(connection) -> the snapshot file it reads
+
+  def connect(self):
+    database = self.database
+    connection = super().connect(f'file:{quote(database)}?mode=ro&immutable=1', uri=True)
+    with self._lock:
+      self._files[id(connection)] = database
+    return connection
+
+  def _discard(self, connection):
+    with self._lock:
+      self._files.pop(id(connection), None)
+    super()._discard(connection)
+
+  def release(self, connection):
+    # Connections to a replaced snapshot are closed instead of pooled
+    with self._lock:
+      replaced = self._files.get(id(connection)) != self.database
+      if replaced:
+        self._in_use -= 1
+    if replaced:
+      self._discard(connection)
+    else:
+      super().release(connection)
+
+  def age(self):
+    """Seconds since the snapshot was last known to match the database, or None before the first one."""
+    taken_at = self._taken_at
+    return None if taken_at is None else time.monotonic() - taken_at
+
+  def current(self):
+    """Refresh the snapshot if it is stale, unless another request already is. Returns its age.
+
+    Only the first snapshot is waited for. A failed refresh is logged and the previous
+    snapshot kept; without one, the error is raised.
+    """
+    age = self.age()
+    if age is not None and age <= self.max_age:
+      return age
+    if self._refresh_lock.acquire(blocking=age is None):
+      try:
+        age = self.age()
+        if age is None or age > self.max_age:
+          self._refresh()
+      except (sqlite3.Error, OSError):
+        if self._taken_at is None:
+          raise
+        logger.exception('Snapshot refresh failed; serving the previous snapshot')
+      finally:
+        self._refresh_lock.release()
+    return self.age()
+
+  def refresh(self):
+    """Take a new snapshot now (if the data versions have moved)."""
+    with self._refresh_lock:
+      self._refresh()
+
+  def _refresh(self):
+    started = time.monotonic()
+    source = sqlite3.connect(self.source, timeout=self.busy_timeout_ms / 1000)
+    try:
+      versions = dict(source.execute(VERSIONS_SQL).fetchall())
+      if self.versions is not None and versions == self.versions.versions:
+        self._taken_at = started
+        self.refreshes += 1
+        return
+
+      path = os.path.join(self.directory, '%s.snapshot-%d-%d' % (
+        os.path.basename(self.source), os.getpid(), self.generation + 1))
+      target = sqlite3.connect(path)
+      try:
+        # One step: the whole copy is made under a single read transaction
+        source.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+        versions = dict(target.execute(VERSIONS_SQL).fetchall())
+        target.close()
+      except BaseException:
+        target.close()
+        os.remove(path)
+        raise
+    finally:
+      source.close()
+
+    with self._lock:
+      previous = self.database
+      self.database = path
+      self.generation += 1
+      self.versions = SnapshotVersions(versions)
+    self._taken_at = started
+    self.refreshes += 1
+    self.copies += 1
+
+    # Idle connections go now, those in use when they are released
+    self.close_all()
+    if previous is not None:
+      try:
+        os.remove(previous)
+      except FileNotFoundError:
+        pass
+
+  def remove(self):
+    """Close the idle connections and delete the snapshot file."""
+    self.close_all()
+    with self._lock:
+      previous, self.database = self.database, None
+      self.versions = None
+    self._taken_at = None
+    if previous is not None:
+      try:
+        os.remove(previous)
+      except FileNotFoundError:
+        pass
+
+  def snapshot_stats(self):
+    return {
+      "age_seconds": self.age(),
+      "generation": self.generation,
+      "refreshes": self.refreshes,
+      "copies": self.copies
+    }
+
+def from_snapshot(view):
+  """Serve a read route from the app's snapshot (app.snapshots), when snapshots are enabled.
+
+  Goes outside @conditional, whose ETag then uses the snapshot's data versions.
+  """
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    snapshots = current_app.snapshots
+    age = None
+    if snapshots is not None:
+      try:
+        age = snapshots.current()
+      except (sqlite3.Error, OSError):
+        logger.exception('No snapshot available; reading the live database')
+      if age is not None:
+        g.db_pool = snapshots
+        g.data_versions = snapshots.versions
+
+    response = current_app.make_response(view(*args, **kwargs))
+    if age is not None:
+      response.headers[AGE_HEADER] = f'{age:.3f}'
+    return response
+  return wrapper
@@ -0,0 +1,98 @@
+import json
+from datetime import datetime, timedelta
+
+# Spaced repetition (SM-2).
+#
+# Each word's schedule lives on its word_reviews row: repetitions (correct answers
+# in a row), interval_days, ease and due_at. record_reviews (lib/reviews.py) folds
+# every batch of reviews into it with schedule(); a trigger copies due_at onto the
+# word's word_groups rows, so a group's due queue is an index range on
+# word_groups(group_id, due_at, word_id). A word that was never reviewed has no
+# due_at and is served as new once the due reviews run out.
+#
+# Reviews are right/wrong, so they are graded on SM-2's 0-5 scale as
+# CORRECT_QUALITY and WRONG_QUALITY. Intervals stop growing at MAX_INTERVAL_DAYS;
+# a long run of correct answers would otherwise push due_at past year 9999.
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 2
+MAX_INTERVAL_DAYS = 36500.0
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+NEW_STATE = (0, 0.0, DEFAULT_EASE)
+
+def schedule(state, correct):
+  """The (repetitions, interval_days, ease) after one review of a word in `state`."""
+  repetitions, interval_days, ease = state
+  quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+  if quality >= 3:
+    if repetitions == 0:
+      interval_days = 1.0
+    elif repetitions == 1:
+      interval_days = 6.0
+    else:
+      interval_days = min(MAX_INTERVAL_DAYS, float(round(interval_days * ease)))
+    repetitions += 1
+  else:
+    repetitions = 0
+    interval_days = 1.0
+  ease = max(MIN_EASE, round(ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02), 2))
+  return repetitions, interval_days, ease
+
+def due_at(reviewed_at, interval_days):
+  """The 'YYYY-MM-DD HH:MM:SS' time a word reviewed at `reviewed_at` (same format) is due."""
+  # fromisoformat/isoformat: several times faster than strptime/strftime on the write path
+  return (datetime.fromisoformat(reviewed_at) + timedelta(days=interval_days)).isoformat(' ', 'seconds')
+
+def load_states(cursor, word_ids):
+  """Current (repetitions, interval_days, ease) of each word, with one query; missing words are new."""
+  cursor.execute('''
+    SELECT word_id, repetitions, interval_days, ease
+    FROM word_reviews
+    WHERE word_id IN (SELECT value FROM json_each(?))
+  ''', (json.dumps(sorted(set(word_ids))),))
+  return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+def rebuild_schedule(cursor, batch_size=10000):
+  """Replay word_review_items through schedule() into word_reviews. Does not commit.
+
+  Expects a word_reviews row per word (rebuild_aggregates inserts them first).
+  """
+  # Clear every schedule; the replay below sets the reviewed words' again
+  cursor.execute('UPDATE word_groups SET due_at = NULL WHERE due_at IS NOT NULL')
+  cursor.execute('''
+    UPDATE word_reviews SET repetitions = 0, interval_days = 0, ease = ?, due_at = NULL
+    WHERE due_at IS NOT NULL OR repetitions != 0 OR ease != ?
+  ''', (DEFAULT_EASE, DEFAULT_EASE))
+
+  reader = cursor.connection.cursor()
+  reader.execute('''
+    SELECT word_id, correct, created_at
+    FROM word_review_items
+    ORDER BY word_id, created_at, id
+  ''')
+  updates = []
+  word_id, state, last_review = None, NEW_STATE, None
+  while True:
+    rows = reader.fetchmany(batch_size)
+    for row_word_id, correct, created_at in rows:
+      if row_word_id != word_id:
+        if word_id is not None:
+          updates.append((*state, due_at(last_review, state[1]), word_id))
+        word_id, state = row_word_id, NEW_STATE
+      state = schedule(state, correct)
+      last_review = created_at
+    if not rows:
+      if word_id is not None:
+        updates.append((*state, due_at(last_review, state[1]), word_id))
+    if len(updates) >= batch_size or (not rows and updates):
+      cursor.executemany('''
+        UPDATE word_reviews SET repetitions = ?, interval_days = ?, ease = ?, due_at = ?
+        WHERE word_id = ?
+      ''', updates)
+      updates = []
+    if not rows:
+      break
@@ -0,0 +1,228 @@
+import os
+import re
+import sqlite3
+
+from lib.pagination import keyset_condition
+
+# Named SQL statements, loaded once at startup.
+#
+# Every file under sql/ is read when the registry is built and is then looked up by
+# its path without the extension ('words/page', 'setup/create_indexes'). List queries
+# that take a sort key and order are templates: each (sort key, order, keyset or
+# offset page) combination in SORTED is rendered up front, so a route only ever
+# passes one of a fixed set of constant strings to sqlite3. That keeps the
+# connection's statement cache effective and leaves no way for request input to
+# reach the SQL text.
+
+SQL_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+ORDERS = ('asc', 'desc')
+
+# Sortable list queries: sort key -> (column, id column it ties on); keyset=True also
+# renders the cursor page variants.
+SORTED = {
+  'words/page': {
+    'keys': {
+      'english': ('w.english', 'w.id'),
+      'italian': ('w.italian', 'w.id'),
+      'correct_count': ('r.correct_count', 'r.word_id'),
+      'wrong_count': ('r.wrong_count', 'r.word_id')
+    },
+    'keyset': True
+  },
+  'groups/page': {
+    'keys': {
+      'name': ('name', 'id'),
+      'words_count': ('words_count', 'id')
+    },
+    'keyset': True
+  },
+  'groups/words_page': {
+    'keys': {
+      'english': ('w.english', 'w.id'),
+      'italian': ('w.italian', 'w.id'),
+      'correct_count': ('wr.correct_count', 'w.id'),
+      'wrong_count': ('wr.wrong_count', 'w.id')
+    },
+    'keyset': True
+  },
+  'study_sessions/page': {
+    'keys': {
+      'created_at': ('ss.created_at', 'ss.id')
+    },
+    'keyset': True
+  },
+  'groups/sessions_page': {
+    'keys': {
+      'startTime': ('s.created_at', 's.id'),
+      'endTime': ('s.end_time', 's.id'),
+      'activityName': ('a.name', 's.id'),
+      'groupName': ('g.name', 's.id'),
+      'reviewItemsCount': ('s.review_count', 's.id')
+    },
+    'keyset': False
+  }
+}
+
+# List queries with sparse fieldsets (?fields=): output key -> SQL expression. The
+# template's {columns} is rendered with the requested keys, always in this order and
+# aliased to the key, so a route builds each item with dict(zip(keys, row)). `hidden`
+# columns are appended when not requested, for the route's own use (the page cursor).
+FIELDS = {
+  'groups/words_raw': {
+    'columns': {
+      'id': 'w.id',
+      'english': 'w.english',
+      'italian': 'w.italian'
+    },
+    'hidden': {}
+  },
+  'study_sessions/page': {
+    'columns': {
+      'id': 'ss.id',
+      'group_id': 'ss.group_id',
+      'group_name': 'g.name',
+      'activity_id': 'sa.id',
+      'activity_name': 'sa.name',
+      'start_time': 'ss.created_at',
+      'end_time': 'ss.end_time',
+      'review_items_count': 'ss.review_count'
+    },
+    'hidden': {
+      'id': 'ss.id',
+      'created_at': 'ss.created_at'
+    }
+  }
+}
+
+class UnknownStatement(KeyError):
+  pass
+
+class InvalidFields(ValueError):
+  pass
+
+def split_script(script):
+  """The statements of an SQL script, in order."""
+  statements, current = [], ''
+  for line in script.splitlines(keepends=True):
+    current += line
+    if sqlite3.complete_statement(current):
+      statements.append(current.strip())
+      current = ''
+  return statements
+
+def render_sorted(template, column, id_column, order, keyset):
+  order_by = f'{column} {order}, {id_column} {order}'
+  after = keyset_condition(column, id_column, order) if keyset else None
+  return template.format(
+    order_by=order_by,
+    where_after=f'WHERE {after}' if after else '',
+    and_after=f'AND {after}' if after else '',
+    limit='LIMIT ?' if keyset else 'LIMIT ? OFFSET ?'
+  )
+
+def render_columns(template, spec, keys):
+  columns = [f"{spec['columns'][key]} AS {key}" for key in keys]
+  columns += [f'{sql} AS {key}' for key, sql in spec['hidden'].items() if key not in keys]
+  return template.replace('{columns}', ',\n  '.join(columns))
+
+class Statements:
+  def __init__(self, directory=SQL_DIRECTORY):
+    self.directory = directory
+    self._statements = {}
+    self._templates = {}
+    self._variants = {}
+    self._field_variants = {}
+    self.load()
+
+  def load(self):
+    for root, directories, files in os.walk(self.directory):
+      # Migrations are scripts run by lib/migrations.py, not named statements
+      directories[:] = [directory for directory in directories if directory != 'migrations']
+      for filename in files:
+        if not filename.endswith('.sql'):
+          continue
+        path = os.path.join(root, filename)
+        name = os.path.relpath(path, self.directory)[:-len('.sql')].replace(os.sep, '/')
+        with open(path, 'r') as file:
+          self._statements[name] = file.read()
+
+    # Every field by default; narrower fieldsets are rendered on first use (get)
+    for name, spec in FIELDS.items():
+      self._templates[name] = self._statements[name]
+      self._statements[name] = render_columns(self._templates[name], spec, tuple(spec['columns']))
+
+    for name, spec in SORTED.items():
+      template = self._statements[name]
+      for sort_by, (column, id_column) in spec['keys'].items():
+        for order in ORDERS:
+          for keyset in ((False, True) if spec['keyset'] else (False,)):
+            sql = render_sorted(template, column, id_column, order, keyset)
+            if not sqlite3.complete_statement(sql + ';'):
+              raise ValueError(f'Incomplete SQL statement {name} ({sort_by} {order})')
+            self._variants[(name, sort_by, order, keyset)] = sql
+
+  def get(self, name, sort_by=None, order=None, keyset=False, fields=None):
+    """The SQL of a named statement, or of one sort variant of a sortable list query.
+
+    `fields` narrows a query in FIELDS to those keys (a tuple from parse_fields).
+    """
+    if fields is not None:
+      return self._fields_variant(name, sort_by, order, keyset, fields)
+    try:
+      if name in SORTED:
+        return self._variants[(name, sort_by, order, keyset)]
+      return self._statements[name]
+    except KeyError:
+      raise UnknownStatement(f'Unknown statement {name} {sort_by or ""} {order or ""}'.rstrip())
+
+  def _fields_variant(self, name, sort_by, order, keyset, fields):
+    key = (name, sort_by, order, keyset, fields)
+    sql = self._field_variants.get(key)
+    if sql is None:
+      self.get(name, sort_by=sort_by, order=order, keyset=keyset)  # Raises for an unknown variant
+      spec = FIELDS.get(name)
+      if spec is None or not fields or not set(fields) <= spec['columns'].keys():
+        raise UnknownStatement(f'Unknown statement {name} fields {fields}')
+      sql = render_columns(self._templates[name], spec, tuple(key for key in spec['columns'] if key in fields))
+      if name in SORTED:
+        column, id_column = SORTED[name]['keys'][sort_by]
+        sql = render_sorted(sql, column, id_column, order, keyset)
+      self._field_variants[key] = sql
+    return sql
+
+  def sort_keys(self, name):
+    return SORTED[name]['keys']
+
+  def field_keys(self, name):
+    """Every output key of a query with sparse fieldsets, in order."""
+    return tuple(FIELDS[name]['columns'])
+
+  def parse_fields(self, name, value):
+    """The keys a ?fields=a,b parameter asks for, in the query's order; None (every
+    key) when it is missing or empty. Raises InvalidFields for an unknown key."""
+    if not value:
+      return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - FIELDS[name]['columns'].keys()
+    if unknown:
+      raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))} "
+                          f"(expected some of {', '.join(FIELDS[name]['columns'])})")
+    return tuple(key for key in FIELDS[name]['columns'] if key in requested) or None
+
+  def queries(self):
+    """Every single-statement query (not the setup scripts), with sort variants expanded."""
+    for name, sql in self._statements.items():
+      if name not in SORTED and not name.startswith('setup/'):
+        yield name, sql
+    for (name, sort_by, order, keyset), sql in self._variants.items():
+      yield f"{name} ({sort_by} {order}{', keyset' if keyset else ''})", sql
+
+  def validate(self, connection):
+    """Prepare every query against a database with the schema; raises on the first error."""
+    for name, sql in self.queries():
+      try:
+        parameters = re.sub(r'--[^\n]*', '', sql).count('?')
+        connection.execute('EXPLAIN ' + sql, (None,) * parameters)
+      except sqlite3.Error as e:
+        raise ValueError(f'Invalid SQL statement {name}: {e}')
@@ -0,0 +1,57 @@
+import threading
+import time
+
+# Per-table data versions.
+#
+# data_versions holds one counter per table. Every write path bumps the counters of
+# the tables it changes inside its own transaction, so a version only moves once the
+# write is committed. The 'database' row holds a random id set when the schema is
+# created, so versions from a re-created database never match old ones.
+#
+# DataVersions keeps a copy of the counters in memory for the HTTP cache (lib/http_cache.py).
+# It reloads them after this process writes (invalidate) and at most every `ttl`
+# seconds otherwise, so writes from other processes (invoke tasks) show up quickly.
+
+DATABASE_ID = 'database'
+
+def bump_versions(cursor, *tables):
+  """Increment the data version of each table. Does not commit."""
+  cursor.executemany('''
+    INSERT INTO data_versions (table_name, version) VALUES (?, 1)
+    ON CONFLICT(table_name) DO UPDATE SET version = version + 1
+  ''', [(table,) for table in tables])
+
+VERSIONS_SQL = 'SELECT table_name, version FROM data_versions'
+
+class DataVersions:
+  def __init__(self, db, ttl=1.0, learner=None, sql=VERSIONS_SQL):
+    self.db = db
+    self.ttl = ttl
+    self.learner = learner
+    self.sql = sql
+    self._lock = threading.Lock()
+    self._versions = {}
+    self._loaded_at = None
+
+  def invalidate(self):
+    with self._lock:
+      self._loaded_at = None
+
+  def load(self):
+    connection = self.db.acquire(self.learner)
+    try:
+      rows = connection.execute(self.sql).fetchall()
+    finally:
+      self.db.release(connection)
+    with self._lock:
+      self._versions = {row[0]: row[1] for row in rows}
+      self._loaded_at = time.monotonic()
+
+  def get(self, *tables):
+    """Return (database id, version of each table), reloading if the copy is stale."""
+    with self._lock:
+      stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+    if stale:
+      self.load()
+    with self._lock:
+      return (self._versions.get(DATABASE_ID, 0),) + tuple(self._versions.get(table, 0) for table in tables)
@@ -1,31 +1,40 @@
-import sqlite3
+import argparse
 import os
+import sys
+
+from lib.db import Db
+from lib.migrations import MigrationError, migrate
+
+DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'words.db')
+
+def run_migrations(database=DATABASE, batch_size=10000, pause=0.0):
+    """Apply the pending migrations in sql/migrations (see lib/migrations.py), then create
+    what else the latest schema has (Db.setup_tables). Returns the number applied."""
+    db = Db(database=database)
+    conn = db.connect()
+
+    def progress(stats):
+        print(f"  {stats['migration']}: {stats['table']} {stats['table_fraction']:.0%} "
+              f"({stats['tables_done']}/{stats['tables']} tables, {stats['rows']} rows)", end='\r')
 
-def run_migrations():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
-        print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        applied = migrate(conn, batch_size=batch_size, pause=pause, progress=progress)
+        db.setup_tables(conn.cursor())
     finally:
         conn.close()
+    for migration in applied:
+        print(f"Applied migration: {migration!r}" + ' ' * 40)
+    print("Migrations completed successfully" if applied else "Database is up to date")
+    return len(applied)
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description='Apply the pending schema migrations.')
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per backfill transaction')
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to wait between backfill batches')
+    args = parser.parse_args()
+    try:
+        run_migrations(args.database, batch_size=args.batch_size, pause=args.pause)
+    except MigrationError as e:
+        print(f"Error running migrations: {e}")
+        sys.exit(1)
@@ -0,0 +1,89 @@
+from flask import Response, g, request, jsonify
+from flask_cors import cross_origin
+
+from lib.exports import EXPORT_FORMATS, InvalidExport, date_range_filter, encode_batches, export_format, stream_rows
+from lib.http_cache import conditional
+from lib.partitions import partitions
+from lib.snapshots import from_snapshot
+
+def load(app):
+  def export_response(name, sql, params, columns):
+    # Stream the query as NDJSON (default) or CSV (?format=csv)
+    format = export_format(request.args)
+    batches = stream_rows(g.get('db_pool', app.db), sql, params, fetch_size=app.config['EXPORT_FETCH_SIZE'], learner=g.get('learner'))
+    response = Response(encode_batches(batches, columns, format), mimetype=EXPORT_FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+    return response
+
+  @app.route('/api/export/words', methods=['GET'])
+  @cross_origin()
+  @from_snapshot
+  @conditional('words', 'word_reviews')
+  def export_words():
+    try:
+      return export_response('words', app.db.sql('exports/words'), (), ['id', 'english', 'italian', 'correct_count', 'wrong_count', 'last_reviewed'])
+    except InvalidExport as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/export/groups/<int:id>/words', methods=['GET'])
+  @cross_origin()
+  @from_snapshot
+  @conditional('groups', 'words', 'word_groups', 'word_reviews')
+  def export_group_words(id):
+    try:
+      if not app.db.execute('groups/name', (id,)).fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      return export_response(f'group-{id}-words', app.db.sql('exports/group_words'), (id,), ['id', 'english', 'italian', 'correct_count', 'wrong_count', 'last_reviewed'])
+    except InvalidExport as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/export/study-sessions', methods=['GET'])
+  @cross_origin()
+  @from_snapshot
+  @conditional('study_sessions', 'groups', 'study_activities')
+  def export_study_sessions():
+    try:
+      # Optional ?from= / ?to= date range on created_at
+      conditions, params = date_range_filter(request.args, 'ss.created_at')
+      where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+      return export_response('study-sessions', f'''
+        SELECT ss.id, ss.group_id, g.name, ss.study_activity_id, sa.name, ss.created_at
+        FROM study_sessions ss
+        JOIN groups g ON g.id = ss.group_id
+        JOIN study_activities sa ON sa.id = ss.study_activity_id
+        {where}
+        ORDER BY ss.created_at, ss.id
+      ''', params, ['id', 'group_id', 'group_name', 'study_activity_id', 'activity_name', 'created_at'])
+    except InvalidExport as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/export/review-items', methods=['GET'])
+  @cross_origin()
+  @from_snapshot
+  @conditional('word_review_items')
+  def export_review_items():
+    try:
+      # Optional ?from= / ?to= date range on created_at
+      conditions, params = date_range_filter(request.args, 'created_at')
+      where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+      # One query per monthly partition, oldest first: each reads its rows in order from
+      # its created_at index, where the view would sort the whole log (lib/partitions.py)
+      return export_response('review-items', [f'''
+        SELECT id, word_id, study_session_id, correct, created_at
+        FROM {table}
+        {where}
+        ORDER BY created_at, id
+      ''' for table in partitions(app.db.cursor())], params, ['id', 'word_id', 'study_session_id', 'correct', 'created_at'])
+    except InvalidExport as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
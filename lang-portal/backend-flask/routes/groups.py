@@ -1,44 +1,57 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
+from datetime import datetime, timezone
 import json
 
+from lib.batch import InvalidIds, parse_ids
+from lib.http_cache import conditional
+from lib.memberships import add_words, move_words, remove_words
+from lib.pagination import InvalidCursor, decode_cursor, page_and_cursor
+from lib.srs import TIMESTAMP_FORMAT
+from lib.statements import InvalidFields
+
 def load(app):
+  def words_count(id):
+    # The group's counter cache, or None if there is no such group
+    row = app.db.execute('groups/words_count', (id,)).fetchone()
+    return row[0] if row else None
+
   @app.route('/api/groups', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
   def get_groups():
     try:
-      cursor = app.db.cursor()
-
-      # Get the current page number from query parameters (default is 1)
-      page = int(request.args.get('page', 1))
       groups_per_page = 10
-      offset = (page - 1) * groups_per_page
-
-      # Get sorting parameters from the query string
-      sort_by = request.args.get('sort_by', 'name')  # Default to sorting by 'name'
-      order = request.args.get('order', 'asc')  # Default to ascending order
-
-      # Validate sort_by and order
-      valid_columns = ['name', 'words_count']
-      if sort_by not in valid_columns:
-        sort_by = 'name'
-      if order not in ['asc', 'desc']:
-        order = 'asc'
+      valid_columns = app.db.statements.sort_keys('groups/page')
+
+      page_cursor = request.args.get('cursor')
+      if page_cursor:
+        # Keyset mode: continue after the last (sort value, id) of the previous page
+        try:
+          sort_by, order, last_value, last_id = decode_cursor(page_cursor, valid_columns)
+        except InvalidCursor as e:
+          return jsonify({"error": str(e)}), 400
+        params = (last_value, last_id, groups_per_page + 1)
+      else:
+        # Get the current page number from query parameters (default is 1)
+        page = int(request.args.get('page', 1))
+        offset = (page - 1) * groups_per_page
+
+        # Get sorting parameters from the query string
+        sort_by = request.args.get('sort_by', 'name')  # Default to sorting by 'name'
+        order = request.args.get('order', 'asc')  # Default to ascending order
+
+        # Validate sort_by and order
+        if sort_by not in valid_columns:
+          sort_by = 'name'
+        if order not in ['asc', 'desc']:
+          order = 'asc'
+        params = (groups_per_page + 1, offset)
 
       # Query to fetch groups with sorting and the cached word count
-      cursor.execute(f'''
-        SELECT id, name, words_count
-        FROM groups
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (groups_per_page, offset))
+      cursor = app.db.execute('groups/page', params, sort_by=sort_by, order=order, keyset=bool(page_cursor))
 
-      groups = cursor.fetchall()
-
-      # Query the total number of groups
-      cursor.execute('SELECT COUNT(*) FROM groups')
-      total_groups = cursor.fetchone()[0]
-      total_pages = (total_groups + groups_per_page - 1) // groups_per_page
+      groups, next_cursor = page_and_cursor(cursor.fetchall(), groups_per_page, sort_by, order)
 
       # Format the response
       groups_data = []
@@ -49,27 +62,34 @@ def load(app):
           "word_count": group["words_count"]
         })
 
+      if page_cursor:
+        return jsonify({
+          'groups': groups_data,
+          'next_cursor': next_cursor
+        })
+
+      # Query the total number of groups
+      cursor = app.db.execute('groups/count')
+      total_groups = cursor.fetchone()[0]
+      total_pages = (total_groups + groups_per_page - 1) // groups_per_page
+
       # Return groups and pagination metadata
       return jsonify({
         'groups': groups_data,
         'total_pages': total_pages,
-        'current_page': page
+        'current_page': page,
+        'next_cursor': next_cursor
       })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
   def get_group(id):
     try:
-      cursor = app.db.cursor()
-
       # Get group details
-      cursor.execute('''
-        SELECT id, name, words_count
-        FROM groups
-        WHERE id = ?
-      ''', (id,))
+      cursor = app.db.execute('groups/get', (id,))
       
       group = cursor.fetchone()
       if not group:
@@ -85,55 +105,47 @@ def load(app):
 
   @app.route('/api/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_groups', 'word_reviews', 'groups')
   def get_group_words(id):
     try:
-      cursor = app.db.cursor()
-      
-      # Get pagination parameters
-      page = int(request.args.get('page', 1))
       words_per_page = 10
-      offset = (page - 1) * words_per_page
-
-      # Get sorting parameters
-      sort_by = request.args.get('sort_by', 'italian')
-      order = request.args.get('order', 'asc')
 
-      # Validate sort parameters
-      valid_columns = ['english', 'italian', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
-        sort_by = 'italian'
-      if order not in ['asc', 'desc']:
-        order = 'asc'
+      # Sort keys map to the columns they order by
+      sort_columns = app.db.statements.sort_keys('groups/words_page')
+
+      page_cursor = request.args.get('cursor')
+      if page_cursor:
+        # Keyset mode: continue after the last (sort value, id) of the previous page
+        try:
+          sort_by, order, last_value, last_id = decode_cursor(page_cursor, sort_columns)
+        except InvalidCursor as e:
+          return jsonify({"error": str(e)}), 400
+        params = (id, last_value, last_id, words_per_page + 1)
+      else:
+        # Get pagination parameters
+        page = int(request.args.get('page', 1))
+        offset = (page - 1) * words_per_page
+
+        # Get sorting parameters
+        sort_by = request.args.get('sort_by', 'italian')
+        order = request.args.get('order', 'asc')
+
+        # Validate sort parameters
+        if sort_by not in sort_columns:
+          sort_by = 'italian'
+        if order not in ['asc', 'desc']:
+          order = 'asc'
+        params = (id, words_per_page + 1, offset)
 
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
-      group = cursor.fetchone()
+      group = app.db.execute('groups/name', (id,)).fetchone()
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
       # Query to fetch words with pagination and sorting
-      cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
-        FROM words w
-        JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
+      cursor = app.db.execute('groups/words_page', params, sort_by=sort_by, order=order, keyset=bool(page_cursor))
       
-      words = cursor.fetchall()
-
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      words, next_cursor = page_and_cursor(cursor.fetchall(), words_per_page, sort_by, order)
 
       # Format the response
       words_data = []
@@ -146,45 +158,46 @@ def load(app):
           "wrong_count": word["wrong_count"]
         })
 
+      if page_cursor:
+        return jsonify({
+          'words': words_data,
+          'next_cursor': next_cursor
+        })
+
+      # Get total words count for pagination (the group's counter cache)
+      total_words = words_count(id) or 0
+      total_pages = (total_words + words_per_page - 1) // words_per_page
+
       return jsonify({
         'words': words_data,
         'total_pages': total_pages,
-        'current_page': page
+        'current_page': page,
+        'next_cursor': next_cursor
       })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'words', 'word_groups')
   def get_group_words_raw(id):
     try:
-      cursor = app.db.cursor()
-
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
-      group = cursor.fetchone()
+      group = app.db.execute('groups/name', (id,)).fetchone()
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      # Query to fetch all words for the group without pagination
-      cursor.execute('''
-        SELECT w.id, w.english, w.italian
-        FROM words w
-        JOIN word_groups wg ON w.id = wg.word_id
-        WHERE wg.group_id = ?
-        ORDER BY w.italian ASC
-      ''', (id,))
-      
-      words = cursor.fetchall()
+      # Optional ?fields=id,italian narrows the words (and the query) to those keys
+      try:
+        fields = app.db.statements.parse_fields('groups/words_raw', request.args.get('fields'))
+      except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "english": word["english"],
-          "italian": word["italian"]
-        })
+      # Query to fetch all words for the group without pagination; the columns come
+      # aliased to the word keys, in order
+      words = app.db.execute('groups/words_raw', (id,), fields=fields).fetchall()
+      keys = fields or app.db.statements.field_keys('groups/words_raw')
+      words_data = [dict(zip(keys, word)) for word in words]
 
       return jsonify({
         'words': words_data,
@@ -193,88 +206,184 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  def membership_ids():
+    # The word ids of a membership request: (ids, None) or (None, error response)
+    if app.config['DB_SHARDS_DIR']:
+      # Memberships live in the shared dictionary, which shards attach read-only
+      return None, (jsonify({"error": "Group memberships are read-only in per-learner mode"}), 403)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('word_ids'), list):
+      return None, (jsonify({"error": "Expected a JSON object with a word_ids array"}), 400)
+    try:
+      return parse_ids(data['word_ids'], app.config['WORDS_BATCH_LIMIT']), None
+    except InvalidIds as e:
+      return None, (jsonify({"error": str(e)}), 400)
+
+  # Endpoint: POST /api/groups/:id/words {"word_ids": [...]} to add up to
+  # WORDS_BATCH_LIMIT words to a group; words already in it are left as they are
+  @app.route('/api/groups/<int:id>/words', methods=['POST'])
+  @cross_origin()
+  def add_group_words(id):
+    try:
+      ids, error = membership_ids()
+      if error:
+        return error
+
+      cursor = app.db.cursor()
+      if words_count(id) is None:
+        return jsonify({"error": "Group not found"}), 404
+
+      added, missing = add_words(cursor, id, ids)
+      app.db.commit()
+
+      return jsonify({
+        "group_id": id,
+        "added": added,
+        "missing": missing,
+        "words_count": words_count(id)
+      })
+    except Exception as e:
+      app.db.rollback()
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: DELETE /api/groups/:id/words {"word_ids": [...]} to remove words from a group
+  @app.route('/api/groups/<int:id>/words', methods=['DELETE'])
+  @cross_origin()
+  def remove_group_words(id):
+    try:
+      ids, error = membership_ids()
+      if error:
+        return error
+
+      cursor = app.db.cursor()
+      if words_count(id) is None:
+        return jsonify({"error": "Group not found"}), 404
+
+      removed, missing = remove_words(cursor, id, ids)
+      app.db.commit()
+
+      return jsonify({
+        "group_id": id,
+        "removed": removed,
+        "missing": missing,
+        "words_count": words_count(id)
+      })
+    except Exception as e:
+      app.db.rollback()
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: POST /api/groups/:id/words/move {"word_ids": [...], "to_group_id": N}
+  # to move words to another group in one transaction
+  @app.route('/api/groups/<int:id>/words/move', methods=['POST'])
+  @cross_origin()
+  def move_group_words(id):
+    try:
+      ids, error = membership_ids()
+      if error:
+        return error
+
+      target_id = request.get_json(silent=True).get('to_group_id')
+      if isinstance(target_id, bool) or not isinstance(target_id, int):
+        return jsonify({"error": "Expected an integer to_group_id"}), 400
+      if target_id == id:
+        return jsonify({"error": "to_group_id is the group the words are in"}), 400
+
+      cursor = app.db.cursor()
+      if words_count(id) is None or words_count(target_id) is None:
+        return jsonify({"error": "Group not found"}), 404
+
+      moved, merged, missing = move_words(cursor, id, target_id, ids)
+      app.db.commit()
+
+      return jsonify({
+        "group_id": id,
+        "to_group_id": target_id,
+        "moved": moved,
+        "already_in_target": merged,
+        "missing": missing,
+        "words_count": words_count(id),
+        "to_words_count": words_count(target_id)
+      })
+    except Exception as e:
+      app.db.rollback()
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /api/groups/:id/due?limit= for the next words to study: words whose
+  # spaced repetition review is due (most overdue first), then words never reviewed.
+  # Not conditional: which words are due changes with the clock, not only with writes.
+  @app.route('/api/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      # Number of words (default 20, at most 100)
+      limit = request.args.get('limit', 20, type=int)
+      limit = min(max(1, limit), 100)
+
+      group = app.db.execute('groups/name', (id,)).fetchone()
+      if not group:
+        return jsonify({"error": "Group not found"}), 404
+
+      now = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+      words = app.db.execute('groups/due', (id, now, limit)).fetchall()
+      if len(words) < limit:
+        words += app.db.execute('groups/due_new', (id, limit - len(words))).fetchall()
+
+      return jsonify({
+        'group_id': id,
+        'now': now,
+        'words': [{
+          "id": word["id"],
+          "english": word["english"],
+          "italian": word["italian"],
+          "correct_count": word["correct_count"],
+          "wrong_count": word["wrong_count"],
+          "repetitions": word["repetitions"],
+          "interval_days": word["interval_days"],
+          "ease": word["ease"],
+          "due_at": word["due_at"]
+        } for word in words]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/api/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'study_activities', 'groups')
   def get_group_study_sessions(id):
     try:
-      cursor = app.db.cursor()
-      
-      # Get pagination parameters
-      page = int(request.args.get('page', 1))
-      sessions_per_page = 10
+      # Get pagination parameters (per_page at most 100)
+      page = max(1, request.args.get('page', 1, type=int))
+      sessions_per_page = min(max(1, request.args.get('per_page', 10, type=int)), 100)
       offset = (page - 1) * sessions_per_page
 
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'created_at')
       order = request.args.get('order', 'desc')  # Default to newest first
 
-      # Map frontend sort keys to database columns
-      sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
-        'activityName': 'a.name',
-        'groupName': 'g.name',
-        'reviewItemsCount': 'review_count'
-      }
-
-      # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      # Frontend sort keys map to database columns; anything else sorts by start time
+      if sort_by not in app.db.statements.sort_keys('groups/sessions_page'):
+        sort_by = 'startTime'
+      if order not in ['asc', 'desc']:
+        order = 'desc'
 
       # Get total count for pagination
-      cursor.execute('''
-        SELECT COUNT(*)
-        FROM study_sessions
-        WHERE group_id = ?
-      ''', (id,))
-      total_sessions = cursor.fetchone()[0]
+      total_sessions = app.db.execute('groups/sessions_count', (id,)).fetchone()[0]
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
-      cursor.execute(f'''
-        SELECT 
-          s.id,
-          s.group_id,
-          s.study_activity_id,
-          s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
-          a.name as activity_name,
-          g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
-        FROM study_sessions s
-        JOIN study_activities a ON s.study_activity_id = a.id
-        JOIN groups g ON s.group_id = g.id
-        WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, sessions_per_page, offset))
-      
-      sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
-        })
+      # Get the page of sessions; review count and end time come from the persisted
+      # session summary, so this is one query whatever the page size
+      sessions = app.db.execute('groups/sessions_page', (id, sessions_per_page, offset),
+                                sort_by=sort_by, order=order).fetchall()
+      sessions_data = [{
+        "id": session["id"],
+        "group_id": session["group_id"],
+        "group_name": session["group_name"],
+        "study_activity_id": session["study_activity_id"],
+        "activity_name": session["activity_name"],
+        "start_time": session["start_time"],
+        "end_time": session["end_time"],
+        "review_items_count": session["review_count"]
+      } for session in sessions]
 
       return jsonify({
         'study_sessions': sessions_data,
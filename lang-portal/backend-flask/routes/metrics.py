@@ -0,0 +1,27 @@
+from flask import Response, jsonify
+
+def load(app):
+  @app.route('/metrics', methods=['GET'])
+  def get_metrics():
+    if app.metrics is None:
+      return jsonify({"error": "Metrics are disabled"}), 404
+
+    pool = app.db.pool_stats()
+    statements = app.db.statement_stats()
+    process_metrics = [
+      ('db_pool_open_connections', 'gauge', 'Open SQLite connections.', pool['open_connections']),
+      ('db_pool_in_use', 'gauge', 'Connections checked out of the pool.', pool['in_use']),
+      ('db_pool_waits_total', 'counter', 'Checkouts that waited for a free connection.', pool['waits']),
+      ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free connection.', pool['wait_seconds_total']),
+      ('db_statement_cache_estimated_hits_total', 'counter', 'Named statements run on a connection that had already prepared them (estimated).', statements['estimated_hits']),
+      ('db_statement_cache_estimated_misses_total', 'counter', 'Named statements prepared for the first time on a connection (estimated).', statements['estimated_misses']),
+    ]
+    if app.snapshots is not None:
+      snapshots = app.snapshots.snapshot_stats()
+      process_metrics += [
+        ('db_snapshot_age_seconds', 'gauge', 'Age of the read snapshot (-1 before the first one).',
+         -1 if snapshots['age_seconds'] is None else snapshots['age_seconds']),
+        ('db_snapshot_refreshes_total', 'counter', 'Snapshot refreshes, including those that found the data unchanged.', snapshots['refreshes']),
+        ('db_snapshot_copies_total', 'counter', 'Snapshot refreshes that copied the database.', snapshots['copies']),
+      ]
+    return Response(app.metrics.render(process_metrics), mimetype='text/plain; version=0.0.4')
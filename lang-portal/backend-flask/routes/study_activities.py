@@ -2,12 +2,14 @@ from flask import jsonify, request
 from flask_cors import cross_origin
 import math
 
+from lib.http_cache import conditional
+
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activities():
-        cursor = app.db.cursor()
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
+        cursor = app.db.execute('study_activities/list')
         activities = cursor.fetchall()
         
         return jsonify([{
@@ -19,9 +21,9 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activity(id):
-        cursor = app.db.cursor()
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
+        cursor = app.db.execute('study_activities/get', (id,))
         activity = cursor.fetchone()
         
         if not activity:
@@ -36,12 +38,10 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'study_sessions', 'groups')
     def get_study_activity_sessions(id):
-        cursor = app.db.cursor()
-        
         # Verify activity exists
-        cursor.execute('SELECT id FROM study_activities WHERE id = ?', (id,))
-        if not cursor.fetchone():
+        if not app.db.execute('study_activities/get', (id,)).fetchone():
             return jsonify({'error': 'Activity not found'}), 404
 
         # Get pagination parameters
@@ -50,33 +50,11 @@ def load(app):
         offset = (page - 1) * per_page
 
         # Get total count
-        cursor.execute('''
-            SELECT COUNT(*) as count 
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            WHERE ss.study_activity_id = ?
-        ''', (id,))
+        cursor = app.db.execute('study_activities/sessions_count', (id,))
         total_count = cursor.fetchone()['count']
 
-        # Get paginated sessions
-        cursor.execute('''
-            SELECT 
-                ss.id,
-                ss.group_id,
-                g.name as group_name,
-                sa.name as activity_name,
-                ss.created_at,
-                ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-            WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
-            ORDER BY ss.created_at DESC
-            LIMIT ? OFFSET ?
-        ''', (id, per_page, offset))
+        # Get paginated sessions, read newest first off the (study_activity_id, created_at) index
+        cursor = app.db.execute('study_activities/sessions_page', (id, per_page, offset))
         sessions = cursor.fetchall()
 
         return jsonify({
@@ -87,7 +65,7 @@ def load(app):
                 'activity_id': session['activity_id'],
                 'activity_name': session['activity_name'],
                 'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
+                'end_time': session['end_time'],
                 'review_items_count': session['review_items_count']
             } for session in sessions],
             'total': total_count,
@@ -98,18 +76,17 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'groups')
     def get_study_activity_launch_data(id):
-        cursor = app.db.cursor()
-        
         # Get activity details
-        cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
+        cursor = app.db.execute('study_activities/get', (id,))
         activity = cursor.fetchone()
         
         if not activity:
             return jsonify({'error': 'Activity not found'}), 404
         
         # Get available groups
-        cursor.execute('SELECT id, name FROM groups')
+        cursor = app.db.execute('groups/names')
         groups = cursor.fetchall()
         
         return jsonify({
@@ -3,6 +3,13 @@ from flask_cors import cross_origin
 from datetime import datetime
 import math
 
+from lib.http_cache import conditional
+from lib.pagination import InvalidCursor, decode_cursor, page_and_cursor
+from lib.records import InvalidBody, iter_records
+from lib.reviews import existing_ids, record_reviews, clear_study_history, ingest_reviews
+from lib.statements import InvalidFields
+from lib.versions import bump_versions
+
 def load(app):
   # IMPLEMENTED ENDPOINT
   @app.route('/api/study-sessions', methods=['POST'])
@@ -14,28 +21,19 @@ def load(app):
           if not data or 'group_id' not in data or 'study_activity_id' not in data:
               return jsonify({"error": "Missing required fields"}), 400
 
-          cursor = app.db.cursor()
-          
           # Verify group exists
-          cursor.execute('SELECT id FROM groups WHERE id = ?', (data['group_id'],))
-          if not cursor.fetchone():
+          if not app.db.execute('groups/name', (data['group_id'],)).fetchone():
               return jsonify({"error": "Group not found"}), 404
 
           # Verify study activity exists
-          cursor.execute('SELECT id FROM study_activities WHERE id = ?', (data['study_activity_id'],))
-          if not cursor.fetchone():
+          if not app.db.execute('study_activities/get', (data['study_activity_id'],)).fetchone():
               return jsonify({"error": "Study activity not found"}), 404
 
           # Create the study session
-          cursor.execute('''
-              INSERT INTO study_sessions (group_id, study_activity_id, created_at)
-              VALUES (?, ?, CURRENT_TIMESTAMP)
-          ''', (
-              data['group_id'],
-              data['study_activity_id']
-          ))
+          cursor = app.db.execute('study_sessions/create', (data['group_id'], data['study_activity_id']))
           
           session_id = cursor.lastrowid
+          bump_versions(cursor, 'study_sessions', 'study_stats', 'daily_activity')
           app.db.commit()
 
           return jsonify({
@@ -48,15 +46,14 @@ def load(app):
           return jsonify({"error": str(e)}), 500
 
   # IMPLEMENTED ENDPOINT
-  @app.route('/api/study-sessions/<id>/review', methods=['POST'])
+  @app.route('/api/study-sessions/<int:id>/review', methods=['POST'])
   @cross_origin()
   def review_study_session(id):
       try:
           cursor = app.db.cursor()
           
           # Check if session exists
-          cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
-          session = cursor.fetchone()
+          session = app.db.execute('study_sessions/id', (id,)).fetchone()
           if not session:
               return jsonify({"error": "Study session not found"}), 404
 
@@ -67,20 +64,22 @@ def load(app):
 
           reviews = data['reviews']
           
-          # Insert each review
+          # Validate every review before writing any of them
           for review in reviews:
               if 'word_id' not in review or 'is_correct' not in review:
                   return jsonify({"error": "Invalid review format"}), 400
-                  
-              cursor.execute('''
-                  INSERT INTO word_review_items 
-                  (study_session_id, word_id, correct, created_at)
-                  VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-              ''', (
-                  id,
-                  review['word_id'],
-                  1 if review['is_correct'] else 0
-              ))
+              if not isinstance(review['word_id'], int) or isinstance(review['word_id'], bool):
+                  return jsonify({"error": "word_id must be an integer"}), 400
+
+          # An unknown word would get a word_reviews row and count in study_stats
+          word_ids = [review['word_id'] for review in reviews]
+          unknown = sorted(set(word_ids) - existing_ids(cursor, 'words', word_ids))
+          if unknown:
+              return jsonify({"error": "Word not found", "word_ids": unknown}), 400
+
+          # Insert the reviews and update the per-word counters in one transaction
+          record_reviews(cursor, [(id, review['word_id'], review['is_correct']) for review in reviews],
+                         app.config['REVIEW_RETENTION_MONTHS'])
 
           app.db.commit()
           return jsonify({"message": "Reviews recorded successfully"}), 200
@@ -89,121 +88,116 @@ def load(app):
           app.db.rollback()
           return jsonify({"error": str(e)}), 500
 
+  @app.route('/api/study-sessions/reviews', methods=['POST'])
+  @cross_origin()
+  def ingest_study_session_reviews():
+    try:
+      cursor = app.db.cursor()
+
+      # Reviews for any number of sessions, as a JSON array or NDJSON:
+      # {"session_id": 1, "word_id": 2, "is_correct": true, "created_at": "2025-02-01T10:00:00Z"}
+      try:
+        items = iter_records(request)
+      except InvalidBody as e:
+        return jsonify({"error": str(e)}), 400
+
+      # Validate and insert chunk by chunk, committing everything at once
+      results = ingest_reviews(cursor, items, chunk_size=app.config['BULK_REVIEWS_CHUNK_SIZE'],
+                               retention_months=app.config['REVIEW_RETENTION_MONTHS'])
+      app.db.commit()
+
+      recorded = sum(1 for result in results if result['status'] == 'recorded')
+      return jsonify({
+        "recorded": recorded,
+        "rejected": len(results) - recorded,
+        "results": results
+      }), 200
+    except Exception as e:
+      app.db.rollback()
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/api/study-sessions', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'groups', 'study_activities')
   def get_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
-      # Get pagination parameters
-      page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
-      offset = (page - 1) * per_page
+      # Get pagination parameters (per_page at most 100)
+      per_page = min(max(1, request.args.get('per_page', 10, type=int)), 100)
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      # Optional ?fields=id,start_time,... narrows the items (and the query) to those keys
+      try:
+        fields = app.db.statements.parse_fields('study_sessions/page', request.args.get('fields'))
+      except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
+
+      # Sessions are listed newest first; a cursor continues after the last (created_at, id)
+      page_cursor = request.args.get('cursor')
+      if page_cursor:
+        try:
+          _, _, last_value, last_id = decode_cursor(page_cursor, ['created_at'])
+        except InvalidCursor as e:
+          return jsonify({"error": str(e)}), 400
+        params = (last_value, last_id, per_page + 1)
+      else:
+        page = max(1, request.args.get('page', 1, type=int))
+        offset = (page - 1) * per_page
+        params = (per_page + 1, offset)
 
       # Get paginated sessions
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
-        LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      cursor = app.db.execute('study_sessions/page', params, sort_by='created_at', order='desc',
+                              keyset=bool(page_cursor), fields=fields)
+      sessions, next_cursor = page_and_cursor(cursor.fetchall(), per_page, 'created_at', 'desc')
+
+      # The columns come aliased to the item keys, in order
+      keys = fields or app.db.statements.field_keys('study_sessions/page')
+      items = [dict(zip(keys, session)) for session in sessions]
+
+      if page_cursor:
+        return jsonify({
+          'items': items,
+          'per_page': per_page,
+          'next_cursor': next_cursor
+        })
+
+      # Get total count
+      cursor = app.db.execute('study_sessions/count')
+      total_count = cursor.fetchone()['count']
 
       return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+        'items': items,
         'total': total_count,
         'page': page,
         'per_page': per_page,
-        'total_pages': math.ceil(total_count / per_page)
+        'total_pages': math.ceil(total_count / per_page),
+        'next_cursor': next_cursor
       })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study-sessions/<id>', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'groups', 'study_activities', 'word_review_items', 'words')
   def get_study_session(id):
     try:
-      cursor = app.db.cursor()
-      
       # Get session details
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        WHERE ss.id = ?
-        GROUP BY ss.id
-      ''', (id,))
+      cursor = app.db.execute('study_sessions/get', (id,))
       
       session = cursor.fetchone()
       if not session:
         return jsonify({"error": "Study session not found"}), 404
 
-      # Get pagination parameters
-      page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
+      # Get pagination parameters (per_page at most 100)
+      page = max(1, request.args.get('page', 1, type=int))
+      per_page = min(max(1, request.args.get('per_page', 10, type=int)), 100)
       offset = (page - 1) * per_page
 
       # Get the words reviewed in this session with their review status
-      cursor.execute('''
-        SELECT 
-          w.*,
-          COALESCE(SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END), 0) as session_correct_count,
-          COALESCE(SUM(CASE WHEN wri.correct = 0 THEN 1 ELSE 0 END), 0) as session_wrong_count
-        FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
-        WHERE wri.study_session_id = ?
-        GROUP BY w.id
-        ORDER BY w.italian
-        LIMIT ? OFFSET ?
-      ''', (id, per_page, offset))
+      cursor = app.db.execute('study_sessions/words_page', (id, per_page, offset))
       
       words = cursor.fetchall()
 
       # Get total count of words
-      cursor.execute('''
-        SELECT COUNT(DISTINCT w.id) as count
-        FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
-        WHERE wri.study_session_id = ?
-      ''', (id,))
+      cursor = app.db.execute('study_sessions/words_count', (id,))
       
       total_count = cursor.fetchone()['count']
 
@@ -215,7 +209,7 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
+          'end_time': session['end_time'],
           'review_items_count': session['review_items_count']
         },
         'words': [{
@@ -239,14 +233,12 @@ def load(app):
     try:
       cursor = app.db.cursor()
       
-      # First delete all word review items since they have foreign key constraints
-      cursor.execute('DELETE FROM word_review_items')
-      
-      # Then delete all study sessions
-      cursor.execute('DELETE FROM study_sessions')
+      # Swap in an empty review log and sessions table and zero the per-word counters
+      clear_study_history(cursor)
       
       app.db.commit()
       
       return jsonify({"message": "Study history cleared successfully"}), 200
     except Exception as e:
+      app.db.rollback()
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
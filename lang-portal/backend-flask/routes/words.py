@@ -2,49 +2,93 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.batch import InvalidIds, parse_ids
+from lib.http_cache import conditional
+from lib.pagination import InvalidCursor, decode_cursor, page_and_cursor
+from lib.search import match_query
+
 def load(app):
+  def words_with_groups(statement, params):
+    # Fold the one row per (word, group) membership of a words/get or words/batch
+    # query into words with their groups, keyed by id
+    words = {}
+    for row in app.db.execute(statement, params):
+      word = words.get(row["id"])
+      if word is None:
+        word = words[row["id"]] = {
+          "id": row["id"],
+          "english": row["english"],
+          "italian": row["italian"],
+          "correct_count": row["correct_count"],
+          "wrong_count": row["wrong_count"],
+          "groups": {}
+        }
+      if row["group_id"] is not None:
+        word["groups"][row["group_id"]] = {"id": row["group_id"], "name": row["group_name"]}
+    for word in words.values():
+      word["groups"] = sorted(word["groups"].values(), key=lambda group: group["id"])
+    return words
+
+  def words_by_id(values):
+    # The words of up to WORDS_BATCH_LIMIT ids in one query, in the order asked for
+    try:
+      ids = parse_ids(values, app.config['WORDS_BATCH_LIMIT'])
+    except InvalidIds as e:
+      return jsonify({"error": str(e)}), 400
+    words = words_with_groups('words/batch', (json.dumps(ids),))
+    return jsonify({
+      "words": [words[word_id] for word_id in ids if word_id in words],
+      "missing": [word_id for word_id in ids if word_id not in words]
+    })
+
   # Endpoint: GET /api/words with pagination (50 words per page)
+  # Pass `cursor` (the `next_cursor` of the previous response) instead of `page`
+  # for keyset pagination that stays fast on deep pages, or `ids` (comma-separated)
+  # for those words with their groups, as POST /api/words/batch.
   @app.route('/api/words', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews', 'groups', 'word_groups')
   def get_words():
     try:
-      cursor = app.db.cursor()
+      if 'ids' in request.args:
+        return words_by_id(request.args.getlist('ids'))
 
-      # Get the current page number from query parameters (default is 1)
-      page = int(request.args.get('page', 1))
-      # Ensure page number is positive
-      page = max(1, page)
       words_per_page = 50
-      offset = (page - 1) * words_per_page
-
-      # Get sorting parameters from the query string
-      sort_by = request.args.get('sort_by', 'italian')  # Default to sorting by 'italian'
-      order = request.args.get('order', 'asc')  # Default to ascending order
-
-      # Validate sort_by and order
-      valid_columns = ['english', 'italian', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
-        sort_by = 'italian'
-      if order not in ['asc', 'desc']:
-        order = 'asc'
-
-      # Query to fetch words with sorting
-      cursor.execute(f'''
-        SELECT w.id, w.english, w.italian,
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
-
-      words = cursor.fetchall()
 
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      # Sort keys map to the (column, id column) pair they order by; counter sorts are
+      # read off the word_reviews indexes, text sorts off the words indexes
+      sort_columns = app.db.statements.sort_keys('words/page')
+
+      page_cursor = request.args.get('cursor')
+      if page_cursor:
+        # Keyset mode: the cursor carries the sort key, order and last (value, id)
+        try:
+          sort_by, order, last_value, last_id = decode_cursor(page_cursor, sort_columns)
+        except InvalidCursor as e:
+          return jsonify({"error": str(e)}), 400
+        params = (last_value, last_id, words_per_page + 1)
+      else:
+        # Get the current page number from query parameters (default is 1)
+        page = int(request.args.get('page', 1))
+        # Ensure page number is positive
+        page = max(1, page)
+        offset = (page - 1) * words_per_page
+
+        # Get sorting parameters from the query string
+        sort_by = request.args.get('sort_by', 'italian')  # Default to sorting by 'italian'
+        order = request.args.get('order', 'asc')  # Default to ascending order
+
+        # Validate sort_by and order
+        if sort_by not in sort_columns:
+          sort_by = 'italian'
+        if order not in ['asc', 'desc']:
+          order = 'asc'
+        params = (words_per_page + 1, offset)
+
+      # Fetch the page with one extra row, which tells whether there is a next page
+      cursor = app.db.execute('words/page', params, sort_by=sort_by, order=order, keyset=bool(page_cursor))
+
+      words, next_cursor = page_and_cursor(cursor.fetchall(), words_per_page, sort_by, order)
 
       # Format the response
       words_data = []
@@ -57,64 +101,84 @@ def load(app):
           "wrong_count": word["wrong_count"]
         })
 
+      # Keyset pages skip the COUNT(*) so their cost does not grow with the table
+      if page_cursor:
+        return jsonify({
+          "words": words_data,
+          "next_cursor": next_cursor
+        })
+
+      # Query the total number of words
+      cursor = app.db.execute('words/count')
+      total_words = cursor.fetchone()[0]
+      total_pages = (total_words + words_per_page - 1) // words_per_page
+
       return jsonify({
         "words": words_data,
         "total_pages": total_pages,
         "current_page": page,
-        "total_words": total_words
+        "total_words": total_words,
+        "next_cursor": next_cursor
       })
 
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
 
-  # Endpoint: GET /api/words/:id to get a single word with its details
-  @app.route('/api/words/<int:word_id>', methods=['GET'])
+  # Endpoint: GET /api/words/search?q= for ranked, accent-insensitive search over
+  # english and italian. The last word of q matches as a prefix (type-ahead).
+  @app.route('/api/words/search', methods=['GET'])
   @cross_origin()
-  def get_word(word_id):
+  @conditional('words', 'word_reviews')
+  def search_words():
     try:
-      cursor = app.db.cursor()
-      
-      # Query to fetch the word and its details
-      cursor.execute('''
-        SELECT w.id, w.english, w.italian,
-               COALESCE(r.correct_count, 0) AS correct_count,
-               COALESCE(r.wrong_count, 0) AS wrong_count,
-               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        LEFT JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN groups g ON wg.group_id = g.id
-        WHERE w.id = ?
-        GROUP BY w.id
-      ''', (word_id,))
-      
-      word = cursor.fetchone()
-      
-      if not word:
-        return jsonify({"error": "Word not found"}), 404
-      
-      # Parse the groups string into a list of group objects
-      groups = []
-      if word["groups"]:
-        for group_str in word["groups"].split(','):
-          group_id, group_name = group_str.split('::')
-          groups.append({
-            "id": int(group_id),
-            "name": group_name
-          })
-      
+      query = request.args.get('q', '')
+      match = match_query(query)
+      if match is None:
+        return jsonify({"error": "q must contain at least one letter or digit"}), 400
+
+      # Number of results (default 20, at most 100)
+      limit = request.args.get('limit', 20, type=int)
+      limit = min(max(1, limit), 100)
+
+      words = app.db.execute('words/search', (match, limit)).fetchall()
+
       return jsonify({
-        "word": {
+        "query": query,
+        "words": [{
           "id": word["id"],
           "english": word["english"],
           "italian": word["italian"],
           "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"],
-          "groups": groups
-        }
+          "wrong_count": word["wrong_count"]
+        } for word in words]
       })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: POST /api/words/batch with {"ids": [...]} to get many words with their
+  # groups in one round trip; ids not found are listed in "missing"
+  @app.route('/api/words/batch', methods=['POST'])
+  @cross_origin()
+  def get_words_batch():
+    try:
+      data = request.get_json(silent=True)
+      if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+        return jsonify({"error": "Expected a JSON object with an ids array"}), 400
+      return words_by_id(data['ids'])
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /api/words/:id to get a single word with its details
+  @app.route('/api/words/<int:word_id>', methods=['GET'])
+  @cross_origin()
+  @conditional('words', 'word_reviews', 'groups', 'word_groups')
+  def get_word(word_id):
+    try:
+      words = words_with_groups('words/get', (word_id,))
+      if not words:
+        return jsonify({"error": "Word not found"}), 404
+      
+      return jsonify({"word": words[word_id]})
       
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
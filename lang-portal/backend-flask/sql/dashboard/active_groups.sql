@@ -0,0 +1,4 @@
+-- Groups touched (a session or a review) in the last 30 days: at most 31 days x groups rows
+SELECT COUNT(DISTINCT group_id) as active_groups
+FROM daily_group_activity
+WHERE activity_date >= date('now', '-30 days')
@@ -0,0 +1,4 @@
+-- A range over the daily_activity primary key: at most one row per day
+SELECT activity_date, sessions_count, reviews_count, correct_count, groups_count
+FROM daily_activity
+WHERE activity_date BETWEEN ? AND ?
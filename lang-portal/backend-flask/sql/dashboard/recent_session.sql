@@ -0,0 +1,12 @@
+-- The most recent study session with its activity name and persisted review summary
+SELECT
+  ss.id,
+  ss.group_id,
+  sa.name as activity_name,
+  ss.created_at,
+  ss.correct_count,
+  ss.review_count - ss.correct_count as wrong_count
+FROM study_sessions ss
+JOIN study_activities sa ON ss.study_activity_id = sa.id
+ORDER BY ss.created_at DESC, ss.id DESC
+LIMIT 1
@@ -0,0 +1,10 @@
+-- Totals kept current by triggers and the review write path (lib/reviews.py)
+SELECT
+  vocabulary_count,
+  words_studied,
+  mastered_words,
+  reviews_count,
+  correct_count,
+  sessions_count
+FROM study_stats
+WHERE id = 1
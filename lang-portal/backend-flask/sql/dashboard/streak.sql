@@ -0,0 +1,14 @@
+-- Current streak: consecutive days with a session or a review, ending today or
+-- yesterday (UTC). Walks back one day at a time, so it reads one row per day of the streak
+WITH RECURSIVE streak(activity_date) AS (
+  SELECT MAX(activity_date)
+  FROM daily_activity
+  WHERE activity_date BETWEEN date('now', '-1 day') AND date('now')
+    AND (sessions_count > 0 OR reviews_count > 0)
+  UNION ALL
+  SELECT da.activity_date
+  FROM streak
+  JOIN daily_activity da ON da.activity_date = date(streak.activity_date, '-1 day')
+  WHERE da.sessions_count > 0 OR da.reviews_count > 0
+)
+SELECT COUNT(activity_date) as streak FROM streak
@@ -0,0 +1,6 @@
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count, r.last_reviewed
+FROM word_groups wg
+JOIN words w ON w.id = wg.word_id
+JOIN word_reviews r ON r.word_id = w.id
+WHERE wg.group_id = ?
+ORDER BY wg.word_id
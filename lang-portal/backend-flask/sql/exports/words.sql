@@ -0,0 +1,4 @@
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count, r.last_reviewed
+FROM words w
+JOIN word_reviews r ON r.word_id = w.id
+ORDER BY w.id
@@ -0,0 +1,10 @@
+-- A group's words whose review is due, most overdue first (index range on
+-- word_groups(group_id, due_at, word_id))
+SELECT w.id, w.english, w.italian, wr.correct_count, wr.wrong_count,
+       wr.repetitions, wr.interval_days, wr.ease, wg.due_at
+FROM word_groups wg
+JOIN words w ON w.id = wg.word_id
+JOIN word_reviews wr ON wr.word_id = wg.word_id
+WHERE wg.group_id = ? AND wg.due_at <= ?
+ORDER BY wg.due_at, wg.word_id
+LIMIT ?
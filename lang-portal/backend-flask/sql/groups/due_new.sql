@@ -0,0 +1,9 @@
+-- A group's words that were never reviewed (due_at NULL), by word id
+SELECT w.id, w.english, w.italian, wr.correct_count, wr.wrong_count,
+       wr.repetitions, wr.interval_days, wr.ease, wg.due_at
+FROM word_groups wg
+JOIN words w ON w.id = wg.word_id
+JOIN word_reviews wr ON wr.word_id = wg.word_id
+WHERE wg.group_id = ? AND wg.due_at IS NULL
+ORDER BY wg.word_id
+LIMIT ?
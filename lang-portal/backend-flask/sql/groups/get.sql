@@ -0,0 +1,3 @@
+SELECT id, name, words_count
+FROM groups
+WHERE id = ?
@@ -0,0 +1 @@
+SELECT name FROM groups WHERE id = ?
@@ -0,0 +1,6 @@
+-- Groups with their cached word count. Rendered per sort key and order (lib/statements.py).
+SELECT id, name, words_count
+FROM groups
+{where_after}
+ORDER BY {order_by}
+{limit}
@@ -0,0 +1,3 @@
+SELECT COUNT(*)
+FROM study_sessions
+WHERE group_id = ?
@@ -0,0 +1,17 @@
+-- One group's study sessions with their persisted review summary.
+-- Rendered per sort key and order (lib/statements.py).
+SELECT
+  s.id,
+  s.group_id,
+  s.study_activity_id,
+  s.created_at as start_time,
+  s.end_time,
+  s.review_count,
+  a.name as activity_name,
+  g.name as group_name
+FROM study_sessions s
+JOIN study_activities a ON s.study_activity_id = a.id
+JOIN groups g ON s.group_id = g.id
+WHERE s.group_id = ?
+ORDER BY {order_by}
+LIMIT ? OFFSET ?
@@ -0,0 +1,3 @@
+SELECT words_count
+FROM groups
+WHERE id = ?
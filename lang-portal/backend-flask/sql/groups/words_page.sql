@@ -0,0 +1,9 @@
+-- One group's words with their review counters. Rendered per sort key and order (lib/statements.py).
+SELECT w.*, wr.correct_count, wr.wrong_count
+FROM words w
+JOIN word_groups wg ON w.id = wg.word_id
+JOIN word_reviews wr ON w.id = wr.word_id
+WHERE wg.group_id = ?
+{and_after}
+ORDER BY {order_by}
+{limit}
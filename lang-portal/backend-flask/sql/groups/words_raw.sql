@@ -0,0 +1,7 @@
+-- Rendered with the requested fields (lib/statements.py)
+SELECT
+  {columns}
+FROM words w
+JOIN word_groups wg ON w.id = wg.word_id
+WHERE wg.group_id = ?
+ORDER BY w.italian ASC
\ No newline at end of file
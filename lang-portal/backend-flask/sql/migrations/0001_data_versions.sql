@@ -0,0 +1,10 @@
+-- data_versions: per-table versions for HTTP caching (lib/versions.py). Every
+-- migration after this one bumps versions, so it comes first; a database from
+-- before it gets a fresh random id, as a new one does (Db.setup_tables)
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,  -- Table whose data the version covers ('database' holds a random id)
+  version INTEGER NOT NULL DEFAULT 0  -- Bumped by every write path that changes the table
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO data_versions (table_name, version)
+VALUES ('database', abs(random() % 1000000000));
@@ -0,0 +1,9 @@
+from lib.partitions import partition_review_items
+
+# word_review_items: a single table before partitioning, moved into monthly
+# partitions behind the view (lib/partitions.py), one month per transaction.
+# Comes before the migrations that read the review log, so those read the
+# partitions' indexes.
+
+def steps(cursor):
+  yield from partition_review_items(cursor)
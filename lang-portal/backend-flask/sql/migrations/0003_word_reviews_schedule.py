@@ -0,0 +1,13 @@
+from lib.migrations import add_columns
+
+# word_reviews: the spaced repetition schedule (lib/srs.py), as in
+# setup/create_table_word_reviews.sql. 0004 fills it in for the words reviewed
+# before it existed.
+
+def apply(cursor):
+  add_columns(cursor, 'word_reviews', (
+    ('repetitions', 'INTEGER NOT NULL DEFAULT 0'),
+    ('interval_days', 'REAL NOT NULL DEFAULT 0'),
+    ('ease', 'REAL NOT NULL DEFAULT 2.5'),
+    ('due_at', 'TIMESTAMP'),
+  ))
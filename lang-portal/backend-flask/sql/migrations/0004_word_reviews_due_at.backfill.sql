@@ -0,0 +1,8 @@
+-- table: word_reviews
+-- A schedule for the words reviewed before scheduling existed. The counters do not
+-- say in which order the answers came, so each word starts over as after a wrong
+-- answer: due a day after its last review. `invoke rebuild-aggregates` replays the
+-- review log into the exact schedules instead.
+UPDATE {table} SET interval_days = 1, due_at = datetime(last_reviewed, '+1 day')
+WHERE rowid >= :start AND rowid < :stop
+  AND due_at IS NULL AND correct_count + wrong_count > 0 AND last_reviewed IS NOT NULL;
@@ -0,0 +1,14 @@
+from lib.migrations import add_columns
+
+# study_sessions: the summary of each session's reviews kept by lib/reviews.py,
+# as in setup/create_table_study_sessions.sql. SQLite adds a VIRTUAL generated
+# column (end_time) with ALTER TABLE as well; only STORED ones need a rebuilt
+# table. 0006 fills the summaries in from the review log.
+
+def apply(cursor):
+  add_columns(cursor, 'study_sessions', (
+    ('review_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('correct_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('last_activity_at', 'TIMESTAMP'),
+    ('end_time', "TIMESTAMP GENERATED ALWAYS AS (COALESCE(last_activity_at, datetime(created_at, '+30 minutes'))) VIRTUAL"),
+  ))
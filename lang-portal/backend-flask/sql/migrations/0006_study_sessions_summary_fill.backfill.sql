@@ -0,0 +1,16 @@
+-- table: study_sessions
+-- Each batch of sessions gets the summary of its reviews, read from the partitions'
+-- study_session_id indexes. Reviews recorded meanwhile are counted by lib/reviews.py
+-- and by the batch alike, which writes the log's totals rather than adding to them.
+UPDATE {table} SET
+  review_count = agg.review_count,
+  correct_count = agg.correct_count,
+  last_activity_at = agg.last_activity_at
+FROM (
+  SELECT study_session_id, COUNT(*) AS review_count, SUM(correct) AS correct_count,
+         MAX(created_at) AS last_activity_at
+  FROM word_review_items
+  WHERE study_session_id >= :start AND study_session_id < :stop
+  GROUP BY study_session_id
+) agg
+WHERE {table}.id = agg.study_session_id;
@@ -0,0 +1,17 @@
+from lib.migrations import add_columns
+
+# word_groups.due_at: each membership's copy of its word's schedule, for the per-group
+# due queue (lib/srs.py), as in setup/create_table_word_groups.sql. Filled in from
+# word_reviews (0003 and 0004) before the queue's index is built over it; the
+# triggers of setup/create_triggers.sql keep it in step from then on.
+
+def apply(cursor):
+  add_columns(cursor, 'word_groups', (('due_at', 'TIMESTAMP'),))
+  cursor.execute('''
+    UPDATE word_groups SET due_at = wr.due_at
+    FROM word_reviews wr
+    WHERE wr.word_id = word_groups.word_id AND word_groups.due_at IS NOT wr.due_at
+  ''')
+  cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_due_at_word_id ON word_groups(group_id, due_at, word_id)
+  ''')
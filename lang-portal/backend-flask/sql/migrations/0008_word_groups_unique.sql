@@ -0,0 +1,36 @@
+-- word_groups: one row per (word, group), and groups.words_count kept by triggers
+-- (setup/create_indexes.sql, setup/create_triggers.sql)
+
+-- Duplicate memberships inflated the counts: keep the first row of each
+DELETE FROM word_groups
+WHERE rowid NOT IN (SELECT MIN(rowid) FROM word_groups GROUP BY word_id, group_id);
+
+-- The unique (word_id, group_id) index also serves the lookups by word_id
+DROP INDEX IF EXISTS idx_word_groups_word_id;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_groups_word_id_group_id ON word_groups(word_id, group_id);
+
+-- groups.words_count: follows the group's word_groups rows
+CREATE TRIGGER IF NOT EXISTS word_groups_after_insert_words_count
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_after_delete_words_count
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_after_update_words_count
+AFTER UPDATE OF group_id ON word_groups
+WHEN NEW.group_id IS NOT OLD.group_id
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id);
+
+INSERT INTO data_versions (table_name, version) VALUES ('word_groups', 1), ('groups', 1)
+ON CONFLICT(table_name) DO UPDATE SET version = version + 1;
@@ -0,0 +1,30 @@
+-- Managed index set, created by Db.setup_tables.
+-- tests/test_query_plans.py checks every route query against it.
+
+-- words: keyset pagination by (sort column, id)
+CREATE INDEX IF NOT EXISTS idx_words_italian_id ON words(italian, id);
+CREATE INDEX IF NOT EXISTS idx_words_english_id ON words(english, id);
+
+-- groups: keyset pagination by (sort column, id)
+CREATE INDEX IF NOT EXISTS idx_groups_name_id ON groups(name, id);
+CREATE INDEX IF NOT EXISTS idx_groups_words_count_id ON groups(words_count, id);
+
+-- word_groups: a group's words, and a word's groups (one row per word and group)
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_word_id ON word_groups(group_id, word_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_groups_word_id_group_id ON word_groups(word_id, group_id);
+
+-- word_groups: a group's due queue, soonest first (new words, due_at NULL, by word id)
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_due_at_word_id ON word_groups(group_id, due_at, word_id);
+
+-- study_sessions: newest-first lists, overall and per group / per activity
+-- ((created_at, id) also serves plain created_at range scans)
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at_id ON study_sessions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id_created_at ON study_sessions(group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id_created_at ON study_sessions(study_activity_id, created_at);
+
+-- word_review_items: indexed per monthly partition (setup/create_table_word_review_items.sql)
+
+-- word_reviews: per-word counters, upserted on every review and read by counter-sorted word lists
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id);
+CREATE INDEX IF NOT EXISTS idx_word_reviews_correct_count_word_id ON word_reviews(correct_count, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_reviews_wrong_count_word_id ON word_reviews(wrong_count, word_id);
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS daily_activity (
+  activity_date TEXT PRIMARY KEY,  -- UTC date (YYYY-MM-DD) of the sessions and reviews
+  sessions_count INTEGER NOT NULL DEFAULT 0,
+  reviews_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  groups_count INTEGER NOT NULL DEFAULT 0  -- Groups touched that day: its daily_group_activity rows
+) WITHOUT ROWID;
\ No newline at end of file
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS daily_group_activity (
+  activity_date TEXT NOT NULL,  -- UTC date (YYYY-MM-DD) of the sessions and reviews
+  group_id INTEGER NOT NULL,
+  sessions_count INTEGER NOT NULL DEFAULT 0,  -- Sessions of the group started that day
+  reviews_count INTEGER NOT NULL DEFAULT 0,  -- Reviews in the group's sessions that day
+  PRIMARY KEY (activity_date, group_id)
+) WITHOUT ROWID;
\ No newline at end of file
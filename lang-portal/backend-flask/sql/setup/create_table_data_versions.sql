@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,  -- Table whose data the version covers ('database' holds a random id)
+  version INTEGER NOT NULL DEFAULT 0  -- Bumped by every write path that changes the table
+) WITHOUT ROWID;
\ No newline at end of file
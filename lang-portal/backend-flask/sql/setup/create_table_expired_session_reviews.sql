@@ -0,0 +1,9 @@
+-- Reviews dropped from the review log by the retention policy (expire_review_items,
+-- lib/partitions.py), counted per session: a session's summary is what is left in the
+-- log plus this row. Any row here means the log no longer holds every review.
+CREATE TABLE IF NOT EXISTS expired_session_reviews (
+  study_session_id INTEGER PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
\ No newline at end of file
@@ -0,0 +1,16 @@
+-- Applied migrations (see lib/migrations.py)
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,  -- NNNN of sql/migrations/NNNN_name[.backfill].sql
+  name TEXT NOT NULL,
+  checksum TEXT NOT NULL,  -- SHA-256 of the migration file when it was applied
+  applied_at DATETIME NOT NULL,
+  duration_ms INTEGER NOT NULL DEFAULT 0
+);
+
+-- Where an interrupted backfill resumes, per table; cleared once the migration is applied
+CREATE TABLE IF NOT EXISTS schema_backfills (
+  version INTEGER NOT NULL,
+  table_name TEXT NOT NULL,
+  next_start INTEGER,  -- First rowid of the next batch; NULL once the table is done
+  PRIMARY KEY (version, table_name)
+) WITHOUT ROWID;
@@ -3,6 +3,12 @@ CREATE TABLE IF NOT EXISTS study_sessions (
   group_id INTEGER NOT NULL,  -- The group of words being studied
   study_activity_id INTEGER NOT NULL,  -- The activity performed
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- Timestamp of the session
+  -- Summary of the session's reviews, maintained by lib/reviews.py
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  last_activity_at TIMESTAMP,  -- Time of the latest review, NULL until the first one
+  -- The latest review, or 30 minutes after the start for a session without reviews
+  end_time TIMESTAMP GENERATED ALWAYS AS (COALESCE(last_activity_at, datetime(created_at, '+30 minutes'))) VIRTUAL,
   FOREIGN KEY (group_id) REFERENCES groups(id),
   FOREIGN KEY (study_activity_id) REFERENCES study_activities(id)
 );
\ No newline at end of file
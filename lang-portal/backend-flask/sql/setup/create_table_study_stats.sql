@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS study_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),  -- Single row, maintained by triggers and lib/reviews.py
+  vocabulary_count INTEGER NOT NULL DEFAULT 0,  -- Rows in words
+  words_studied INTEGER NOT NULL DEFAULT 0,  -- Words with at least one review
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- Words with >= 5 reviews and >= 80% correct
+  reviews_count INTEGER NOT NULL DEFAULT 0,  -- Rows in word_review_items
+  correct_count INTEGER NOT NULL DEFAULT 0,  -- Correct rows in word_review_items
+  sessions_count INTEGER NOT NULL DEFAULT 0  -- Rows in study_sessions
+);
\ No newline at end of file
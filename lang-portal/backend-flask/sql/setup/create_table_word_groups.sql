@@ -1,6 +1,8 @@
 CREATE TABLE IF NOT EXISTS word_groups (
   word_id INTEGER NOT NULL,
   group_id INTEGER NOT NULL,
+  -- Copy of the word's word_reviews.due_at, so a group's due queue is one index range
+  due_at TIMESTAMP,
   FOREIGN KEY (word_id) REFERENCES words(id),
   FOREIGN KEY (group_id) REFERENCES groups(id)
 );
\ No newline at end of file
@@ -1,4 +1,6 @@
-CREATE TABLE IF NOT EXISTS word_review_items (
+-- One month of the review log, {table} = word_review_items_YYYY_MM (see lib/partitions.py);
+-- word_review_items is the view over all of them
+CREATE TABLE IF NOT EXISTS {table} (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   word_id INTEGER NOT NULL,
   study_session_id INTEGER NOT NULL,  -- Link to study session
@@ -6,4 +8,9 @@ CREATE TABLE IF NOT EXISTS word_review_items (
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- Timestamp of the review
   FOREIGN KEY (word_id) REFERENCES words(id),
   FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
-);
\ No newline at end of file
+);
+
+-- A session's reviews, a word's reviews, and date-range exports
+CREATE INDEX IF NOT EXISTS idx_{table}_study_session_id ON {table}(study_session_id);
+CREATE INDEX IF NOT EXISTS idx_{table}_word_id ON {table}(word_id);
+CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table}(created_at);
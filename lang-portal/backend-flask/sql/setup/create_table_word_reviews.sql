@@ -4,5 +4,10 @@ CREATE TABLE IF NOT EXISTS word_reviews (
   correct_count INTEGER DEFAULT 0,
   wrong_count INTEGER DEFAULT 0,
   last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Spaced repetition schedule (lib/srs.py); due_at is NULL until the first review
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  interval_days REAL NOT NULL DEFAULT 0,
+  ease REAL NOT NULL DEFAULT 2.5,
+  due_at TIMESTAMP,
   FOREIGN KEY (word_id) REFERENCES words(id)
 );
\ No newline at end of file
@@ -0,0 +1,12 @@
+-- Full-text index over words (external content: the text stays in words, the index
+-- holds only tokens). unicode61 with remove_diacritics folds accents, so "perche"
+-- matches "perché"; the 2- and 3-character prefix indexes keep type-ahead queries fast.
+-- Kept in sync by the words_*_fts triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  english,
+  italian,
+  content = 'words',
+  content_rowid = 'id',
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
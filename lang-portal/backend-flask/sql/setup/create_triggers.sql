@@ -0,0 +1,174 @@
+-- Every word gets a zeroed word_reviews row, so counters can be read with a plain JOIN
+CREATE TRIGGER IF NOT EXISTS words_after_insert_word_reviews
+AFTER INSERT ON words
+BEGIN
+  INSERT OR IGNORE INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.id, 0, 0, NULL);
+END;
+
+-- words_fts: the full-text index follows every insert, update and delete
+CREATE TRIGGER IF NOT EXISTS words_after_insert_fts
+AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, english, italian) VALUES (NEW.id, NEW.english, NEW.italian);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_after_delete_fts
+AFTER DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, italian) VALUES ('delete', OLD.id, OLD.english, OLD.italian);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_after_update_fts
+AFTER UPDATE OF english, italian ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, italian) VALUES ('delete', OLD.id, OLD.english, OLD.italian);
+  INSERT INTO words_fts (rowid, english, italian) VALUES (NEW.id, NEW.english, NEW.italian);
+END;
+
+-- word_groups.due_at: follows the word's schedule (lib/srs.py), for the per-group due queue
+CREATE TRIGGER IF NOT EXISTS word_reviews_after_update_due_at_word_groups
+AFTER UPDATE OF due_at ON word_reviews
+WHEN NEW.due_at IS NOT OLD.due_at
+BEGIN
+  UPDATE word_groups SET due_at = NEW.due_at WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_after_insert_due_at
+AFTER INSERT ON word_groups
+WHEN (SELECT due_at FROM word_reviews WHERE word_id = NEW.word_id) IS NOT NULL
+BEGIN
+  UPDATE word_groups
+  SET due_at = (SELECT due_at FROM word_reviews WHERE word_id = NEW.word_id)
+  WHERE rowid = NEW.rowid;
+END;
+
+-- groups.words_count: follows the group's word_groups rows
+CREATE TRIGGER IF NOT EXISTS word_groups_after_insert_words_count
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_after_delete_words_count
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_after_update_words_count
+AFTER UPDATE OF group_id ON word_groups
+WHEN NEW.group_id IS NOT OLD.group_id
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+-- study_stats: vocabulary size
+CREATE TRIGGER IF NOT EXISTS words_after_insert_study_stats
+AFTER INSERT ON words
+BEGIN
+  UPDATE study_stats SET vocabulary_count = vocabulary_count + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_after_delete_study_stats
+AFTER DELETE ON words
+BEGIN
+  UPDATE study_stats SET vocabulary_count = vocabulary_count - 1 WHERE id = 1;
+END;
+
+-- study_stats: review totals, studied and mastered words, derived from the per-word
+-- counters (which lib/reviews.py updates once per word per batch)
+CREATE TRIGGER IF NOT EXISTS word_reviews_after_insert_study_stats
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE study_stats SET
+    words_studied = words_studied + (NEW.correct_count + NEW.wrong_count > 0),
+    mastered_words = mastered_words + (
+      NEW.correct_count + NEW.wrong_count >= 5
+      AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+    ),
+    reviews_count = reviews_count + NEW.correct_count + NEW.wrong_count,
+    correct_count = correct_count + NEW.correct_count
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_after_update_study_stats
+AFTER UPDATE OF correct_count, wrong_count ON word_reviews
+BEGIN
+  UPDATE study_stats SET
+    words_studied = words_studied
+      + (NEW.correct_count + NEW.wrong_count > 0)
+      - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      + (
+        NEW.correct_count + NEW.wrong_count >= 5
+        AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+      )
+      - (
+        OLD.correct_count + OLD.wrong_count >= 5
+        AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+      ),
+    reviews_count = reviews_count
+      + NEW.correct_count + NEW.wrong_count
+      - OLD.correct_count - OLD.wrong_count,
+    correct_count = correct_count + NEW.correct_count - OLD.correct_count
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_after_delete_study_stats
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE study_stats SET
+    words_studied = words_studied - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words - (
+      OLD.correct_count + OLD.wrong_count >= 5
+      AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+    ),
+    reviews_count = reviews_count - OLD.correct_count - OLD.wrong_count,
+    correct_count = correct_count - OLD.correct_count
+  WHERE id = 1;
+END;
+
+-- study_stats, daily_activity and daily_group_activity: sessions per day and group
+-- (lib/reviews.py adds the reviews)
+CREATE TRIGGER IF NOT EXISTS study_sessions_after_insert_stats
+AFTER INSERT ON study_sessions
+BEGIN
+  UPDATE study_stats SET sessions_count = sessions_count + 1 WHERE id = 1;
+  INSERT INTO daily_activity (activity_date, sessions_count)
+  VALUES (date(NEW.created_at), 1)
+  ON CONFLICT(activity_date) DO UPDATE SET sessions_count = sessions_count + 1;
+  INSERT INTO daily_group_activity (activity_date, group_id, sessions_count)
+  VALUES (date(NEW.created_at), NEW.group_id, 1)
+  ON CONFLICT(activity_date, group_id) DO UPDATE SET sessions_count = sessions_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_after_delete_stats
+AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE study_stats SET sessions_count = sessions_count - 1 WHERE id = 1;
+  UPDATE daily_activity SET sessions_count = sessions_count - 1
+  WHERE activity_date = date(OLD.created_at);
+  UPDATE daily_group_activity SET sessions_count = sessions_count - 1
+  WHERE activity_date = date(OLD.created_at) AND group_id = OLD.group_id;
+  DELETE FROM daily_group_activity
+  WHERE activity_date = date(OLD.created_at) AND group_id = OLD.group_id
+    AND sessions_count = 0 AND reviews_count = 0;
+END;
+
+-- daily_activity.groups_count: one per group touched that day
+CREATE TRIGGER IF NOT EXISTS daily_group_activity_after_insert_groups_count
+AFTER INSERT ON daily_group_activity
+BEGIN
+  INSERT INTO daily_activity (activity_date, groups_count)
+  VALUES (NEW.activity_date, 1)
+  ON CONFLICT(activity_date) DO UPDATE SET groups_count = groups_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS daily_group_activity_after_delete_groups_count
+AFTER DELETE ON daily_group_activity
+BEGIN
+  UPDATE daily_activity SET groups_count = groups_count - 1
+  WHERE activity_date = OLD.activity_date;
+END;
@@ -0,0 +1,16 @@
+-- One activity's sessions, read newest first off the (study_activity_id, created_at) index
+SELECT
+  ss.id,
+  ss.group_id,
+  g.name as group_name,
+  sa.name as activity_name,
+  ss.created_at,
+  ss.study_activity_id as activity_id,
+  ss.end_time,
+  ss.review_count as review_items_count
+FROM study_sessions ss
+JOIN groups g ON g.id = ss.group_id
+JOIN study_activities sa ON sa.id = ss.study_activity_id
+WHERE ss.study_activity_id = ?
+ORDER BY ss.created_at DESC
+LIMIT ? OFFSET ?
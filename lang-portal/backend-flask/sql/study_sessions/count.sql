@@ -0,0 +1,4 @@
+SELECT COUNT(*) as count
+FROM study_sessions ss
+JOIN groups g ON g.id = ss.group_id
+JOIN study_activities sa ON sa.id = ss.study_activity_id
@@ -0,0 +1,2 @@
+INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+VALUES (?, ?, CURRENT_TIMESTAMP)
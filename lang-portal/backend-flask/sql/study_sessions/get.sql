@@ -0,0 +1,14 @@
+-- A session with its persisted review summary
+SELECT
+  ss.id,
+  ss.group_id,
+  g.name as group_name,
+  sa.id as activity_id,
+  sa.name as activity_name,
+  ss.created_at,
+  ss.end_time,
+  ss.review_count as review_items_count
+FROM study_sessions ss
+JOIN groups g ON g.id = ss.group_id
+JOIN study_activities sa ON sa.id = ss.study_activity_id
+WHERE ss.id = ?
@@ -0,0 +1 @@
+SELECT id FROM study_sessions WHERE id = ?
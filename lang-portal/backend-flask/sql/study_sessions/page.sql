@@ -0,0 +1,10 @@
+-- Sessions with their persisted review summary, read straight off the (created_at, id)
+-- index. Rendered per order and with the requested fields (lib/statements.py).
+SELECT
+  {columns}
+FROM study_sessions ss
+JOIN groups g ON g.id = ss.group_id
+JOIN study_activities sa ON sa.id = ss.study_activity_id
+{where_after}
+ORDER BY {order_by}
+{limit}
@@ -0,0 +1,4 @@
+SELECT COUNT(DISTINCT w.id) as count
+FROM words w
+JOIN word_review_items wri ON wri.word_id = w.id
+WHERE wri.study_session_id = ?
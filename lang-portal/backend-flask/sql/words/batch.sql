@@ -0,0 +1,8 @@
+-- Words by id, like words/get: the ids are bound as one JSON array (lib/batch.py)
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count,
+       g.id AS group_id, g.name AS group_name
+FROM json_each(?) ids
+JOIN words w ON w.id = ids.value
+JOIN word_reviews r ON r.word_id = w.id
+LEFT JOIN word_groups wg ON wg.word_id = w.id
+LEFT JOIN groups g ON g.id = wg.group_id
@@ -0,0 +1,9 @@
+-- A word with its review counters, one row per group it belongs to (group_id and
+-- group_name are NULL for a word in no group)
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count,
+       g.id AS group_id, g.name AS group_name
+FROM words w
+JOIN word_reviews r ON r.word_id = w.id
+LEFT JOIN word_groups wg ON wg.word_id = w.id
+LEFT JOIN groups g ON g.id = wg.group_id
+WHERE w.id = ?
@@ -0,0 +1,8 @@
+-- Words with their review counters. Every word has a word_reviews row, so the
+-- counters come from a plain join. Rendered per sort key and order (lib/statements.py).
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count
+FROM words w
+JOIN word_reviews r ON w.id = r.word_id
+{where_after}
+ORDER BY {order_by}
+{limit}
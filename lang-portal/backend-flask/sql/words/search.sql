@@ -0,0 +1,14 @@
+-- Full-text matches ranked by bm25 (the FTS5 rank column), with their review counters.
+-- The best `limit` matches are picked inside FTS5 (ORDER BY rank LIMIT keeps only the top
+-- rows while scoring every match), so only the page is joined to words and word_reviews.
+SELECT w.id, w.english, w.italian, r.correct_count, r.wrong_count
+FROM (
+  SELECT rowid, rank
+  FROM words_fts
+  WHERE words_fts MATCH ?
+  ORDER BY rank
+  LIMIT ?
+) f
+JOIN words w ON w.id = f.rowid
+JOIN word_reviews r ON r.word_id = w.id
+ORDER BY f.rank
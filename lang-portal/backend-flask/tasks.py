@@ -6,4 +6,114 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task(help={
+  'path': 'A .json (array), .ndjson/.jsonl or .csv file of words with english and italian fields',
+  'group': 'Group to add the words to (created if missing)',
+  'format': 'json, ndjson or csv; defaults to the file extension',
+  'chunk_size': 'Records written per transaction'
+})
+def import_words(c, path, group, format=None, chunk_size=10000):
+  """Stream a vocabulary file into words.db."""
+  from flask import Flask
+  from lib.importer import import_words
+  app = Flask(__name__)
+  with app.app_context():
+    def progress(stats):
+      print(f"  {stats['rows']} rows read, {stats['words_added']} words added", end='\r')
+    stats = import_words(db.get(), path, group, format=format, chunk_size=int(chunk_size), progress=progress)
+    db.close()
+  print()
+  print(f"Imported {stats['rows']} rows into '{group}': {stats['words_added']} new words, "
+        f"{stats['duplicates']} duplicates, {stats['skipped']} skipped, "
+        f"{stats['memberships_added']} memberships added")
+  print(f"{stats['seconds']:.2f}s, {stats['rows'] / max(stats['seconds'], 1e-9):,.0f} rows/sec")
+
+@task
+def rebuild_aggregates(c):
+  """Recompute the review aggregates (word_reviews and its schedules, session summaries, study_stats, daily_activity, daily_group_activity) from the review log; refused once reviews have expired from it."""
+  import sys
+  import time
+  from flask import Flask
+  from lib.reviews import TruncatedReviewLog, rebuild_aggregates
+  app = Flask(__name__)
+  with app.app_context():
+    started = time.perf_counter()
+    cursor = db.cursor()
+    try:
+      rows = rebuild_aggregates(cursor)
+    except TruncatedReviewLog as e:
+      db.rollback()
+      db.close()
+      sys.exit(f"Not rebuilding: {e}")
+    db.commit()
+    db.close()
+  print(f"Rebuilt aggregates for {rows} words in {time.perf_counter() - started:.2f}s.")
+
+@task(help={
+  'fix': 'Recount the counters found out of step'
+})
+def check_integrity(c, fix=False):
+  """Check the counter caches (groups.words_count, study_stats, session review counts) against their rows."""
+  import sys
+  from flask import Flask
+  from lib.integrity import check_counters, fix_counters
+  app = Flask(__name__)
+  with app.app_context():
+    cursor = db.cursor()
+    mismatches = check_counters(cursor)
+    for mismatch in mismatches:
+      print(f"{mismatch['check']} {mismatch['id']}: {mismatch['column']} is {mismatch['stored']}, "
+            f"counted {mismatch['actual']}")
+    if mismatches and fix:
+      fix_counters(cursor, mismatches)
+      db.commit()
+      mismatches = check_counters(cursor)
+      print(f"Recounted; {len(mismatches)} mismatches left.")
+    db.close()
+  if mismatches:
+    sys.exit(1)
+  print("Counters match their rows.")
+
+@task(help={
+  'months': 'Months of reviews to keep, the current one included'
+})
+def expire_reviews(c, months):
+  """Drop the monthly review log partitions older than the retention window (the aggregates keep them)."""
+  from flask import Flask
+  from lib.partitions import expire_review_items
+  app = Flask(__name__)
+  with app.app_context():
+    cursor = db.cursor()
+    expired = expire_review_items(cursor, int(months))
+    db.commit()
+    db.close()
+  print(f"Dropped {len(expired)} partitions: {', '.join(expired) or 'none'}.")
+
+@task(help={
+  'batch_size': 'Rows per backfill transaction',
+  'pause': 'Seconds to wait between backfill batches, letting writers in'
+})
+def migrate(c, batch_size=10000, pause=0.0):
+  """Apply the pending schema migrations (sql/migrations) to words.db."""
+  from migrate import run_migrations
+  run_migrations('words.db', batch_size=int(batch_size), pause=float(pause))
+
+@task(help={
+  'learner': 'Learner id; the shard is <shards-dir>/<learner>.db',
+  'shards_dir': 'Directory of the per-learner databases (DB_SHARDS_DIR)',
+  'source': 'Database to copy the study history from'
+})
+def shard_learner(c, learner, shards_dir, source='words.db'):
+  """Copy the study history of a single-database install into a learner's shard."""
+  from lib.shards import ShardedDb, copy_study_data
+  shards = ShardedDb(directory=shards_dir, dictionary='words.db')
+  connection = shards.acquire(learner)
+  try:
+    copy_study_data(connection, source)
+    sessions = connection.execute('SELECT COUNT(*) FROM study_sessions').fetchone()[0]
+  finally:
+    shards.release(connection)
+    shards.close_all()
+  print(f"Copied {sessions} study sessions from {source} into {shards.shard_path(learner)}.")
@@ -32,4 +32,33 @@ def valid_study_activity_id(db_connection):
     cursor = db_connection.cursor()
     cursor.execute('SELECT id FROM study_activities LIMIT 1')
     activity_id = cursor.fetchone()[0]
-    return activity_id
\ No newline at end of file
+    return activity_id
+
+@pytest.fixture(scope='session')
+def synthetic_db(tmp_path_factory):
+    # A large synthetic database, generated once per test session
+    from bench import synthetic
+    path = tmp_path_factory.mktemp('synthetic') / 'synthetic.db'
+    return synthetic.generate(str(path), words=20000, groups=20, sessions=2000, review_items=100000)
+
+@pytest.fixture
+def synthetic_app(synthetic_db, tmp_path):
+    # An in-process app on a private copy of the synthetic database.
+    # Every SQL statement it runs is appended to app.statements.
+    import shutil
+    from app import create_app
+
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    app = create_app({'DATABASE': str(path)})
+    app.statements = []
+
+    connect = app.db.connect
+    def traced_connect():
+        connection = connect()
+        connection.set_trace_callback(app.statements.append)
+        return connection
+    app.db.connect = traced_connect
+
+    yield app
+    app.db.close_all()
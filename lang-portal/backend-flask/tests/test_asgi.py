@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from lib.asgi import AsgiApp
+
+async def call(asgi, method, path, query_string=b'', body=b'', headers=()):
+    """Send one request to an ASGI app; return (status, headers, body chunks)."""
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'root_path': '', 'query_string': query_string,
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 8000),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    async def receive():
+        return messages.pop(0)
+
+    sent = []
+    async def send(message):
+        sent.append(message)
+    await asgi(scope, receive, send)
+
+    start, chunks = sent[0], sent[1:]
+    assert start['type'] == 'http.response.start'
+    assert chunks[-1]['more_body'] is False
+    return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, [chunk['body'] for chunk in chunks]
+
+def test_asgi_serves_the_flask_routes(synthetic_app):
+    """
+    Test that the ASGI entry point returns the same responses as the Flask app, including 304s and writes
+    """
+    asgi = AsgiApp(synthetic_app, threads=2)
+    client = synthetic_app.test_client()
+
+    status, headers, chunks = asyncio.run(call(asgi, 'GET', '/api/groups', b'page=2&sort_by=name'))
+    expected = client.get('/api/groups', query_string={'page': 2, 'sort_by': 'name'})
+    assert status == 200
+    assert b''.join(chunks) == expected.get_data()
+    assert headers['etag'] == expected.headers['ETag']
+
+    status, _, chunks = asyncio.run(call(asgi, 'GET', '/api/groups', b'page=2&sort_by=name',
+                                         headers=[('If-None-Match', headers['etag'])]))
+    assert status == 304
+    assert b''.join(chunks) == b''
+
+    body = json.dumps({'group_id': 1, 'study_activity_id': 1}).encode()
+    status, _, chunks = asyncio.run(call(asgi, 'POST', '/api/study-sessions', body=body,
+                                         headers=[('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]))
+    assert status == 201
+    assert 'session_id' in json.loads(b''.join(chunks))
+    asgi.shutdown()
+
+def test_asgi_streams_exports_in_chunks(synthetic_app):
+    """
+    Test that a streamed export is sent as several body messages with the same content
+    """
+    synthetic_app.config['EXPORT_FETCH_SIZE'] = 100
+    asgi = AsgiApp(synthetic_app, threads=2)
+
+    status, headers, chunks = asyncio.run(call(asgi, 'GET', '/api/export/words'))
+
+    assert status == 200
+    assert headers['content-type'].startswith('application/x-ndjson')
+    assert len(chunks) > 2
+    assert b''.join(chunks) == synthetic_app.test_client().get('/api/export/words').get_data()
+    asgi.shutdown()
+
+def test_asgi_bounds_database_work_to_its_threads(synthetic_app):
+    """
+    Test that many concurrent requests all succeed while at most `threads` connections are opened
+    """
+    asgi = AsgiApp(synthetic_app, threads=2)
+
+    async def burst():
+        return await asyncio.gather(*[call(asgi, 'GET', f'/api/words/{word_id}') for word_id in range(1, 201)])
+
+    responses = asyncio.run(burst())
+    asgi.shutdown()
+
+    assert [status for status, _, _ in responses] == [200] * 200
+    stats = synthetic_app.db.pool_stats()
+    assert stats['open_connections'] <= 2
+    assert stats['waits'] == 0
@@ -0,0 +1,78 @@
+import gzip
+import json
+import zlib
+
+import pytest
+
+def test_gzip_response_decodes_to_the_same_json(synthetic_app):
+    """
+    Test that a client accepting gzip gets a gzip body with the same JSON, and small bodies stay uncompressed
+    """
+    client = synthetic_app.test_client()
+    plain = client.get('/api/groups/1/words/raw')
+    compressed = client.get('/api/groups/1/words/raw', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.get_data()) < len(plain.get_data())
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+
+    small = client.get('/api/words/5', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+def test_etag_varies_with_encoding(synthetic_app):
+    """
+    Test that each encoding has its own ETag, revalidated only with that encoding
+    """
+    client = synthetic_app.test_client()
+    plain = client.get('/api/groups/1/words/raw')
+    compressed = client.get('/api/groups/1/words/raw', headers={'Accept-Encoding': 'gzip'})
+    assert plain.headers['ETag'] != compressed.headers['ETag']
+
+    revalidated = client.get('/api/groups/1/words/raw', headers={'Accept-Encoding': 'gzip',
+                                                                 'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == compressed.headers['ETag']
+    assert client.get('/api/groups/1/words/raw', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 200
+    assert client.get('/api/groups/1/words/raw', headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
+
+def test_streamed_export_is_compressed(synthetic_app):
+    """
+    Test that a streamed export is gzip compressed chunk by chunk into one valid stream
+    """
+    synthetic_app.config['EXPORT_FETCH_SIZE'] = 100
+    client = synthetic_app.test_client()
+    plain = client.get('/api/export/words')
+    compressed = client.get('/api/export/words', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    chunks = list(compressed.response)
+    assert len(chunks) > 1
+    assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0])  # Each chunk is flushed
+    assert gzip.decompress(b''.join(chunks)) == plain.get_data()
+
+def test_compression_disabled(synthetic_app):
+    """
+    Test that an empty COMPRESSION_ENCODINGS sends every response as it is
+    """
+    synthetic_app.config['COMPRESSION_ENCODINGS'] = []
+    response = synthetic_app.test_client().get('/api/groups/1/words/raw', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+@pytest.mark.parametrize('url', ['/api/groups/1/words/raw', '/api/study-sessions', '/dashboard/stats'])
+def test_json_encoders_agree(synthetic_app, url):
+    """
+    Test that the orjson and standard library encoders produce the same JSON
+    """
+    pytest.importorskip('orjson')
+    from lib.json_encoding import json_provider
+
+    client = synthetic_app.test_client()
+    synthetic_app.json = json_provider(synthetic_app, 'orjson')
+    fast = client.get(url)
+    synthetic_app.json = json_provider(synthetic_app, 'json')
+    standard = client.get(url)
+
+    assert fast.mimetype == standard.mimetype == 'application/json'
+    assert json.loads(fast.get_data()) == json.loads(standard.get_data())
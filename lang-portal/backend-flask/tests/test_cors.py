@@ -0,0 +1,72 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from lib.versions import bump_versions
+
+@pytest.fixture
+def cors_app(synthetic_db, tmp_path):
+    # Origins re-checked on every request
+    from app import create_app
+
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    app = create_app({'DATABASE': str(path), 'DATA_VERSIONS_TTL': 0})
+    yield app
+    app.cors_origins.close()
+    app.db.close_all()
+
+def allowed_origin(client, url, origin):
+    return client.get(url, headers={'Origin': origin}).headers.get('Access-Control-Allow-Origin')
+
+def test_importing_and_creating_the_app_touch_no_database(tmp_path):
+    """
+    Test that importing app.py creates no app and imports no route, and create_app opens no database
+    """
+    script = (
+        'import sys, app\n'
+        'assert app._app is None\n'
+        'assert not [name for name in sys.modules if name.startswith("routes.")]\n'
+        f'app.create_app({{"DATABASE": {str(tmp_path / "missing.db")!r}}})\n'
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert not os.path.exists(tmp_path / 'missing.db')
+
+def test_new_study_activity_origin_is_allowed_without_restart(cors_app):
+    """
+    Test that the allowed origins follow study_activities, on routes with and without @cross_origin()
+    """
+    client = cors_app.test_client()
+    assert allowed_origin(client, '/api/groups', 'https://flashcards.example') is None
+    loads = cors_app.cors_origins.loads
+
+    connection = sqlite3.connect(cors_app.config['DATABASE'])
+    with connection:
+        connection.execute("INSERT INTO study_activities (name, url, preview_url) VALUES "
+                           "('Flashcards', 'https://flashcards.example/app', NULL)")
+        bump_versions(connection.cursor(), 'study_activities')
+    connection.close()
+
+    assert allowed_origin(client, '/api/groups', 'https://flashcards.example') == 'https://flashcards.example'
+    assert allowed_origin(client, '/no-such-route', 'https://flashcards.example') == 'https://flashcards.example'
+    assert allowed_origin(client, '/api/groups', 'https://elsewhere.example') is None
+    assert cors_app.cors_origins.loads == loads + 1
+
+    allowed_origin(client, '/api/groups', 'https://flashcards.example')
+    assert cors_app.cors_origins.loads == loads + 1  # Unchanged version: not re-read
+
+def test_origins_default_to_every_origin_without_activities(cors_app):
+    """
+    Test that every origin is allowed while no study activity URL names one
+    """
+    connection = sqlite3.connect(cors_app.config['DATABASE'])
+    with connection:
+        connection.execute("UPDATE study_activities SET url = '/activities/local'")
+        bump_versions(connection.cursor(), 'study_activities')
+    connection.close()
+
+    assert allowed_origin(cors_app.test_client(), '/api/groups', 'https://anywhere.example') == 'https://anywhere.example'
@@ -64,3 +64,123 @@ def test_get_study_stats():
     assert data['total_sessions'] >= 0
     assert data['active_groups'] >= 0
     assert data['current_streak'] >= 0
+
+def test_stats_rollup_matches_review_log(synthetic_app):
+    """
+    Test that the maintained stats rollup agrees with aggregating the review log
+    """
+    import sqlite3
+    from bench.dashboard_stats import stats_from_log
+
+    client = synthetic_app.test_client()
+
+    def assert_matches_log():
+        stats = client.get('/dashboard/stats').get_json()
+        connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+        expected = stats_from_log(connection)
+        daily = connection.execute('''
+            SELECT activity_date, sessions_count, reviews_count, correct_count
+            FROM daily_activity
+            WHERE sessions_count > 0 OR reviews_count > 0
+            ORDER BY activity_date
+        ''').fetchall()
+        expected_daily = connection.execute('''
+            SELECT activity_date, SUM(sessions), SUM(reviews), SUM(correct)
+            FROM (
+                SELECT date(created_at) AS activity_date, 1 AS sessions, 0 AS reviews, 0 AS correct FROM study_sessions
+                UNION ALL
+                SELECT date(created_at), 0, 1, correct FROM word_review_items
+            )
+            GROUP BY activity_date
+            ORDER BY activity_date
+        ''').fetchall()
+        groups = connection.execute('''
+            SELECT activity_date, group_id, sessions_count, reviews_count
+            FROM daily_group_activity
+            ORDER BY activity_date, group_id
+        ''').fetchall()
+        expected_groups = connection.execute('''
+            SELECT activity_date, group_id, SUM(sessions), SUM(reviews)
+            FROM (
+                SELECT date(created_at) AS activity_date, group_id, 1 AS sessions, 0 AS reviews FROM study_sessions
+                UNION ALL
+                SELECT date(wri.created_at), ss.group_id, 0, 1
+                FROM word_review_items wri JOIN study_sessions ss ON ss.id = wri.study_session_id
+            )
+            GROUP BY activity_date, group_id
+            ORDER BY activity_date, group_id
+        ''').fetchall()
+        groups_count = connection.execute('''
+            SELECT activity_date, groups_count FROM daily_activity WHERE groups_count > 0 ORDER BY activity_date
+        ''').fetchall()
+        connection.close()
+        for key, value in expected.items():
+            assert stats[key] == pytest.approx(value), key
+        assert daily == expected_daily
+        assert groups == expected_groups
+        expected_counts = {}
+        for activity_date, _, _, _ in expected_groups:
+            expected_counts[activity_date] = expected_counts.get(activity_date, 0) + 1
+        assert groups_count == sorted(expected_counts.items())
+
+    assert_matches_log()
+
+    # Reviews through both write paths, including replayed ones on an older day
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    client.post(f'/api/study-sessions/{session_id}/review', json={
+        'reviews': [{'word_id': word_id, 'is_correct': True} for word_id in range(1, 8)] * 5
+    })
+    client.post('/api/study-sessions/reviews', json=[
+        {'session_id': 3, 'word_id': word_id, 'is_correct': word_id % 3 != 0, 'created_at': '2024-03-01 08:00:00'}
+        for word_id in range(1, 500)
+    ])
+    assert_matches_log()
+
+    client.post('/api/study-sessions/reset')
+    assert_matches_log()
+
+def test_streak_and_history_count_consecutive_days(synthetic_app):
+    """
+    Test that the streak stops at the first day without activity, and the history zero-fills the window
+    """
+    from datetime import datetime, timedelta, timezone
+
+    client = synthetic_app.test_client()
+    client.post('/api/study-sessions/reset')
+    today = datetime.now(timezone.utc).date()
+
+    def day(offset):
+        return (today - timedelta(days=offset)).isoformat()
+
+    first = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    second = client.post('/api/study-sessions', json={'group_id': 2, 'study_activity_id': 1}).get_json()['session_id']
+    # Reviews on today, 1, 2, 5 and 6 days ago: the streak is the three most recent days
+    client.post('/api/study-sessions/reviews', json=[
+        {'session_id': first, 'word_id': offset + 1, 'is_correct': True, 'created_at': f'{day(offset)} 09:00:00'}
+        for offset in [1, 2, 5, 6, 6]
+    ] + [{'session_id': second, 'word_id': 10, 'is_correct': False, 'created_at': f'{day(1)} 10:00:00'}])
+
+    stats = client.get('/dashboard/stats').get_json()
+    assert stats['current_streak'] == 3
+    assert stats['active_groups'] == 2
+
+    response = client.get('/dashboard/history', query_string={'days': 7})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['days'] == 7
+    assert (data['from'], data['to']) == (day(6), day(0))
+    history = {entry['date']: entry for entry in data['history']}
+    assert [entry['date'] for entry in data['history']] == [day(offset) for offset in range(6, -1, -1)]
+    assert history[day(0)] == {'date': day(0), 'sessions': 2, 'reviews': 0, 'correct': 0, 'groups': 2}
+    assert history[day(1)] == {'date': day(1), 'sessions': 0, 'reviews': 2, 'correct': 1, 'groups': 2}
+    assert history[day(3)] == {'date': day(3), 'sessions': 0, 'reviews': 0, 'correct': 0, 'groups': 0}
+    assert history[day(6)]['reviews'] == 2
+    assert history[day(6)]['groups'] == 1
+
+    # Filling the gap joins both runs
+    client.post('/api/study-sessions/reviews', json=[
+        {'session_id': first, 'word_id': 1, 'is_correct': True, 'created_at': f'{day(offset)} 09:00:00'}
+        for offset in [3, 4]
+    ])
+    assert client.get('/dashboard/stats').get_json()['current_streak'] == 7
+    assert len(client.get('/dashboard/history', query_string={'days': 0}).get_json()['history']) == 1
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+import pytest
+import requests
+
+# Base URL for your API
+BASE_URL = 'http://localhost:8000/api/export'
+
+def test_export_words_ndjson(db_connection):
+    """
+    Test exporting every word as NDJSON
+    """
+    response = requests.get(f'{BASE_URL}/words', stream=True)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.iter_lines() if line]
+    total = db_connection.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+    assert len(rows) == total
+    assert set(rows[0]) == {'id', 'english', 'italian', 'correct_count', 'wrong_count', 'last_reviewed'}
+
+def test_export_group_words_csv(valid_group_id, db_connection):
+    """
+    Test exporting a group's words as CSV
+    """
+    response = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words', params={'format': 'csv'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    count = db_connection.execute('SELECT COUNT(*) FROM word_groups WHERE group_id = ?', (valid_group_id,)).fetchone()[0]
+    assert len(rows) == count
+    assert 'italian' in rows[0]
+
+def test_export_group_words_not_found():
+    """
+    Test exporting the words of a non-existent group
+    """
+    response = requests.get(f'{BASE_URL}/groups/99999/words')
+
+    assert response.status_code == 404
+
+def test_export_review_items_date_range(valid_group_id, valid_study_activity_id, valid_word_id):
+    """
+    Test that the review export only includes reviews inside the date range
+    """
+    session = requests.post('http://localhost:8000/api/study-sessions', json={
+        'group_id': valid_group_id,
+        'study_activity_id': valid_study_activity_id
+    }).json()
+    requests.post('http://localhost:8000/api/study-sessions/reviews', json=[
+        {'session_id': session['session_id'], 'word_id': valid_word_id, 'is_correct': True, 'created_at': created_at}
+        for created_at in ['2020-03-01 10:00:00', '2020-03-15 23:59:59', '2020-04-01 00:00:00']
+    ])
+
+    response = requests.get(f'{BASE_URL}/review-items', params={'from': '2020-03-01', 'to': '2020-03-31'})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # The live database keeps earlier runs' reviews; only this session's are checked
+    assert [row['created_at'] for row in rows if row['study_session_id'] == session['session_id']] == [
+        '2020-03-01 10:00:00', '2020-03-15 23:59:59'
+    ]
+
+@pytest.mark.parametrize('params', [{'from': 'yesterday'}, {'format': 'xml'}])
+def test_export_study_sessions_invalid_params(params):
+    """
+    Test that invalid export parameters are rejected
+    """
+    response = requests.get(f'{BASE_URL}/study-sessions', params=params)
+
+    assert response.status_code == 400
+    assert 'error' in response.json()
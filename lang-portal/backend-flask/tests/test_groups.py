@@ -131,6 +131,19 @@ def test_get_group_words_raw(valid_group_id):
         assert 'english' in word
         assert 'italian' in word
 
+def test_get_group_words_raw_fields(valid_group_id):
+    """
+    Test that ?fields= narrows the raw words to the requested keys
+    """
+    full = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words/raw').json()
+    response = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words/raw', params={'fields': 'italian'})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data['count'] == full['count']
+    assert data['words'] == [{'italian': word['italian']} for word in full['words']]
+    assert requests.get(f'{BASE_URL}/groups/{valid_group_id}/words/raw', params={'fields': 'kind'}).status_code == 400
+
 def test_get_group_study_sessions(valid_group_id):
     """
     Test retrieving study sessions for a group
@@ -169,3 +182,219 @@ def test_get_group_study_sessions_pagination(valid_group_id):
     
     data = response.json()
     assert data['current_page'] == 2
+
+def test_group_study_sessions_run_two_queries(synthetic_app):
+    """
+    Test that a page of group study sessions costs one count and one page query, whatever its size
+    """
+    import sqlite3
+
+    synthetic_app.versions.ttl = 3600
+    client = synthetic_app.test_client()
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    group_id = connection.execute(
+        'SELECT group_id FROM study_sessions GROUP BY group_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+    connection.close()
+    assert client.get(f'/api/groups/{group_id}/study_sessions').status_code == 200
+
+    for per_page in (1, 10, 100):
+        for sort_by in ('startTime', 'endTime', 'reviewItemsCount'):
+            before = len(synthetic_app.statements)
+            response = client.get(f'/api/groups/{group_id}/study_sessions',
+                                  query_string={'per_page': per_page, 'sort_by': sort_by})
+            assert response.status_code == 200
+            assert len(response.get_json()['study_sessions']) == per_page
+            executed = [sql for sql in synthetic_app.statements[before:] if sqlite3.complete_statement(sql + ';')]
+            assert len(executed) == 2
+
+def test_session_summary_matches_reviews(synthetic_app):
+    """
+    Test that the persisted session summary agrees with the session's review items, also after new reviews
+    """
+    import sqlite3
+
+    client = synthetic_app.test_client()
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    session_id, word_id = connection.execute('SELECT study_session_id, word_id FROM word_review_items LIMIT 1').fetchone()
+
+    response = client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': [
+        {'word_id': word_id, 'is_correct': True},
+        {'word_id': word_id, 'is_correct': False},
+    ]})
+    assert response.status_code == 200
+
+    mismatched = connection.execute('''
+        SELECT COUNT(*)
+        FROM study_sessions s
+        LEFT JOIN (
+            SELECT study_session_id, COUNT(*) as reviews, SUM(correct) as correct, MAX(created_at) as last_at
+            FROM word_review_items
+            GROUP BY study_session_id
+        ) agg ON agg.study_session_id = s.id
+        WHERE s.review_count != COALESCE(agg.reviews, 0)
+           OR s.correct_count != COALESCE(agg.correct, 0)
+           OR s.last_activity_at IS NOT agg.last_at
+    ''').fetchone()[0]
+    connection.close()
+    assert mismatched == 0
+
+def test_get_groups_cursor_pagination():
+    """
+    Test that group listings expose a next_cursor
+    """
+    response = requests.get(f'{BASE_URL}/groups')
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert 'next_cursor' in data
+
+def test_get_group_words_cursor_pagination(valid_group_id):
+    """
+    Test that following next_cursor returns the same words as the next page
+    """
+    params = {'sort_by': 'italian', 'order': 'asc'}
+    first_page = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words', params=params).json()
+    assert 'next_cursor' in first_page
+    if first_page['next_cursor'] is None:
+        pytest.skip('Not enough words for a second page')
+
+    response = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words',
+                            params={'cursor': first_page['next_cursor']})
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert 'words' in data
+    assert 'next_cursor' in data
+
+    second_page = requests.get(f'{BASE_URL}/groups/{valid_group_id}/words', params=dict(params, page=2)).json()
+    assert [word['id'] for word in data['words']] == [word['id'] for word in second_page['words']]
+
+def test_get_groups_not_modified():
+    """
+    Test that a request with the current ETag gets 304 Not Modified
+    """
+    response = requests.get(f'{BASE_URL}/groups')
+    etag = response.headers['ETag']
+
+    cached = requests.get(f'{BASE_URL}/groups', headers={'If-None-Match': etag})
+
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.content == b''
+
+def test_etag_changes_only_for_written_tables(valid_group_id, valid_study_activity_id):
+    """
+    Test that a write changes the ETags of routes reading the written tables only
+    """
+    groups_etag = requests.get(f'{BASE_URL}/groups').headers['ETag']
+    sessions_etag = requests.get(f'{BASE_URL}/study-sessions').headers['ETag']
+
+    requests.post(f'{BASE_URL}/study-sessions', json={
+        'group_id': valid_group_id,
+        'study_activity_id': valid_study_activity_id
+    })
+
+    assert requests.get(f'{BASE_URL}/groups', headers={'If-None-Match': groups_etag}).status_code == 304
+    sessions = requests.get(f'{BASE_URL}/study-sessions', headers={'If-None-Match': sessions_etag})
+    assert sessions.status_code == 200
+    assert sessions.headers['ETag'] != sessions_etag
+
+def test_not_modified_and_cached_responses_run_no_sql(synthetic_app):
+    """
+    Test that 304s and response-cache hits are answered without executing SQL
+    """
+    from lib.http_cache import ResponseCache
+
+    synthetic_app.response_cache = ResponseCache(16)
+    client = synthetic_app.test_client()
+
+    first = client.get('/api/groups/1/words/raw')
+    assert first.status_code == 200
+    statements = len(synthetic_app.statements)
+
+    not_modified = client.get('/api/groups/1/words/raw', headers={'If-None-Match': first.headers['ETag']})
+    cached = client.get('/api/groups/1/words/raw')
+
+    assert not_modified.status_code == 304
+    assert cached.status_code == 200
+    assert cached.get_data() == first.get_data()
+    assert len(synthetic_app.statements) == statements
+    assert synthetic_app.response_cache.hits == 1
+
+def test_get_group_due_words(valid_group_id):
+    """
+    Test that the due queue returns up to limit words with their schedule
+    """
+    response = requests.get(f'{BASE_URL}/groups/{valid_group_id}/due', params={'limit': 5})
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data['group_id'] == valid_group_id
+    assert 0 < len(data['words']) <= 5
+    for word in data['words']:
+        assert all(key in word for key in ['id', 'english', 'italian', 'repetitions', 'interval_days', 'ease', 'due_at'])
+
+def test_get_nonexistent_group_due_words():
+    """
+    Test the due queue of a group that does not exist
+    """
+    response = requests.get(f'{BASE_URL}/groups/99999/due')
+
+    assert response.status_code == 404
+
+def group_words_count(app, group_id):
+    import sqlite3
+    connection = sqlite3.connect(app.config['DATABASE'])
+    try:
+        return connection.execute('SELECT COUNT(*) FROM word_groups WHERE group_id = ?', (group_id,)).fetchone()[0]
+    finally:
+        connection.close()
+
+def test_group_membership_changes_keep_words_count(synthetic_app):
+    """
+    Test that adding, moving and removing words keeps groups.words_count equal to the group's rows
+    """
+    client = synthetic_app.test_client()
+    before = group_words_count(synthetic_app, 3)
+    members = client.get('/api/groups/3/words/raw', query_string={'fields': 'id'}).get_json()['words'][:2]
+    word_ids = [member['id'] for member in members] + [2, 5, 2, 99999999]
+
+    added = client.post('/api/groups/3/words', json={'word_ids': word_ids}).get_json()
+    assert added['added'] == 2 and added['missing'] == [99999999]
+    assert added['words_count'] == group_words_count(synthetic_app, 3) == before + 2
+    assert client.post('/api/groups/3/words', json={'word_ids': word_ids}).get_json()['added'] == 0
+
+    # Word 2 is in group 2 already: its row in group 3 is dropped rather than duplicated
+    target_before = group_words_count(synthetic_app, 2)
+    moved = client.post('/api/groups/3/words/move', json={'word_ids': [2, 5, 7], 'to_group_id': 2}).get_json()
+    assert (moved['moved'], moved['already_in_target'], moved['missing']) == (2, 1, [7])
+    assert moved['words_count'] == group_words_count(synthetic_app, 3) == before
+    assert moved['to_words_count'] == group_words_count(synthetic_app, 2) == target_before + 1
+
+    removed = client.delete('/api/groups/2/words', json={'word_ids': [5, 7]}).get_json()
+    assert (removed['removed'], removed['missing']) == (1, [7])
+    assert removed['words_count'] == group_words_count(synthetic_app, 2) == target_before
+    assert client.get('/api/groups/2').get_json()['word_count'] == target_before
+
+@pytest.mark.parametrize('method,url,body,status', [
+    ('POST', '/api/groups/3/words', {'ids': [1]}, 400),
+    ('POST', '/api/groups/3/words', {'word_ids': [1, 'x']}, 400),
+    ('DELETE', '/api/groups/3/words', {'word_ids': []}, 400),
+    ('POST', '/api/groups/99999/words', {'word_ids': [1]}, 404),
+    ('POST', '/api/groups/3/words/move', {'word_ids': [1]}, 400),
+    ('POST', '/api/groups/3/words/move', {'word_ids': [1], 'to_group_id': 3}, 400),
+    ('POST', '/api/groups/3/words/move', {'word_ids': [1], 'to_group_id': 99999}, 404),
+])
+def test_group_membership_errors(synthetic_app, method, url, body, status):
+    """
+    Test that malformed membership requests and unknown groups are rejected without writing
+    """
+    before = group_words_count(synthetic_app, 3)
+    response = synthetic_app.test_client().open(url, method=method, json=body)
+
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+    assert group_words_count(synthetic_app, 3) == before
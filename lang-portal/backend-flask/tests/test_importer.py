@@ -0,0 +1,72 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from lib.db import Db
+from lib.importer import import_words
+
+@pytest.fixture
+def empty_db(tmp_path):
+    # A fresh database with the schema but no words
+    database = Db(database=str(tmp_path / 'import.db'))
+    app = Flask(__name__)
+    with app.app_context():
+        database.setup_tables(database.cursor())
+        database.close()
+    yield database
+    database.close_all()
+
+def run_import(database, path, group_name, **kwargs):
+    app = Flask(__name__)
+    with app.app_context():
+        stats = import_words(database.get(), str(path), group_name, **kwargs)
+        database.close()
+    return stats
+
+def test_import_words_all_formats(empty_db, tmp_path):
+    """
+    Test that JSON, NDJSON and CSV files import the same words
+    """
+    words = [{'english': f'word {i}', 'italian': f'parola {i}'} for i in range(25)]
+    (tmp_path / 'words.json').write_text(json.dumps(words, indent=2))
+    (tmp_path / 'words.ndjson').write_text('\n'.join(json.dumps(word) for word in words) + '\n')
+    with open(tmp_path / 'words.csv', 'w', newline='') as file:
+        writer = csv.DictWriter(file, ['english', 'italian'])
+        writer.writeheader()
+        writer.writerows(words)
+
+    for name in ['words.json', 'words.ndjson', 'words.csv']:
+        stats = run_import(empty_db, tmp_path / name, name, chunk_size=10)
+        assert stats['rows'] == 25
+        assert stats['memberships_added'] == 25
+
+    connection = sqlite3.connect(empty_db.database)
+    assert connection.execute('SELECT COUNT(*) FROM words').fetchone()[0] == 25
+    assert connection.execute('SELECT words_count FROM groups ORDER BY id').fetchall() == [(25,), (25,), (25,)]
+    connection.close()
+
+def test_import_words_deduplicates(empty_db, tmp_path):
+    """
+    Test that repeated and already imported words are not inserted again
+    """
+    words = [{'english': f'word {i % 30}', 'italian': f'parola {i % 30}'} for i in range(100)]
+    words.append({'english': 'missing italian'})
+    path = tmp_path / 'words.ndjson'
+    path.write_text('\n'.join(json.dumps(word) for word in words))
+
+    first = run_import(empty_db, path, 'Dictionary', chunk_size=7)
+    second = run_import(empty_db, path, 'Dictionary', chunk_size=7)
+
+    assert (first['words_added'], first['duplicates'], first['skipped']) == (30, 70, 1)
+    assert (second['words_added'], second['memberships_added']) == (0, 0)
+
+    connection = sqlite3.connect(empty_db.database)
+    assert connection.execute('SELECT COUNT(*) FROM words').fetchone()[0] == 30
+    assert connection.execute('SELECT COUNT(*) FROM word_groups').fetchone()[0] == 30
+    assert connection.execute("SELECT words_count FROM groups WHERE name = 'Dictionary'").fetchone()[0] == 30
+    assert connection.execute('SELECT COUNT(*) FROM word_reviews').fetchone()[0] == 30
+    assert connection.execute('SELECT vocabulary_count FROM study_stats').fetchone()[0] == 30
+    connection.close()
@@ -0,0 +1,78 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from lib.integrity import check_counters, fix_counters
+from lib.partitions import expire_review_items
+
+@pytest.fixture
+def database(synthetic_db, tmp_path):
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    connection = sqlite3.connect(path)
+    yield connection
+    connection.close()
+
+def test_counters_match_after_writes(database):
+    """
+    Test that the counter caches of a database written through the triggers and write paths all check out
+    """
+    database.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, 5)')
+    database.execute('DELETE FROM word_groups WHERE group_id = 6 AND word_id IN (6, 26)')
+    database.execute('UPDATE word_groups SET group_id = 8 WHERE group_id = 7 AND word_id = 7')
+
+    assert check_counters(database.cursor()) == []
+
+def test_drifted_counters_are_reported_and_fixed(database):
+    """
+    Test that counters out of step with their rows are reported with both values, then recounted
+    """
+    database.execute('UPDATE groups SET words_count = words_count + 3 WHERE id = 2')
+    database.execute('UPDATE study_stats SET reviews_count = reviews_count - 1 WHERE id = 1')
+    database.execute('UPDATE study_sessions SET correct_count = correct_count + 1 WHERE id = 10')
+    cursor = database.cursor()
+
+    mismatches = check_counters(cursor)
+
+    assert {(mismatch['check'], mismatch['id'], mismatch['column']) for mismatch in mismatches} == {
+        ('groups.words_count', 2, 'words_count'),
+        ('study_stats', 1, 'reviews_count'),
+        ('study_sessions', 10, 'correct_count'),
+    }
+    group = next(mismatch for mismatch in mismatches if mismatch['check'] == 'groups.words_count')
+    assert group['stored'] == group['actual'] + 3
+
+    fix_counters(cursor, mismatches)
+    database.commit()
+    assert check_counters(cursor) == []
+
+def test_counters_check_out_after_reviews_expire(database):
+    """
+    Test that expired reviews still count towards their sessions, and fixing a drift keeps the counters of expired reviews
+    """
+    cursor = database.cursor()
+    assert expire_review_items(cursor, 1)
+    database.commit()
+    assert check_counters(cursor) == []
+
+    stats = database.execute('SELECT reviews_count, correct_count, words_studied FROM study_stats').fetchone()
+    session = database.execute('''
+        SELECT id, review_count, correct_count FROM study_sessions
+        WHERE id IN (SELECT study_session_id FROM expired_session_reviews)
+        ORDER BY id LIMIT 1
+    ''').fetchone()
+    database.execute('UPDATE study_stats SET sessions_count = sessions_count + 1 WHERE id = 1')
+    database.execute('UPDATE study_sessions SET review_count = 0, correct_count = 0 WHERE id = ?', (session[0],))
+
+    mismatches = check_counters(cursor)
+    assert {(mismatch['check'], mismatch['column']) for mismatch in mismatches} == {
+        ('study_stats', 'sessions_count'), ('study_sessions', 'review_count'), ('study_sessions', 'correct_count'),
+    }
+
+    fix_counters(cursor, mismatches)
+    database.commit()
+    assert check_counters(cursor) == []
+    assert database.execute('SELECT reviews_count, correct_count, words_studied FROM study_stats').fetchone() == stats
+    assert database.execute('SELECT id, review_count, correct_count FROM study_sessions WHERE id = ?',
+                            (session[0],)).fetchone() == session
@@ -0,0 +1,66 @@
+import logging
+import re
+
+from lib.metrics import normalize_sql
+
+def scrape(client):
+    """Parse /metrics into {(name, labels text): value}."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            match = re.match(r'^(\w+)(\{.*\})? (\S+)$', line)
+            samples[(match.group(1), match.group(2) or '')] = float(match.group(3))
+    return samples
+
+def test_normalize_sql():
+    """
+    Test that comments, literals, IN lists and whitespace are collapsed
+    """
+    sql = '''
+        -- recent reviews
+        SELECT id, 'x' FROM word_review_items
+        WHERE created_at >= '2025-01-01' AND correct = 1 AND word_id IN (?, ?, ?)
+        LIMIT 10
+    '''
+    assert normalize_sql(sql) == (
+        "SELECT id, ? FROM word_review_items WHERE created_at >= ? AND correct = ? AND word_id IN (?, ...) LIMIT ?")
+    assert normalize_sql('SELECT * FROM t2 WHERE x = -1.5') == 'SELECT * FROM t2 WHERE x = ?'
+
+def test_metrics_record_routes_and_statements(synthetic_app):
+    """
+    Test that /metrics reports latency and statement counts per route rule, and time and rows per statement
+    """
+    client = synthetic_app.test_client()
+    for group_id in (1, 2, 3):
+        assert client.get(f'/api/groups/{group_id}/study_sessions', query_string={'per_page': 5}).status_code == 200
+    assert client.get('/api/words/99999999').status_code == 404
+
+    samples = scrape(client)
+    route = '{method="GET",route="/api/groups/<int:id>/study_sessions"}'
+    assert samples[('http_request_duration_seconds_count', route)] == 3
+    assert samples[('http_request_sql_statements_count', route)] == 3
+    assert samples[('http_request_sql_statements_sum', route)] == 6
+    assert samples[('http_requests_total', '{method="GET",route="/api/words/<int:word_id>",status="404"}')] == 1
+
+    assert samples[('sql_statement_duration_seconds_count', '{statement="groups/sessions_page"}')] == 3
+    assert samples[('sql_statement_rows_total', '{statement="groups/sessions_page"}')] == 15
+    assert samples[('sql_statement_duration_seconds_bucket', '{statement="groups/sessions_page",le="+Inf"}')] == 3
+
+def test_slow_queries_are_logged_normalized(synthetic_app, caplog):
+    """
+    Test that statements over the threshold are logged with their normalized SQL and counted
+    """
+    synthetic_app.metrics.slow_query_seconds = 0
+    client = synthetic_app.test_client()
+
+    with caplog.at_level(logging.WARNING, logger='slow_query'):
+        assert client.get('/api/study-activities/1/sessions').status_code == 200
+
+    messages = [record.getMessage() for record in caplog.records if record.name == 'slow_query']
+    assert any('FROM study_sessions ss JOIN groups g ON g.id = ss.group_id WHERE ss.study_activity_id = ?' in message
+               for message in messages)
+    assert all('\n' not in message for message in messages)
+    assert any(name == 'sql_slow_statements_total' for name, _ in scrape(client))
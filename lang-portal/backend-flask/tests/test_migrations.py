@@ -0,0 +1,400 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from lib.migrations import MigrationError, mark_applied, migrate, setup_schema_version
+from lib.partitions import PARTITION_PREFIX, partitions
+
+# The schema words.db had before any migration (the first sql/setup)
+BASELINE_SCHEMA = '''
+CREATE TABLE words (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  english TEXT NOT NULL,
+  italian TEXT NOT NULL
+);
+CREATE TABLE word_reviews (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  word_id INTEGER NOT NULL,
+  correct_count INTEGER DEFAULT 0,
+  wrong_count INTEGER DEFAULT 0,
+  last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+CREATE TABLE word_review_items (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  word_id INTEGER NOT NULL,
+  study_session_id INTEGER NOT NULL,
+  correct BOOLEAN NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (word_id) REFERENCES words(id),
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+CREATE TABLE groups (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL,
+  words_count INTEGER DEFAULT 0
+);
+CREATE TABLE word_groups (
+  word_id INTEGER NOT NULL,
+  group_id INTEGER NOT NULL,
+  FOREIGN KEY (word_id) REFERENCES words(id),
+  FOREIGN KEY (group_id) REFERENCES groups(id)
+);
+CREATE TABLE study_activities (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL,
+  url TEXT NOT NULL,
+  preview_url TEXT
+);
+CREATE TABLE study_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  group_id INTEGER NOT NULL,
+  study_activity_id INTEGER NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (group_id) REFERENCES groups(id),
+  FOREIGN KEY (study_activity_id) REFERENCES study_activities(id)
+);
+'''
+
+@pytest.fixture
+def database(synthetic_db, tmp_path):
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    connection = sqlite3.connect(path)
+    # The synthetic database is up to date with sql/migrations; these tests bring their own
+    connection.execute('DELETE FROM schema_version')
+    connection.commit()
+    yield connection
+    connection.close()
+
+def partition_weights(database):
+    # The view lists the partitions' original columns only
+    return [row for table in partitions(database.cursor())
+            for row in database.execute(f'SELECT weight FROM {table}').fetchall()]
+
+def write_migration(directory, filename, sql):
+    directory.mkdir(exist_ok=True)
+    (directory / filename).write_text(sql)
+
+def test_migrations_apply_once_in_order(database, tmp_path):
+    """
+    Test that pending migrations are applied in version order, recorded with their checksum, and only once
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0002_tag_words.sql', 'INSERT INTO word_tags (word_id, tag) SELECT id, \'core\' FROM words WHERE id <= 5;')
+    write_migration(migrations, '0001_word_tags.sql', 'CREATE TABLE word_tags (word_id INTEGER NOT NULL, tag TEXT NOT NULL);\n'
+                                                      'CREATE INDEX idx_word_tags_word_id ON word_tags(word_id);')
+    version = database.execute("SELECT version FROM data_versions WHERE table_name = 'database'").fetchone()[0]
+
+    applied = migrate(database, directory=str(migrations))
+
+    assert [migration.version for migration in applied] == [1, 2]
+    assert database.execute('SELECT COUNT(*) FROM word_tags').fetchone()[0] == 5
+    rows = database.execute('SELECT version, name, length(checksum) FROM schema_version ORDER BY version').fetchall()
+    assert rows == [(1, 'word_tags', 64), (2, 'tag_words', 64)]
+    assert database.execute("SELECT version FROM data_versions WHERE table_name = 'database'").fetchone()[0] == version + 2
+    assert migrate(database, directory=str(migrations)) == []
+
+def test_failed_migration_rolls_back(database, tmp_path):
+    """
+    Test that a migration failing part way leaves neither its changes nor a schema_version row
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_broken.sql', 'CREATE TABLE word_tags (word_id INTEGER);\nINSERT INTO no_such_table VALUES (1);')
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(database, directory=str(migrations))
+
+    assert database.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'word_tags'").fetchone()[0] == 0
+    assert database.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == 0
+
+def test_python_migration_runs_in_one_transaction(database, tmp_path):
+    """
+    Test that a Python migration's apply(cursor) is recorded with its changes, and rolled back with them on failure
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_word_tags.py',
+                    'def apply(cursor):\n'
+                    '  cursor.execute("SELECT COUNT(*) FROM words")\n'
+                    '  if cursor.fetchone()[0]:\n'
+                    '    cursor.execute("CREATE TABLE word_tags (word_id INTEGER)")\n')
+    write_migration(migrations, '0002_broken.py',
+                    'def apply(cursor):\n'
+                    '  cursor.execute("CREATE TABLE word_notes (word_id INTEGER)")\n'
+                    '  raise RuntimeError("broken")\n')
+
+    with pytest.raises(RuntimeError, match='broken'):
+        migrate(database, directory=str(migrations))
+
+    assert database.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'word_tags'").fetchone()[0] == 1
+    assert database.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'word_notes'").fetchone()[0] == 0
+    assert database.execute('SELECT version, name FROM schema_version').fetchall() == [(1, 'word_tags')]
+    assert not (migrations / '__pycache__').exists()
+
+def test_python_migration_steps_commit_one_at_a_time(database, tmp_path):
+    """
+    Test that each step of a Python migration's steps(cursor) is committed, and a rerun after a failed step finishes it
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_word_tags.py',
+                    'def steps(cursor):\n'
+                    '  cursor.execute("CREATE TABLE IF NOT EXISTS word_tags (word_id INTEGER PRIMARY KEY)")\n'
+                    '  for word_id in (1, 2, 3):\n'
+                    '    cursor.execute("INSERT OR IGNORE INTO word_tags VALUES (?)", (word_id,))\n'
+                    '    yield word_id\n'
+                    '    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = \'word_notes\'")\n'
+                    '    if word_id == 2 and not cursor.fetchone()[0]:\n'
+                    '      raise RuntimeError("interrupted")\n')
+
+    with pytest.raises(RuntimeError, match='interrupted'):
+        migrate(database, directory=str(migrations))
+    assert database.execute('SELECT word_id FROM word_tags').fetchall() == [(1,), (2,)]
+    assert database.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == 0
+
+    database.execute('CREATE TABLE word_notes (word_id INTEGER)')
+    database.commit()
+    assert [migration.version for migration in migrate(database, directory=str(migrations))] == [1]
+    assert database.execute('SELECT word_id FROM word_tags').fetchall() == [(1,), (2,), (3,)]
+    assert database.execute('SELECT version, name FROM schema_version').fetchall() == [(1, 'word_tags')]
+
+def test_changed_migration_is_an_error(database, tmp_path):
+    """
+    Test that editing an applied migration is refused, as are misnamed files
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_word_tags.sql', 'CREATE TABLE word_tags (word_id INTEGER);')
+    migrate(database, directory=str(migrations))
+
+    write_migration(migrations, '0001_word_tags.sql', 'CREATE TABLE word_tags (word_id INTEGER, tag TEXT);')
+    with pytest.raises(MigrationError, match='changed after it was applied'):
+        migrate(database, directory=str(migrations))
+
+    write_migration(migrations, '0001_word_tags.sql', 'CREATE TABLE word_tags (word_id INTEGER);')
+    write_migration(migrations, 'tags.sql', 'SELECT 1;')
+    with pytest.raises(MigrationError, match='Invalid migration file name'):
+        migrate(database, directory=str(migrations))
+
+def test_backfill_runs_in_batches_over_every_partition(database, tmp_path):
+    """
+    Test that a backfill of the review log touches every partition in bounded batches and reports progress
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_review_weight.backfill.sql',
+                    '-- table: word_review_items\nALTER TABLE {table} ADD COLUMN weight INTEGER NOT NULL DEFAULT 0;')
+    write_migration(migrations, '0002_review_weight_fill.backfill.sql',
+                    '-- table: word_review_items\n'
+                    'UPDATE {table} SET weight = weight + correct + 1 WHERE rowid >= :start AND rowid < :stop;')
+    tables = partitions(database.cursor())
+    assert len(tables) > 1
+    reports = []
+
+    migrate(database, directory=str(migrations), batch_size=1000, progress=reports.append)
+
+    total = database.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0]
+    for table in tables:
+        assert database.execute(f'SELECT COUNT(*) FROM {table} WHERE weight != correct + 1').fetchone()[0] == 0
+    fill = [report for report in reports if report['migration'] == '0002_review_weight_fill']
+    assert fill[-1]['rows'] == total
+    assert fill[-1]['tables_done'] == fill[-1]['tables'] == len(tables)
+    assert fill[-1]['batches'] >= total // 1000
+    assert database.execute('SELECT COUNT(*) FROM schema_backfills').fetchone()[0] == 0
+
+def test_interrupted_backfill_resumes(database, tmp_path):
+    """
+    Test that a backfill stopped between batches resumes where it was, updating each row exactly once
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_review_weight.backfill.sql',
+                    '-- table: word_review_items\nALTER TABLE {table} ADD COLUMN weight INTEGER NOT NULL DEFAULT 0;')
+    write_migration(migrations, '0002_review_weight_fill.backfill.sql',
+                    '-- table: word_review_items\nUPDATE {table} SET weight = weight + 1 WHERE rowid >= :start AND rowid < :stop;')
+
+    def interrupt(stats):
+        if stats['migration'] == '0002_review_weight_fill' and stats['batches'] == 5:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        migrate(database, directory=str(migrations), batch_size=500, progress=interrupt)
+    assert [row[0] for row in database.execute('SELECT version FROM schema_version')] == [1]
+    assert 0 < partition_weights(database).count((1,)) < len(partition_weights(database))
+
+    assert [migration.version for migration in migrate(database, directory=str(migrations), batch_size=500)] == [2]
+    assert set(partition_weights(database)) == {(1,)}
+
+def test_mark_applied_skips_migrations_for_a_new_database(database, tmp_path):
+    """
+    Test that migrations marked applied (a database created with the latest schema) are not run
+    """
+    migrations = tmp_path / 'migrations'
+    write_migration(migrations, '0001_word_tags.sql', 'CREATE TABLE word_tags (word_id INTEGER);')
+    cursor = database.cursor()
+    setup_schema_version(cursor)
+    mark_applied(cursor, directory=str(migrations))
+    database.commit()
+
+    assert migrate(database, directory=str(migrations)) == []
+    assert database.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'word_tags'").fetchone()[0] == 0
+
+def test_word_groups_migration_upgrades_an_old_database(database):
+    """
+    Test that 0008 removes duplicate memberships, adds the unique index and recounts words_count for the triggers to keep
+    """
+    from lib.integrity import check_group_counts
+    mark_applied(database.cursor())
+    database.execute('DELETE FROM schema_version WHERE version = 8')
+    # The schema before it: no unique index or words_count triggers, and a duplicated membership
+    for trigger in ('insert', 'delete', 'update'):
+        database.execute(f'DROP TRIGGER word_groups_after_{trigger}_words_count')
+    database.execute('DROP INDEX idx_word_groups_word_id_group_id')
+    database.execute('CREATE INDEX idx_word_groups_word_id ON word_groups(word_id)')
+    database.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, 1)')
+    database.commit()
+    assert check_group_counts(database.cursor()) != []
+
+    assert [migration.version for migration in migrate(database)] == [8]
+
+    assert database.execute('SELECT COUNT(*) FROM word_groups WHERE word_id = 1 AND group_id = 1').fetchone()[0] == 1
+    assert check_group_counts(database.cursor()) == []
+    with pytest.raises(sqlite3.IntegrityError):
+        database.execute('INSERT INTO word_groups (word_id, group_id) VALUES (1, 1)')
+    database.execute('DELETE FROM word_groups WHERE word_id = 1 AND group_id = 1')
+    assert check_group_counts(database.cursor()) == []
+
+def test_word_reviews_schedule_migration_upgrades_an_old_database(database):
+    """
+    Test that 0003 adds the schedule columns to word_reviews and 0004 makes every reviewed word due after its last review
+    """
+    mark_applied(database.cursor())
+    database.execute('DELETE FROM schema_version WHERE version IN (3, 4)')
+    # The schema before it: counters only
+    database.execute('DROP TRIGGER word_reviews_after_update_due_at_word_groups')
+    database.execute('DROP TRIGGER word_groups_after_insert_due_at')
+    for column in ('repetitions', 'interval_days', 'ease', 'due_at'):
+        database.execute(f'ALTER TABLE word_reviews DROP COLUMN {column}')
+    database.commit()
+
+    assert [migration.version for migration in migrate(database, batch_size=100)] == [3, 4]
+
+    rows = database.execute('SELECT correct_count + wrong_count, last_reviewed, due_at FROM word_reviews').fetchall()
+    assert any(reviews for reviews, _, _ in rows)
+    for reviews, last_reviewed, due_at in rows:
+        if reviews:
+            assert due_at == database.execute("SELECT datetime(?, '+1 day')", (last_reviewed,)).fetchone()[0]
+        else:
+            assert due_at is None
+    assert migrate(database) == []
+
+def test_study_sessions_summary_migration_upgrades_an_old_database(database):
+    """
+    Test that 0005 adds the session summary columns, end_time included, and 0006 fills them in from the review log
+    """
+    from lib.integrity import check_session_counts
+    mark_applied(database.cursor())
+    database.execute('DELETE FROM schema_version WHERE version IN (5, 6)')
+    # The schema before it: no summary
+    for column in ('end_time', 'last_activity_at', 'correct_count', 'review_count'):
+        database.execute(f'ALTER TABLE study_sessions DROP COLUMN {column}')
+    database.commit()
+
+    assert [migration.version for migration in migrate(database, batch_size=50)] == [5, 6]
+
+    assert check_session_counts(database.cursor()) == []
+    rows = database.execute('''
+        SELECT s.created_at, s.last_activity_at, s.end_time, MAX(wri.created_at)
+        FROM study_sessions s LEFT JOIN word_review_items wri ON wri.study_session_id = s.id
+        GROUP BY s.id
+    ''').fetchall()
+    assert any(last_review for _, _, _, last_review in rows)
+    for created_at, last_activity_at, end_time, last_review in rows:
+        assert last_activity_at == last_review
+        assert end_time == (last_review or database.execute("SELECT datetime(?, '+30 minutes')", (created_at,)).fetchone()[0])
+
+def test_word_groups_due_at_migration_upgrades_an_old_database(database):
+    """
+    Test that 0007 adds word_groups.due_at, copies each word's schedule into it and indexes the due queue
+    """
+    mark_applied(database.cursor())
+    database.execute('DELETE FROM schema_version WHERE version = 7')
+    # The schema before it: no copy of the schedule on word_groups
+    database.execute('DROP TRIGGER word_reviews_after_update_due_at_word_groups')
+    database.execute('DROP TRIGGER word_groups_after_insert_due_at')
+    database.execute('DROP INDEX idx_word_groups_group_id_due_at_word_id')
+    database.execute('ALTER TABLE word_groups DROP COLUMN due_at')
+    database.commit()
+
+    assert [migration.version for migration in migrate(database)] == [7]
+
+    rows = database.execute('''
+        SELECT wg.due_at, wr.due_at FROM word_groups wg JOIN word_reviews wr ON wr.word_id = wg.word_id
+    ''').fetchall()
+    assert any(due_at for due_at, _ in rows)
+    assert all(group_due_at == word_due_at for group_due_at, word_due_at in rows)
+    plan = database.execute('''
+        EXPLAIN QUERY PLAN SELECT word_id FROM word_groups WHERE group_id = 1 AND due_at <= '2100-01-01' ORDER BY due_at
+    ''').fetchall()
+    assert 'idx_word_groups_group_id_due_at_word_id' in ' '.join(row[-1] for row in plan)
+
+def schema(connection):
+    # Every table, view, index and trigger with its columns, leaving out the monthly partitions
+    objects = connection.execute('''
+        SELECT type, name FROM sqlite_master
+        WHERE name NOT LIKE 'sqlite_%' AND name NOT LIKE ? AND name NOT LIKE ?
+        ORDER BY type, name
+    ''', (PARTITION_PREFIX + '%', f'idx_{PARTITION_PREFIX}%')).fetchall()
+    return [(kind, name, [row[0] for row in connection.execute('SELECT name FROM pragma_table_xinfo(?)', (name,))])
+            for kind, name in objects]
+
+def test_migrate_upgrades_a_baseline_database(tmp_path):
+    """
+    Test that migrate.py brings a database with the original schema to the latest one, with its aggregates and routes
+    """
+    from app import create_app
+    from lib.db import Db
+    from lib.integrity import check_counters
+    from migrate import run_migrations
+
+    path = tmp_path / 'baseline.db'
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executescript('''
+        INSERT INTO words (english, italian) VALUES ('to be', 'essere'), ('to have', 'avere'), ('to go', 'andare');
+        INSERT INTO groups (name, words_count) VALUES ('Core Verbs', 0);
+        INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1), (3, 1), (1, 1);
+        INSERT INTO study_activities (name, url) VALUES ('Typing Tutor', 'http://localhost:8080');
+        INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+        VALUES (1, 1, '2025-01-20 10:00:00'), (1, 1, '2025-02-03 18:00:00');
+        INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES
+          (1, 1, 1, '2025-01-20 10:01:00'), (2, 1, 0, '2025-01-20 10:02:00'), (1, 2, 1, '2025-02-03 18:01:00');
+    ''')
+    connection.commit()
+    connection.close()
+
+    assert run_migrations(str(path)) == 8
+
+    fresh = sqlite3.connect(tmp_path / 'fresh.db')
+    Db(database=str(tmp_path / 'fresh.db')).setup_tables(fresh.cursor())
+    upgraded = sqlite3.connect(path)
+    assert schema(upgraded) == schema(fresh)
+    assert partitions(upgraded.cursor()) == ['word_review_items_2025_01', 'word_review_items_2025_02']
+    fresh.close()
+
+    # The aggregates agree with the review log, and the reviewed words are scheduled
+    assert check_counters(upgraded.cursor()) == []
+    assert upgraded.execute('SELECT words_count FROM groups').fetchall() == [(3,)]
+    assert upgraded.execute('''
+        SELECT word_id, correct_count, wrong_count, due_at FROM word_reviews ORDER BY word_id
+    ''').fetchall() == [(1, 2, 0, '2025-02-09 18:01:00'), (2, 0, 1, '2025-01-21 10:02:00'), (3, 0, 0, None)]
+    assert upgraded.execute('SELECT SUM(reviews_count) FROM daily_activity').fetchone()[0] == 3
+    upgraded.close()
+
+    Db(database=str(path)).validate_statements()
+    app = create_app({'DATABASE': str(path)})
+    client = app.test_client()
+    assert client.get('/api/study-sessions').status_code == 200
+    assert [word['id'] for word in client.get('/api/groups/1/due').get_json()['words']] == [2, 1, 3]
+    assert client.get('/dashboard/stats').get_json()['total_sessions'] == 2
+    response = client.post('/api/study-sessions/2/review', json={'reviews': [{'word_id': 3, 'is_correct': True}]})
+    assert response.status_code == 200
+    app.db.close_all()
+
+    assert run_migrations(str(path)) == 0
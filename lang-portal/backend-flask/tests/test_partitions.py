@@ -0,0 +1,207 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from lib.partitions import (drop_partitions, expire_review_items, insert_review_items, partition_name, partitions,
+                            partition_review_items, setup_review_items)
+from lib.reviews import TruncatedReviewLog, clear_study_history, rebuild_aggregates
+
+def current_month(offset=0):
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 + offset
+    return partition_name(f'{index // 12:04d}-{index % 12 + 1:02d}')
+
+def review_log(app):
+    connection = sqlite3.connect(app.config['DATABASE'])
+    rows = connection.execute('SELECT id, study_session_id, created_at FROM word_review_items ORDER BY id').fetchall()
+    tables = partitions(connection.cursor())
+    connection.close()
+    return rows, tables
+
+@pytest.fixture
+def partitioned_app(synthetic_db, tmp_path):
+    import shutil
+    from app import create_app
+
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    app = create_app({'DATABASE': str(path), 'DATA_VERSIONS_TTL': 0, 'REVIEW_RETENTION_MONTHS': 2})
+    yield app
+    app.db.close_all()
+
+def test_reviews_are_written_to_their_month(synthetic_app):
+    """
+    Test that back-dated and current reviews land in their months' partitions with ids after every existing one
+    """
+    client = synthetic_app.test_client()
+    before, tables = review_log(synthetic_app)
+    assert len(tables) >= 12
+    assert tables[-1] == current_month()
+
+    response = client.post('/api/study-sessions/reviews', json=[
+        {'session_id': 1, 'word_id': 1, 'is_correct': True, 'created_at': '2021-03-05T10:00:00Z'},
+        {'session_id': 1, 'word_id': 2, 'is_correct': False},
+        {'session_id': 2, 'word_id': 1, 'is_correct': True, 'created_at': '2021-03-06T10:00:00Z'},
+    ])
+    assert response.get_json()['recorded'] == 3
+
+    after, tables = review_log(synthetic_app)
+    assert tables[0] == 'word_review_items_2021_03'
+    new = after[len(before):]
+    assert [row[0] for row in new] == [before[-1][0] + 1, before[-1][0] + 2, before[-1][0] + 3]
+    assert len({row[0] for row in after}) == len(after)
+
+    # Reads through the view see every partition
+    assert client.get('/api/study-sessions/1').get_json()['session']['review_items_count'] > 0
+    exported = client.get('/api/export/review-items', query_string={'from': '2021-03-01', 'to': '2021-03-31'})
+    assert [line.count('"id"') for line in exported.get_data(as_text=True).splitlines()] == [1, 1]
+    full = client.get('/api/export/review-items').get_data(as_text=True).splitlines()
+    assert len(full) == len(after)
+    assert full[0].startswith('{"id": %d,' % new[0][0])
+
+def test_reset_swaps_in_empty_tables(synthetic_app):
+    """
+    Test that the reset leaves one empty partition and an empty sessions table that keep their ids and triggers
+    """
+    client = synthetic_app.test_client()
+    before, _ = review_log(synthetic_app)
+    last_session = max(row[1] for row in before)
+
+    assert client.post('/api/study-sessions/reset').status_code == 200
+    after, tables = review_log(synthetic_app)
+    assert after == []
+    assert tables == [current_month()]
+    stats = client.get('/dashboard/stats').get_json()
+    assert stats['total_sessions'] == 0
+    assert stats['total_words_studied'] == 0
+
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    assert session_id > last_session
+    client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': [{'word_id': 1, 'is_correct': True}]})
+    after, _ = review_log(synthetic_app)
+    assert after[0][0] > before[-1][0]
+    assert client.get('/dashboard/stats').get_json()['total_sessions'] == 1
+
+def test_retention_drops_old_months(partitioned_app):
+    """
+    Test that a new partition applies the retention policy, and the aggregates keep the expired reviews
+    """
+    client = partitioned_app.test_client()
+    stats = client.get('/dashboard/stats').get_json()
+    word = client.get('/api/words/1').get_json()['word']
+    etag = client.get('/api/export/review-items').headers['ETag']
+
+    # A review from before the last two months is refused rather than given a partition to expire
+    response = client.post('/api/study-sessions/reviews', json=[
+        {'session_id': 1, 'word_id': 1, 'is_correct': True, 'created_at': '2021-03-05T10:00:00Z'},
+    ])
+    assert response.get_json()['results'][0]['status'] == 'rejected'
+    assert 'retention window' in response.get_json()['results'][0]['error']
+    assert 'word_review_items_2021_03' not in review_log(partitioned_app)[1]
+    connection = sqlite3.connect(partitioned_app.config['DATABASE'])
+    with pytest.raises(ValueError, match='retention window'):
+        insert_review_items(connection.cursor(), [(1, 1, 1, '2021-03-05 10:00:00')], retention_months=2)
+    connection.close()
+
+    # A review from a month without a partition creates one, which expires everything but the last two months
+    connection = sqlite3.connect(partitioned_app.config['DATABASE'])
+    drop_partitions(connection.cursor(), [current_month()])
+    connection.commit()
+    connection.close()
+    response = client.post('/api/study-sessions/reviews', json=[{'session_id': 1, 'word_id': 1, 'is_correct': True}])
+    assert response.get_json()['recorded'] == 1
+
+    rows, tables = review_log(partitioned_app)
+    assert tables == [current_month(-1), current_month()]
+    assert all(row[2] >= current_month(-1)[-7:].replace('_', '-') for row in rows)
+    assert client.get('/api/export/review-items').headers['ETag'] != etag
+
+    after = client.get('/dashboard/stats').get_json()
+    assert after['total_sessions'] == stats['total_sessions']
+    assert after['total_words_studied'] == stats['total_words_studied']
+    assert client.get('/api/words/1').get_json()['word']['correct_count'] == word['correct_count'] + 1
+
+    connection = sqlite3.connect(partitioned_app.config['DATABASE'])
+    assert expire_review_items(connection.cursor(), 1) == [current_month(-1)]
+    connection.commit()
+    assert partitions(connection.cursor()) == [current_month()]
+    connection.close()
+
+def test_expired_reviews_are_counted_per_session(partitioned_app):
+    """
+    Test that expiry counts the dropped reviews per session, and that the aggregates are no longer rebuilt from the log
+    """
+    connection = sqlite3.connect(partitioned_app.config['DATABASE'])
+    cursor = connection.cursor()
+    assert expire_review_items(cursor, 2)
+    connection.commit()
+
+    # Every session's summary is what is left in the log plus what expired
+    mismatches = connection.execute('''
+        SELECT COUNT(*) FROM study_sessions ss
+        LEFT JOIN (SELECT study_session_id, COUNT(*) AS review_count, SUM(correct) AS correct_count
+                   FROM word_review_items GROUP BY study_session_id) log ON log.study_session_id = ss.id
+        LEFT JOIN expired_session_reviews e ON e.study_session_id = ss.id
+        WHERE ss.review_count != COALESCE(log.review_count, 0) + COALESCE(e.review_count, 0)
+           OR ss.correct_count != COALESCE(log.correct_count, 0) + COALESCE(e.correct_count, 0)
+    ''').fetchone()[0]
+    assert mismatches == 0
+    assert connection.execute('SELECT COUNT(*) FROM expired_session_reviews').fetchone()[0] > 0
+
+    stats = connection.execute('SELECT reviews_count FROM study_stats').fetchone()
+    with pytest.raises(TruncatedReviewLog):
+        rebuild_aggregates(cursor)
+    connection.rollback()
+    assert connection.execute('SELECT reviews_count FROM study_stats').fetchone() == stats
+
+    # The reset empties the log and the expired counts with it
+    clear_study_history(cursor)
+    rebuild_aggregates(cursor)
+    connection.commit()
+    assert connection.execute('SELECT COUNT(*) FROM expired_session_reviews').fetchone()[0] == 0
+    connection.close()
+
+def test_single_table_review_log_is_partitioned():
+    """
+    Test that the migration splits a review log from before partitioning into months, one per step, keeping ids and the sequence
+    """
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE data_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)')
+    connection.execute('''
+        CREATE TABLE word_review_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, word_id INTEGER NOT NULL, study_session_id INTEGER NOT NULL,
+            correct BOOLEAN NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    connection.execute('CREATE INDEX idx_word_review_items_created_at ON word_review_items(created_at)')
+    connection.executemany('INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES (?, ?, ?, ?)', [
+        (1, 1, 1, '2024-12-31 23:59:59'), (2, 1, 0, '2025-01-01 00:00:00'), (3, 2, 1, '2025-01-15 08:00:00'),
+        (4, 2, 1, '2025-01-20 08:00:00'),
+    ])
+    connection.execute('DELETE FROM word_review_items WHERE id = 4')
+    connection.commit()
+
+    cursor = connection.cursor()
+    # Setup leaves it to the migration (sql/migrations/0002_review_items_partitions.py)
+    with pytest.raises(ValueError, match='migrate.py'):
+        setup_review_items(cursor)
+    # One month per step; interrupted after the first, a rerun keeps it and copies the rest
+    steps = partition_review_items(cursor)
+    assert next(steps) == 'word_review_items_2024_12'
+    connection.commit()
+    steps.close()
+    assert connection.execute("SELECT type FROM sqlite_master WHERE name = 'word_review_items'").fetchone() == ('table',)
+    for _ in partition_review_items(cursor):
+        connection.commit()
+    connection.commit()
+    assert partitions(cursor) == ['word_review_items_2024_12', 'word_review_items_2025_01']
+    assert connection.execute('SELECT id, word_id FROM word_review_items ORDER BY id').fetchall() == [(1, 1), (2, 2), (3, 3)]
+    assert connection.execute('SELECT id FROM word_review_items_2024_12').fetchall() == [(1,)]
+
+    # Deleted ids are not handed out again
+    insert_review_items(cursor, [(3, 5, 1, '2025-01-21 08:00:00')])
+    assert connection.execute('SELECT MAX(id) FROM word_review_items').fetchone()[0] == 5
+    assert list(partition_review_items(cursor)) == []
+    setup_review_items(cursor)
+    assert connection.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0] == 4
@@ -0,0 +1,203 @@
+import re
+import sqlite3
+
+import pytest
+
+# Query-plan regression suite.
+#
+# Every route is exercised in-process against a large synthetic database while the
+# SQL it issues is recorded. Each distinct statement is then run through
+# EXPLAIN QUERY PLAN, and the test fails when a statement scans a large table or
+# sorts through a temp B-tree, unless it is listed below with a reason.
+
+# Tables that grow with the vocabulary or the study history
+LARGE_TABLES = {'words', 'word_groups', 'word_reviews', 'study_sessions'}
+
+# word_review_items is a view over monthly partitions (lib/partitions.py). A SCAN of the
+# view walks the rows its partitions produced, so the partitions are checked instead.
+REVIEW_PARTITION = re.compile(r'word_review_items_\d{4}_\d{2}')
+
+# Temp B-tree sorts over a bounded slice of rows (one group, one word, one session,
+# a date window) that no index can order. Keys are fragments of the normalized SQL.
+BOUNDED_SORTS = {
+    'WHERE wg.group_id = ': "orders or de-duplicates one group's words",
+    'WHERE s.group_id = ': "orders one group's sessions by a computed column",
+    'WHERE wri.study_session_id = ': "groups and orders one session's reviews",
+    "FROM daily_group_activity WHERE activity_date >= date('now', '-30 days')": 'distinct groups among the last 30 days of activity',
+    'FROM words_fts WHERE words_fts MATCH ': 'orders the page of ranked full-text matches',
+    'FROM main.sqlite_master WHERE ': 'orders schema entries (review partitions, a table being swapped for an empty one)',
+}
+
+# Exports without a date range read the whole table by design
+FULL_EXPORTS = {
+    'FROM words w JOIN word_reviews r ON r.word_id = w.id ORDER BY w.id': 'exports every word',
+    'FROM study_sessions ss JOIN groups g ON g.id = ss.group_id JOIN study_activities sa ON sa.id = ss.study_activity_id ORDER BY': 'exports every session',
+    'study_session_id, correct, created_at FROM word_review_items_': 'exports every review, a partition at a time',
+}
+
+# Known full scans. This list should only ever shrink.
+KNOWN_SCANS = {
+    'SELECT COUNT(*) FROM words': 'page-mode total of /api/words; cursor pages skip it',
+    'SELECT COUNT(*) as count FROM study_sessions ss': 'page-mode total of /api/study-sessions; cursor pages skip it',
+}
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+def table_aliases(sql):
+    # Map every table name and alias in FROM/JOIN clauses to its table
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in ('ON', 'WHERE', 'JOIN', 'LEFT', 'INNER', 'GROUP', 'ORDER', 'LIMIT', 'SET'):
+            aliases[alias] = table
+    return aliases
+
+def plan_problems(connection, sql):
+    aliases = table_aliases(sql)
+    # An index walk under a LIMIT stops once the page is filled, so it is not a full scan
+    limited = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) is not None
+    scans, sorts = [], []
+    for row in connection.execute('EXPLAIN QUERY PLAN ' + sql):
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)', detail)
+        table = match and aliases.get(match.group(1), match.group(1))
+        if match and (table in LARGE_TABLES or REVIEW_PARTITION.fullmatch(table)):
+            if not (limited and 'INDEX' in detail):
+                scans.append(detail)
+        if 'USE TEMP B-TREE' in detail:
+            sorts.append(detail)
+    return scans, sorts
+
+def allowed_by(allow_list, sql):
+    return [fragment for fragment in allow_list if fragment in sql]
+
+def exercise_routes(client):
+    """Issue at least one request to every route; the reset runs last as it clears the history."""
+    responses = []
+    def get(url, **params):
+        response = client.get(url, query_string=params)
+        response.get_data()  # Drain streamed responses so their queries run
+        responses.append((url, response))
+        return response.get_json()
+
+    for sort_by in ['english', 'italian', 'correct_count', 'wrong_count']:
+        for order in ['asc', 'desc']:
+            page = get('/api/words', sort_by=sort_by, order=order, page=3)
+            get('/api/words', cursor=page['next_cursor'])
+            page = get('/api/groups/2/words', sort_by=sort_by, order=order, page=3)
+            get('/api/groups/2/words', cursor=page['next_cursor'])
+    for sort_by in ['name', 'words_count']:
+        page = get('/api/groups', sort_by=sort_by, order='desc')
+        get('/api/groups', cursor=page['next_cursor'])
+    get('/api/words/5')
+    get('/api/words', ids='5,17,4000,99999999')
+    responses.append(('/api/words/batch', client.post('/api/words/batch', json={'ids': list(range(1, 20000, 7))})))
+    for q in ['ba', 'chetà', 'ma re', 'b']:
+        get('/api/words/search', q=q)
+    get('/api/groups/2')
+    get('/api/groups/2/words/raw')
+    get('/api/groups/2/words/raw', fields='italian')
+    get('/api/groups/2/due', limit=50)
+    get('/api/groups/2/due', limit=100)
+    for sort_by in ['startTime', 'endTime', 'activityName', 'groupName', 'reviewItemsCount']:
+        get('/api/groups/2/study_sessions', sort_by=sort_by)
+
+    word_ids = list(range(1, 4000, 13))
+    for method, url, body in [('POST', '/api/groups/3/words', {'word_ids': word_ids}),
+                              ('POST', '/api/groups/3/words/move', {'word_ids': word_ids, 'to_group_id': 4}),
+                              ('DELETE', '/api/groups/4/words', {'word_ids': word_ids})]:
+        responses.append((url, client.open(url, method=method, json=body)))
+
+    session = client.post('/api/study-sessions', json={'group_id': 2, 'study_activity_id': 1})
+    responses.append(('/api/study-sessions', session))
+    review = client.post(f"/api/study-sessions/{session.get_json()['session_id']}/review",
+                         json={'reviews': [{'word_id': 3, 'is_correct': True}, {'word_id': 4, 'is_correct': False}]})
+    responses.append(('/api/study-sessions/<id>/review', review))
+    bulk = client.post('/api/study-sessions/reviews', json=[
+        {'session_id': session.get_json()['session_id'], 'word_id': word_id, 'is_correct': word_id % 2 == 0}
+        for word_id in range(1, 200)
+    ])
+    responses.append(('/api/study-sessions/reviews', bulk))
+
+    page = get('/api/study-sessions')
+    get('/api/study-sessions', cursor=page['next_cursor'])
+    get('/api/study-sessions', fields='start_time,review_items_count', cursor=page['next_cursor'])
+    get('/api/study-sessions/10')
+    get('/dashboard/recent-session')
+    get('/dashboard/stats')
+    get('/dashboard/history', days=30)
+    get('/api/study-activities')
+    get('/api/study-activities/1')
+    get('/api/study-activities/1/sessions')
+    get('/api/study-activities/1/launch')
+    for url in ['/api/export/words', '/api/export/groups/2/words', '/api/export/study-sessions',
+                '/api/export/review-items']:
+        get(url, format='csv')
+        get(url, **{'from': '2025-01-01', 'to': '2025-01-31'})
+
+    responses.append(('/metrics', client.get('/metrics')))
+
+    reset = client.post('/api/study-sessions/reset')
+    responses.append(('/api/study-sessions/reset', reset))
+    return responses
+
+@pytest.fixture
+def route_statements(synthetic_app):
+    responses = exercise_routes(synthetic_app.test_client())
+    for url, response in responses:
+        assert response.status_code < 400, (url, response.get_json())
+
+    statements = {}
+    for sql in synthetic_app.statements:
+        # Statements run inside SQLite (triggers, FTS5 shadow tables) are traced as comments
+        if not sqlite3.complete_statement(sql + ';'):
+            continue
+        normalized = normalize(sql)
+        if normalized.split(' ', 1)[0].upper() in ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'INSERT', 'CREATE', 'DROP'):
+            continue
+        statements.setdefault(normalized, sql)
+    return synthetic_app, statements
+
+def test_every_route_is_exercised(synthetic_app):
+    """
+    Test that the plan suite issues a request to every registered route
+    """
+    client = synthetic_app.test_client()
+    adapter = synthetic_app.url_map.bind('localhost')
+    exercised = set()
+    for url, response in exercise_routes(client):
+        path = response.request.path
+        exercised.add(adapter.match(path, method=response.request.method)[0])
+
+    routes = {rule.endpoint for rule in synthetic_app.url_map.iter_rules() if rule.endpoint != 'static'}
+    assert routes - exercised == set()
+
+def test_route_queries_use_indexes(route_statements, synthetic_db):
+    """
+    Test that no route query scans a large table or sorts through a temp B-tree
+    """
+    _, statements = route_statements
+    # Plan against the database as it was before the reset dropped its review partitions
+    connection = sqlite3.connect(synthetic_db)
+
+    problems = []
+    for normalized, sql in statements.items():
+        scans, sorts = plan_problems(connection, sql)
+        if scans and not (allowed_by(KNOWN_SCANS, normalized) or allowed_by(FULL_EXPORTS, normalized)):
+            problems.append(f"full scan {scans}: {normalized}")
+        if sorts and not (allowed_by(BOUNDED_SORTS, normalized) or allowed_by(KNOWN_SCANS, normalized)):
+            problems.append(f"temp B-tree {sorts}: {normalized}")
+    connection.close()
+
+    assert not problems, '\n'.join(problems)
+
+def test_plan_allow_lists_are_current(route_statements):
+    """
+    Test that every allow-list entry still matches a statement the routes issue
+    """
+    _, statements = route_statements
+    stale = [fragment for fragment in list(BOUNDED_SORTS) + list(KNOWN_SCANS) + list(FULL_EXPORTS)
+             if not any(fragment in normalized for normalized in statements)]
+
+    assert stale == []
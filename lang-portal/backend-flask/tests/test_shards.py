@@ -0,0 +1,123 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from lib.shards import copy_study_data
+from lib.versions import bump_versions
+from tests.test_query_plans import exercise_routes
+
+@pytest.fixture
+def shard_app(synthetic_db, tmp_path):
+    # Per-learner mode over a private copy of the synthetic database as the dictionary
+    from app import create_app
+
+    dictionary = tmp_path / 'dictionary.db'
+    shutil.copy(synthetic_db, dictionary)
+    app = create_app({'DATABASE': str(dictionary), 'DB_SHARDS_DIR': str(tmp_path / 'learners'),
+                      'DB_SHARD_CONNECTIONS': 4, 'DATA_VERSIONS_TTL': 0})
+    yield app
+    app.db.close_all()
+
+def as_learner(learner):
+    return {'X-Learner-Id': learner}
+
+def test_learners_have_separate_study_data(shard_app):
+    """
+    Test that one learner's sessions and reviews are invisible to another, and the dictionary is not written
+    """
+    client = shard_app.test_client()
+    dictionary = sqlite3.connect(shard_app.config['DATABASE'])
+    reviews_before = dictionary.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0]
+
+    session = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}, headers=as_learner('ada'))
+    assert session.status_code == 201
+    session_id = session.get_json()['session_id']
+    assert client.post(f'/api/study-sessions/{session_id}/review', headers=as_learner('ada'),
+                       json={'reviews': [{'word_id': 1, 'is_correct': True}, {'word_id': 2, 'is_correct': False}]}).status_code == 200
+
+    ada = client.get('/dashboard/stats', headers=as_learner('ada')).get_json()
+    bob = client.get('/dashboard/stats', headers=as_learner('bob')).get_json()
+    assert ada['total_sessions'] == 1
+    assert bob['total_sessions'] == 0
+    assert client.get('/api/study-sessions', headers=as_learner('bob')).get_json()['items'] == []
+    assert client.get('/api/words/1', headers=as_learner('ada')).get_json()['word']['correct_count'] == 1
+    assert client.get('/api/words/1', headers=as_learner('bob')).get_json()['word']['correct_count'] == 0
+
+    # Shared dictionary: same words and groups for everyone
+    assert (client.get('/api/groups', headers=as_learner('ada')).get_json()
+            == client.get('/api/groups', headers=as_learner('bob')).get_json())
+    assert dictionary.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0] == reviews_before
+    assert {'ada.db', 'bob.db'} <= set(os.listdir(shard_app.config['DB_SHARDS_DIR']))
+    dictionary.close()
+
+def test_learner_from_header_or_path_prefix(shard_app):
+    """
+    Test that /learners/<id>/... and the learner header reach the same shard, and a missing learner is rejected
+    """
+    client = shard_app.test_client()
+    client.post('/learners/ada/api/study-sessions', json={'group_id': 2, 'study_activity_id': 1})
+
+    by_prefix = client.get('/learners/ada/api/study-sessions')
+    by_header = client.get('/api/study-sessions', headers=as_learner('ada'))
+    assert by_prefix.status_code == 200
+    assert by_prefix.get_json() == by_header.get_json()
+    assert len(by_header.get_json()['items']) == 1
+    assert by_prefix.headers['ETag'] == by_header.headers['ETag']
+    assert client.get('/api/study-sessions', headers=as_learner('bob')).headers['ETag'] != by_header.headers['ETag']
+
+    assert client.get('/api/words').status_code == 400
+    assert client.get('/api/words', headers=as_learner('../words')).status_code == 400
+    assert client.get('/metrics').status_code == 200
+
+def test_every_route_runs_on_a_shard(shard_app):
+    """
+    Test that every route works unchanged against a learner shard holding a copied study history
+    """
+    connection = shard_app.db.acquire('ada')
+    copy_study_data(connection, shard_app.config['DATABASE'])
+    sessions = connection.execute('SELECT COUNT(*) FROM study_sessions').fetchone()[0]
+    shard_app.db.release(connection)
+
+    client = shard_app.test_client()
+    assert client.get('/dashboard/stats', headers=as_learner('ada')).get_json()['total_sessions'] == sessions
+    client.environ_base['HTTP_X_LEARNER_ID'] = 'ada'
+    for url, response in exercise_routes(client):
+        if response.request.method != 'GET' and url.startswith('/api/groups/'):
+            # Group memberships are dictionary data, read-only from a shard
+            assert response.status_code == 403, (url, response.get_data()[:200])
+            continue
+        assert response.status_code < 400, (url, response.get_data()[:200])
+
+def test_shard_connections_are_bounded(shard_app):
+    """
+    Test that more learners than DB_SHARD_CONNECTIONS reuse connections least recently used first
+    """
+    client = shard_app.test_client()
+    for learner in ['learner-%d' % index for index in range(10)] * 2:
+        assert client.get('/api/groups/1/due', headers=as_learner(learner)).status_code == 200
+
+    stats = shard_app.db.pool_stats()
+    assert stats['open_connections'] <= 4
+    assert stats['evictions'] >= 16
+    assert stats['in_use'] == 0
+
+def test_dictionary_changes_reach_shards(shard_app):
+    """
+    Test that words and memberships added to the dictionary show up in an existing shard
+    """
+    client = shard_app.test_client()
+    before = client.get('/dashboard/stats', headers=as_learner('ada')).get_json()['total_vocabulary']
+
+    dictionary = sqlite3.connect(shard_app.config['DATABASE'])
+    word_id = dictionary.execute("INSERT INTO words (italian, english) VALUES ('novità', 'news')").lastrowid
+    dictionary.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, 1)', (word_id,))
+    bump_versions(dictionary, 'words', 'word_groups')
+    dictionary.commit()
+    dictionary.close()
+
+    assert client.get('/dashboard/stats', headers=as_learner('ada')).get_json()['total_vocabulary'] == before + 1
+    assert client.get(f'/api/words/{word_id}', headers=as_learner('ada')).status_code == 200
+    members = client.get('/api/groups/1/words/raw', headers=as_learner('ada')).get_json()['words']
+    assert word_id in [word['id'] for word in members]
@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import pytest
+
+from tests.test_query_plans import exercise_routes
+
+@pytest.fixture
+def snapshot_app(synthetic_db, tmp_path):
+    # Snapshots that never go stale by themselves; tests refresh them explicitly
+    from app import create_app
+
+    path = tmp_path / 'synthetic.db'
+    shutil.copy(synthetic_db, path)
+    app = create_app({'DATABASE': str(path), 'DATA_VERSIONS_TTL': 0,
+                      'SNAPSHOT_MAX_AGE': 3600, 'SNAPSHOT_DIR': str(tmp_path / 'snapshots')})
+    os.makedirs(app.config['SNAPSHOT_DIR'])
+    yield app
+    app.snapshots.remove()
+    app.db.close_all()
+
+def test_dashboard_reads_the_snapshot_until_refreshed(snapshot_app):
+    """
+    Test that snapshot routes keep serving the snapshot and its ETag until a refresh, while other routes see writes
+    """
+    client = snapshot_app.test_client()
+    stats = client.get('/dashboard/stats')
+    assert float(stats.headers['X-Snapshot-Age']) >= 0
+    etag = stats.headers['ETag']
+    sessions = stats.get_json()['total_sessions']
+    assert 'X-Snapshot-Age' not in client.get('/api/study-sessions').headers
+
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    assert client.get(f'/api/study-sessions/{session_id}').status_code == 200
+    stale = client.get('/dashboard/stats', headers={'If-None-Match': etag})
+    assert stale.status_code == 304
+    assert 'X-Snapshot-Age' in stale.headers
+    assert client.get('/dashboard/stats').get_json() == stats.get_json()
+
+    snapshot_app.snapshots.refresh()
+    fresh = client.get('/dashboard/stats', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.get_json()['total_sessions'] == sessions + 1
+    assert fresh.headers['ETag'] != etag
+
+    exported = client.get('/api/export/study-sessions')
+    assert 'X-Snapshot-Age' in exported.headers
+    assert len(exported.get_data(as_text=True).splitlines()) == sessions + 1
+
+def test_stale_snapshot_is_copied_only_after_writes(snapshot_app):
+    """
+    Test that a stale snapshot is re-checked on the next request and only copied again when the data versions moved
+    """
+    client = snapshot_app.test_client()
+    snapshots = snapshot_app.snapshots
+    client.get('/dashboard/history')
+    first = snapshots.database
+    assert snapshots.snapshot_stats()['copies'] == 1
+
+    snapshots.max_age = 0
+    client.get('/dashboard/history')
+    assert snapshots.snapshot_stats()['copies'] == 1
+    assert snapshots.database == first
+
+    client.post('/api/study-sessions', json={'group_id': 2, 'study_activity_id': 1})
+    history = client.get('/dashboard/history', query_string={'days': 1}).get_json()['history']
+    assert history[0]['sessions'] >= 1
+    assert snapshots.snapshot_stats()['copies'] == 2
+    assert os.listdir(snapshot_app.config['SNAPSHOT_DIR']) == [os.path.basename(snapshots.database)]
+    assert not os.path.exists(first)
+
+def test_every_route_runs_with_snapshots(snapshot_app):
+    """
+    Test that every route works with the dashboard and exports reading from a snapshot
+    """
+    client = snapshot_app.test_client()
+    for url, response in exercise_routes(client):
+        assert response.status_code < 400, (url, response.get_data()[:200])
+    assert snapshot_app.snapshots.pool_stats()['in_use'] == 0
+    assert snapshot_app.db.pool_stats()['in_use'] == 0
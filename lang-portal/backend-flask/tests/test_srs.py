@@ -0,0 +1,94 @@
+import sqlite3
+
+from lib.reviews import rebuild_aggregates
+from lib.srs import DEFAULT_EASE, MAX_INTERVAL_DAYS, MIN_EASE, NEW_STATE, due_at, schedule
+
+def test_schedule_follows_sm2():
+    """
+    Test the SM-2 intervals for a run of correct answers, a lapse and the ease floor
+    """
+    state = NEW_STATE
+    intervals = []
+    for _ in range(4):
+        state = schedule(state, True)
+        intervals.append(state[1])
+    assert intervals == [1.0, 6.0, 15.0, 38.0]
+    assert state[0] == 4 and state[2] == DEFAULT_EASE
+
+    state = schedule(state, False)
+    assert state[:2] == (0, 1.0)
+    assert state[2] < DEFAULT_EASE
+
+    for _ in range(20):
+        state = schedule(state, False)
+    assert state[2] == MIN_EASE
+
+    # A long run of correct answers stops at the maximum interval
+    state = NEW_STATE
+    for _ in range(40):
+        state = schedule(state, True)
+    assert state[1] == MAX_INTERVAL_DAYS
+    assert due_at('2025-01-01 10:00:00', state[1]).startswith('2124-')
+
+def test_due_queue_follows_reviews(synthetic_app):
+    """
+    Test that reviews reschedule words, the due queue orders them, and a rebuild replays the same schedule
+    """
+    client = synthetic_app.test_client()
+    client.post('/api/study-sessions/reset')
+    session_id = client.post('/api/study-sessions', json={'group_id': 3, 'study_activity_id': 1}).get_json()['session_id']
+    words = [word['id'] for word in client.get('/api/groups/3/due', query_string={'limit': 3}).get_json()['words']]
+    assert len(words) == 3
+
+    # One word answered wrong long ago is overdue; one answered right is due tomorrow
+    response = client.post('/api/study-sessions/reviews', json=[
+        {'session_id': session_id, 'word_id': words[0], 'is_correct': False, 'created_at': '2020-01-01T10:00:00Z'},
+        {'session_id': session_id, 'word_id': words[1], 'is_correct': True},
+    ])
+    assert response.get_json()['recorded'] == 2
+
+    due = client.get('/api/groups/3/due', query_string={'limit': 3}).get_json()['words']
+    assert due[0]['id'] == words[0]
+    assert due[0]['due_at'] == '2020-01-02 10:00:00'
+    assert words[1] not in [word['id'] for word in due]
+    assert all(word['due_at'] is None for word in due[1:])
+
+    # The copy on word_groups matches word_reviews, and a rebuild reproduces the schedule
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    def schedules():
+        return connection.execute('''
+            SELECT wr.word_id, wr.repetitions, wr.interval_days, wr.ease, wr.due_at, wg.due_at
+            FROM word_reviews wr JOIN word_groups wg ON wg.word_id = wr.word_id
+            WHERE wr.due_at IS NOT NULL OR wg.due_at IS NOT NULL
+            ORDER BY wr.word_id, wg.group_id
+        ''').fetchall()
+    before = schedules()
+    assert len(before) >= 2 and all(row[4] == row[5] for row in before)
+
+    rebuild_aggregates(connection.cursor())
+    connection.commit()
+    assert schedules() == before
+    connection.close()
+
+def test_back_dated_reviews_do_not_rewind_the_schedule(synthetic_app):
+    """
+    Test that ingesting reviews older than a word's last review schedules it from that last review
+    """
+    client = synthetic_app.test_client()
+    client.post('/api/study-sessions/reset')
+    session_id = client.post('/api/study-sessions', json={'group_id': 3, 'study_activity_id': 1}).get_json()['session_id']
+    word_id = client.get('/api/groups/3/due', query_string={'limit': 1}).get_json()['words'][0]['id']
+
+    client.post('/api/study-sessions/reviews', json=[
+        {'session_id': session_id, 'word_id': word_id, 'is_correct': True, 'created_at': '2024-06-01T10:00:00Z'},
+    ])
+    client.post('/api/study-sessions/reviews', json=[
+        {'session_id': session_id, 'word_id': word_id, 'is_correct': False, 'created_at': '2024-05-01T10:00:00Z'},
+    ])
+
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    row = connection.execute('SELECT last_reviewed, interval_days, due_at FROM word_reviews WHERE word_id = ?',
+                             (word_id,)).fetchone()
+    connection.close()
+    assert row[0] == '2024-06-01 10:00:00'
+    assert row[2] == due_at(row[0], row[1]) == '2024-06-02 10:00:00'
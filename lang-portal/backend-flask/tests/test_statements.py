@@ -0,0 +1,62 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from lib.db import Db
+from lib.statements import SQL_DIRECTORY, SORTED, Statements, UnknownStatement
+
+def test_every_statement_prepares(synthetic_db):
+    """
+    Test that every named query and sort variant is valid SQL against the schema
+    """
+    connection = sqlite3.connect(synthetic_db)
+    Statements().validate(connection)
+    connection.close()
+
+def test_startup_validation_rejects_an_invalid_statement(synthetic_db, tmp_path):
+    """
+    Test that validating the statements at startup fails on one that does not prepare, and on a missing database
+    """
+    directory = tmp_path / 'sql'
+    shutil.copytree(SQL_DIRECTORY, directory)
+    (directory / 'words' / 'broken.sql').write_text('SELECT no_such_column FROM words WHERE id = ?')
+
+    Db(database=synthetic_db).validate_statements()
+    with pytest.raises(ValueError, match='words/broken'):
+        Db(database=synthetic_db, statements=Statements(str(directory))).validate_statements()
+    with pytest.raises(sqlite3.OperationalError):
+        Db(database=str(tmp_path / 'missing.db')).validate_statements()
+    assert not (tmp_path / 'missing.db').exists()
+
+def test_sort_variants_are_precomputed():
+    """
+    Test that each sort key and order maps to one constant string, and unknown ones are rejected
+    """
+    statements = Statements()
+    for name, spec in SORTED.items():
+        for sort_by in spec['keys']:
+            assert statements.get(name, sort_by=sort_by, order='asc') is statements.get(name, sort_by=sort_by, order='asc')
+            assert statements.get(name, sort_by=sort_by, order='asc') != statements.get(name, sort_by=sort_by, order='desc')
+
+    with pytest.raises(UnknownStatement):
+        statements.get('words/page', sort_by='english; DROP TABLE words', order='asc')
+    with pytest.raises(UnknownStatement):
+        statements.get('words/page', sort_by='english', order='sideways')
+
+def test_repeated_requests_reuse_statements(synthetic_app):
+    """
+    Test that repeating a request only runs statements the connection has already prepared
+    """
+    client = synthetic_app.test_client()
+    for sort_by in ('english', 'italian', 'correct_count'):
+        assert client.get('/api/words', query_string={'sort_by': sort_by, 'order': 'desc'}).status_code == 200
+    first = synthetic_app.db.statement_stats()
+
+    for _ in range(5):
+        for sort_by in ('english', 'italian', 'correct_count'):
+            assert client.get('/api/words', query_string={'sort_by': sort_by, 'order': 'desc', 'page': 2}).status_code == 200
+    stats = synthetic_app.db.statement_stats()
+
+    assert stats['estimated_misses'] == first['estimated_misses']
+    assert stats['estimated_hits'] - first['estimated_hits'] == 30
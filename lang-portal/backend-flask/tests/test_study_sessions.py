@@ -1,4 +1,5 @@
 import pytest
+import json
 import requests
 
 # Base URL for your API
@@ -48,4 +49,191 @@ def test_create_study_session_nonexistent_activity():
     
     assert response.status_code == 404
     assert 'error' in response.json()
-    assert 'Study activity not found' in response.json()['error']
\ No newline at end of file
+    assert 'Study activity not found' in response.json()['error']
+
+def test_get_study_sessions_cursor_pagination():
+    """
+    Test that following next_cursor returns the same sessions as the next page
+    """
+    first_page = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 1}).json()
+    assert 'next_cursor' in first_page
+    if first_page['next_cursor'] is None:
+        pytest.skip('Not enough sessions for a second page')
+
+    response = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 1, 'cursor': first_page['next_cursor']})
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert 'items' in data
+    assert 'next_cursor' in data
+
+    second_page = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 1, 'page': 2}).json()
+    assert [session['id'] for session in data['items']] == [session['id'] for session in second_page['items']]
+
+def test_review_study_session_updates_word_counters(valid_word_id):
+    """
+    Test that recording reviews updates the word's correct/wrong counters
+    """
+    before = requests.get(f'{BASE_URL}/words/{valid_word_id}').json()['word']
+
+    session = requests.post(f'{BASE_URL}/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).json()
+    response = requests.post(f"{BASE_URL}/study-sessions/{session['session_id']}/review", json={
+        'reviews': [
+            {'word_id': valid_word_id, 'is_correct': True},
+            {'word_id': valid_word_id, 'is_correct': True},
+            {'word_id': valid_word_id, 'is_correct': False}
+        ]
+    })
+
+    assert response.status_code == 200
+
+    after = requests.get(f'{BASE_URL}/words/{valid_word_id}').json()['word']
+    assert after['correct_count'] == before['correct_count'] + 2
+    assert after['wrong_count'] == before['wrong_count'] + 1
+
+def test_review_study_session_rejects_unknown_words(valid_word_id):
+    """
+    Test that a review of an unknown word is refused before anything is recorded
+    """
+    stats = requests.get('http://localhost:8000/dashboard/stats').json()
+    session = requests.post(f'{BASE_URL}/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).json()
+    response = requests.post(f"{BASE_URL}/study-sessions/{session['session_id']}/review", json={
+        'reviews': [{'word_id': valid_word_id, 'is_correct': True}, {'word_id': 999999, 'is_correct': True}]
+    })
+
+    assert response.status_code == 400
+    assert response.json()['word_ids'] == [999999]
+    after = requests.get('http://localhost:8000/dashboard/stats').json()
+    assert after['total_words_studied'] == stats['total_words_studied']
+    assert requests.get(f"{BASE_URL}/study-sessions/{session['session_id']}").json()['session']['review_items_count'] == 0
+
+    response = requests.post(f"{BASE_URL}/study-sessions/{session['session_id']}/review", json={
+        'reviews': [{'word_id': 'one', 'is_correct': True}]
+    })
+    assert response.status_code == 400
+
+def test_ingest_reviews_reports_each_item(valid_group_id, valid_study_activity_id, valid_word_id):
+    """
+    Test that bulk ingestion records valid reviews and rejects invalid ones per item
+    """
+    session = requests.post(f'{BASE_URL}/study-sessions', json={
+        'group_id': valid_group_id,
+        'study_activity_id': valid_study_activity_id
+    }).json()
+    before = requests.get(f'{BASE_URL}/words/{valid_word_id}').json()['word']
+
+    response = requests.post(f'{BASE_URL}/study-sessions/reviews', json=[
+        {'session_id': session['session_id'], 'word_id': valid_word_id, 'is_correct': True},
+        {'session_id': session['session_id'], 'word_id': 999999, 'is_correct': True},
+        {'session_id': 999999, 'word_id': valid_word_id, 'is_correct': True},
+        {'session_id': session['session_id'], 'word_id': valid_word_id},
+        {'session_id': session['session_id'], 'word_id': valid_word_id, 'is_correct': False,
+         'created_at': '2025-01-01T09:30:00Z'}
+    ])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data['recorded'] == 2
+    assert data['rejected'] == 3
+    assert [result['status'] for result in data['results']] == [
+        'recorded', 'rejected', 'rejected', 'rejected', 'recorded'
+    ]
+    assert data['results'][1]['error'] == 'Word not found'
+    assert data['results'][2]['error'] == 'Study session not found'
+    assert data['results'][3]['error'] == 'Missing is_correct'
+
+    after = requests.get(f'{BASE_URL}/words/{valid_word_id}').json()['word']
+    assert after['correct_count'] == before['correct_count'] + 1
+    assert after['wrong_count'] == before['wrong_count'] + 1
+
+def test_ingest_reviews_ndjson(valid_group_id, valid_study_activity_id, valid_word_id):
+    """
+    Test that bulk ingestion accepts NDJSON and reports unparseable lines
+    """
+    session = requests.post(f'{BASE_URL}/study-sessions', json={
+        'group_id': valid_group_id,
+        'study_activity_id': valid_study_activity_id
+    }).json()
+    lines = [
+        json.dumps({'session_id': session['session_id'], 'word_id': valid_word_id, 'is_correct': True}),
+        '{not json',
+        json.dumps({'session_id': session['session_id'], 'word_id': valid_word_id, 'is_correct': False})
+    ]
+
+    response = requests.post(
+        f'{BASE_URL}/study-sessions/reviews',
+        data='\n'.join(lines) + '\n',
+        headers={'Content-Type': 'application/x-ndjson'}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data['recorded'] == 2
+    assert data['results'][1]['status'] == 'rejected'
+    assert data['results'][1]['error'].startswith('Invalid JSON')
+
+def test_ingest_reviews_requires_array():
+    """
+    Test that a JSON body that is not an array is rejected
+    """
+    response = requests.post(f'{BASE_URL}/study-sessions/reviews', json={'reviews': []})
+
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+def test_get_study_sessions_fields():
+    """
+    Test that ?fields= narrows each session to the requested keys, and the cursor still works
+    """
+    full = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 2}).json()
+    response = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 2, 'fields': 'review_items_count,id'})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data['items'] == [{'id': item['id'], 'review_items_count': item['review_items_count']}
+                             for item in full['items']]
+    if data['next_cursor'] is not None:
+        narrowed = requests.get(f'{BASE_URL}/study-sessions',
+                                params={'per_page': 2, 'fields': 'start_time', 'cursor': data['next_cursor']})
+        assert narrowed.status_code == 200
+        assert all(list(item) == ['start_time'] for item in narrowed.json()['items'])
+
+@pytest.mark.parametrize('fields', ['nope', 'id,created_at', 'id,,group'])
+def test_get_study_sessions_invalid_fields(fields):
+    """
+    Test that unknown fields are rejected, internal columns included
+    """
+    response = requests.get(f'{BASE_URL}/study-sessions', params={'fields': fields})
+
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+@pytest.mark.parametrize('params', [{'per_page': 0}, {'per_page': -5}, {'page': -1}, {'per_page': 0, 'cursor': ''}])
+def test_get_study_sessions_clamps_pagination(params):
+    """
+    Test that out-of-range page and per_page values are clamped instead of failing
+    """
+    response = requests.get(f'{BASE_URL}/study-sessions', params=params)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert 1 <= data['per_page'] <= 100
+    assert data.get('page', 1) >= 1
+
+    first = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 1}).json()
+    if first['next_cursor'] is not None:
+        response = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 0, 'cursor': first['next_cursor']})
+        assert response.status_code == 200
+        assert response.json()['per_page'] == 1
+
+def test_get_study_session_clamps_pagination():
+    """
+    Test that a session's word list clamps per_page instead of dividing by zero
+    """
+    session_id = requests.get(f'{BASE_URL}/study-sessions', params={'per_page': 1}).json()['items'][0]['id']
+    response = requests.get(f'{BASE_URL}/study-sessions/{session_id}', params={'per_page': 0, 'page': 0})
+
+    assert response.status_code == 200
+    assert response.json()['per_page'] == 1
+    assert response.json()['page'] == 1
@@ -1,3 +1,5 @@
+import sqlite3
+
 import pytest
 import requests
 
@@ -76,3 +78,128 @@ def test_get_nonexistent_word():
     data = response.json()
     assert 'error' in data
     assert data['error'] == 'Word not found'
+
+def test_get_words_cursor_pagination():
+    """
+    Test that following next_cursor returns the same words as the next page
+    """
+    params = {'sort_by': 'english', 'order': 'desc'}
+    first_page = requests.get(f'{BASE_URL}/words', params=params).json()
+    assert 'next_cursor' in first_page
+    if first_page['next_cursor'] is None:
+        pytest.skip('Not enough words for a second page')
+
+    response = requests.get(f'{BASE_URL}/words', params={'cursor': first_page['next_cursor']})
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert 'words' in data
+    assert 'next_cursor' in data
+
+    second_page = requests.get(f'{BASE_URL}/words', params=dict(params, page=2)).json()
+    assert [word['id'] for word in data['words']] == [word['id'] for word in second_page['words']]
+
+def test_get_words_invalid_cursor():
+    """
+    Test that a malformed cursor is rejected
+    """
+    response = requests.get(f'{BASE_URL}/words', params={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
+
+    data = response.json()
+    assert 'error' in data
+    assert data['error'] == 'Invalid cursor'
+
+def test_search_words_prefix():
+    """
+    Test that the last word of the query matches as a prefix, in either language
+    """
+    response = requests.get(f'{BASE_URL}/words/search', params={'q': 'accen'})
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data['query'] == 'accen'
+    assert 'accendere' in [word['italian'] for word in data['words']]
+
+    data = requests.get(f'{BASE_URL}/words/search', params={'q': 'turn'}).json()
+    assert 'turn on' in [word['english'] for word in data['words']]
+
+def test_search_words_requires_query():
+    """
+    Test that a query without letters or digits is rejected
+    """
+    response = requests.get(f'{BASE_URL}/words/search', params={'q': ' "*'})
+
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+def test_search_index_follows_words(synthetic_app):
+    """
+    Test that search ignores accents and stays in sync as words are added, changed and removed
+    """
+    client = synthetic_app.test_client()
+    def search(q):
+        return [word['italian'] for word in client.get('/api/words/search', query_string={'q': q}).get_json()['words']]
+
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    word_id = connection.execute("INSERT INTO words (english, italian) VALUES ('why', 'perché')").lastrowid
+    connection.commit()
+    assert 'perché' in search('perche')
+    assert 'perché' in search('PERCH')
+
+    connection.execute("UPDATE words SET italian = 'poiché' WHERE id = ?", (word_id,))
+    connection.commit()
+    assert 'perché' not in search('perche')
+    assert 'poiché' in search('poiche')
+
+    connection.execute('DELETE FROM words WHERE id = ?', (word_id,))
+    connection.commit()
+    assert search('poiche') == []
+    connection.close()
+
+def test_search_ranks_every_match(synthetic_app):
+    """
+    Test that the best match of a broad prefix comes first even when it was added after many weaker ones
+    """
+    client = synthetic_app.test_client()
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    connection.executemany('INSERT INTO words (english, italian) VALUES (?, ?)',
+                           [(f'qxzwing filler number {n}', f'riempitivo {n}') for n in range(1000)])
+    best = connection.execute("INSERT INTO words (english, italian) VALUES ('qxzwing', 'qxzwing')").lastrowid
+    connection.commit()
+    connection.close()
+
+    words = client.get('/api/words/search', query_string={'q': 'qxzw', 'limit': 5}).get_json()['words']
+    assert len(words) == 5
+    assert words[0]['id'] == best
+
+def test_batch_lookup_matches_single_lookups(synthetic_app):
+    """
+    Test that POST /api/words/batch and GET /api/words?ids= return the same words and groups as one GET per id
+    """
+    client = synthetic_app.test_client()
+    connection = sqlite3.connect(synthetic_app.config['DATABASE'])
+    shared = connection.execute('SELECT word_id FROM word_groups GROUP BY word_id HAVING COUNT(*) > 1 LIMIT 1').fetchone()[0]
+    lonely = connection.execute("INSERT INTO words (english, italian) VALUES ('alone', 'solo')").lastrowid
+    connection.commit()
+    connection.close()
+
+    ids = [17, shared, 5, 17, 99999999, lonely]
+    batch = client.post('/api/words/batch', json={'ids': ids}).get_json()
+    assert [word['id'] for word in batch['words']] == [17, shared, 5, lonely]
+    assert batch['missing'] == [99999999]
+    for word in batch['words']:
+        assert word == client.get(f'/api/words/{word["id"]}').get_json()['word']
+    assert len(batch['words'][1]['groups']) > 1
+    assert batch['words'][3]['groups'] == []
+
+    by_query = client.get('/api/words', query_string={'ids': ','.join(map(str, ids))}).get_json()
+    assert by_query == batch
+    assert client.get('/api/words?ids=17&ids=5').get_json()['words'] == [batch['words'][0], batch['words'][2]]
+
+    for body in [{'ids': []}, {'ids': ['x']}, {'ids': [0]}, {'ids': [True]}, [1, 2], {'ids': list(range(1, 5002))}]:
+        assert client.post('/api/words/batch', json=body).status_code == 400, body
+    assert client.get('/api/words', query_string={'ids': '1,,2'}).status_code == 400